@@ -0,0 +1,291 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 命令行模式：不加载任何 PyQt5 组件，供脚本/定时任务批量处理
+#   python Ash_MOD_Tools_Main.py rename ...
+#   python Ash_MOD_Tools_Main.py replace ...
+
+import os
+import sys
+import argparse
+import sqlite3
+
+import RenameEngine
+import ReplaceEngine
+from BackupStore import BackupStore, ArchiveBackupWriter, sibling_backups, ARCHIVE_SUFFIX
+from TargetIndex import TargetIndex
+
+CLI_COMMANDS = ("rename", "replace")
+
+# 命令行参数取值 → 界面选项文本
+REPLACE_MODES = {
+    "suffix": ReplaceEngine.MATCH_SUFFIX,
+    "keyword": ReplaceEngine.MATCH_KEYWORD,
+    "regex": ReplaceEngine.MATCH_REGEX,
+}
+INSERT_MODES = {
+    "start": RenameEngine.INSERT_START,
+    "end": RenameEngine.INSERT_END,
+    "before": RenameEngine.INSERT_BEFORE_KEYWORD,
+    "after": RenameEngine.INSERT_AFTER_KEYWORD,
+}
+CASE_MODES = {
+    "keep": RenameEngine.CASE_KEEP,
+    "upper": RenameEngine.CASE_UPPER,
+    "lower": RenameEngine.CASE_LOWER,
+    "title": RenameEngine.CASE_TITLE,
+}
+FILTER_MODES = {
+    "prefix": RenameEngine.FILTER_PREFIX,
+    "suffix": RenameEngine.FILTER_SUFFIX,
+    "keyword": RenameEngine.FILTER_KEYWORD,
+    "regex": RenameEngine.FILTER_REGEX,
+}
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="Ash_MOD_Tools_Main.py",
+        description="Ash MOD Tools 命令行模式（不启动图形界面）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    # ------------------ 批量重命名 ------------------
+    p_rename = sub.add_parser("rename", help="批量重命名文件或文件夹")
+    p_rename.add_argument("paths", nargs="+", help="要处理的文件/文件夹")
+    p_rename.add_argument("-r", "--recursive", action="store_true", help="递归处理子文件夹")
+    p_rename.add_argument("--folders", action="store_true", help="重命名文件夹本身而不是其中的文件")
+    p_rename.add_argument("--find", default="", help="查找内容")
+    p_rename.add_argument("--replace", default="", help="替换内容")
+    p_rename.add_argument("--regex", action="store_true", help="查找内容按正则表达式处理")
+    p_rename.add_argument("--prefix", default="", help="添加前缀")
+    p_rename.add_argument("--suffix", default="", help="添加后缀")
+    p_rename.add_argument("--number", action="store_true", help="启用编号")
+    p_rename.add_argument("--number-prefix", default="", help="编号前缀")
+    p_rename.add_argument("--number-suffix", default="", help="编号后缀")
+    p_rename.add_argument("--start", type=int, default=1, help="起始编号（默认 1）")
+    p_rename.add_argument("--step", type=int, default=1, help="编号步长（默认 1）")
+    p_rename.add_argument("--pad", type=int, default=0, help="编号补零位数（默认 0）")
+    p_rename.add_argument("--insert", choices=INSERT_MODES, default="end", help="编号插入位置（默认 end）")
+    p_rename.add_argument("--insert-keyword", default="", help="插入位置为 before/after 时使用的关键词")
+    p_rename.add_argument("--delete", nargs=2, type=int, metavar=("FROM", "TO"),
+                          help="删除第 FROM 到第 TO 个字符（从 1 开始）")
+    p_rename.add_argument("--case", choices=CASE_MODES, default="keep", help="大小写转换（默认 keep）")
+    p_rename.add_argument("--filter", default="", help="只处理匹配此模式的名称")
+    p_rename.add_argument("--filter-mode", choices=FILTER_MODES, default="prefix", help="筛选模式（默认 prefix）")
+    p_rename.add_argument("--skip", default="", help="跳过匹配此模式的名称")
+    p_rename.add_argument("--skip-mode", choices=FILTER_MODES, default="prefix", help="跳过模式（默认 prefix）")
+    p_rename.add_argument("-n", "--dry-run", action="store_true", help="只输出预览，不实际重命名")
+
+    # ------------------ 批量替换 ------------------
+    p_replace = sub.add_parser("replace", help="用源文件批量替换匹配的目标文件")
+    p_replace.add_argument("source", help="源文件")
+    p_replace.add_argument("targets", nargs="+", help="目标文件/文件夹（文件夹递归处理）")
+    p_replace.add_argument("--mode", choices=REPLACE_MODES, default="suffix", help="匹配模式（默认 suffix）")
+    p_replace.add_argument("--pattern", required=True, help="后缀、关键词（逗号分隔）或正则表达式")
+    p_replace.add_argument("--skip", default="", help="跳过关键词（逗号分隔）")
+    backup = p_replace.add_mutually_exclusive_group()
+    backup.add_argument("--backup", default="", metavar="DIR",
+                        help="备份目录（默认在源文件同目录下创建 backup-时间戳）")
+    backup.add_argument("--no-backup", action="store_true", help="不备份直接替换")
+    p_replace.add_argument("--archive", action="store_true",
+                           help="备份写进单个 backup-时间戳.zip（放在 --backup 目录或源文件同目录下）")
+    p_replace.add_argument("-j", "--jobs", type=int, default=ReplaceEngine.default_jobs(),
+                           help=f"同时处理的文件数（默认 {ReplaceEngine.default_jobs()}，最大 {ReplaceEngine.MAX_JOBS}）")
+    p_replace.add_argument("--force", action="store_true", help="即使目标已与源文件内容相同也重新替换")
+    p_replace.add_argument("-n", "--dry-run", action="store_true", help="只列出匹配的文件，不实际替换")
+    return parser
+
+
+def run_rename(args) -> int:
+    """执行批量重命名，返回退出码"""
+    if args.folders:
+        paths = RenameEngine.collect_folders(args.paths, args.recursive)
+    else:
+        paths = RenameEngine.collect_files(args.paths, args.recursive)
+    entries = RenameEngine.make_entries(paths)
+    entries = RenameEngine.filter_entries(entries, FILTER_MODES[args.filter_mode], args.filter.strip(),
+                                          FILTER_MODES[args.skip_mode], args.skip.strip())
+
+    rules = RenameEngine.RenameRuleSet(
+        find_text=args.find,
+        replace_text=args.replace,
+        match_mode=RenameEngine.MATCH_REGEX if args.regex else RenameEngine.MATCH_PLAIN,
+        highlight=False,
+        prefix_suffix_enabled=bool(args.prefix or args.suffix),
+        prefix=args.prefix,
+        suffix=args.suffix,
+        number_enabled=args.number,
+        number_prefix=args.number_prefix,
+        number_suffix=args.number_suffix,
+        start=args.start,
+        step=args.step,
+        pad=args.pad,
+        insert_mode=INSERT_MODES[args.insert],
+        insert_text=args.insert_keyword,
+        delete_enabled=bool(args.delete),
+        delete_from=args.delete[0] if args.delete else 0,
+        delete_to=args.delete[1] if args.delete else 0,
+        case=CASE_MODES[args.case],
+    )
+    if rules.regex_error is not None and rules.replace_text:
+        print(f"正则表达式无效: {rules.regex_error}", file=sys.stderr)
+        return 2
+
+    try:
+        rename_ops = RenameEngine.plan_renames(entries, rules, folder_mode=args.folders)
+    except ValueError as e:
+        print(f"存在重名冲突，未执行任何操作：{e}", file=sys.stderr)
+        return 1
+
+    if args.dry_run:
+        for src, dst in rename_ops:
+            print(f"{src} -> {dst.name}")
+        print(f"共 {len(entries)} 项，将重命名 {len(rename_ops)} 项（预览）", file=sys.stderr)
+        return 0
+
+    performed, failed = RenameEngine.execute_renames(rename_ops)
+    for src, dst in performed:
+        print(f"{src} -> {dst.name}")
+    for msg in failed:
+        print(f"错误：{msg}", file=sys.stderr)
+    print(f"共 {len(entries)} 项，成功重命名 {len(performed)} 项，失败 {len(failed)} 项", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_replace(args) -> int:
+    """执行批量替换，返回退出码"""
+    source = os.path.abspath(args.source)
+    backup_dir = os.path.abspath(args.backup) if args.backup else None
+    try:
+        # 遍历与筛选都是流式的：备份目录在遍历时跳过，预览时边找边输出
+        # 目标统一为绝对路径：写入 manifest 与索引的原始路径不依赖当前工作目录
+        targets = ReplaceEngine.iter_files([os.path.abspath(t) for t in args.targets],
+                                           prune=[backup_dir] if backup_dir else [])
+        matches = ReplaceEngine.iter_matches(
+            source, targets, REPLACE_MODES[args.mode], args.pattern,
+            skip_keywords=ReplaceEngine.split_keywords(args.skip),
+            backup_dir=backup_dir,
+            on_skip=lambda full: print(f"已跳过: {full} (匹配到跳过关键词)", file=sys.stderr))
+    except ValueError as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 2
+
+    if args.dry_run:
+        count = 0
+        for full in matches:
+            print(full)
+            count += 1
+        print(f"已找到 {count} 个匹配文件（预览）", file=sys.stderr)
+        return 0
+
+    matches = list(matches)
+    if not matches:
+        print("已找到 0 个匹配文件", file=sys.stderr)
+        return 0
+
+    try:
+        copy_source = ReplaceEngine.CopySource(source)
+    except OSError as e:
+        print(f"错误：无法读取源文件 {source}：{e}", file=sys.stderr)
+        return 2
+
+    # 与图形界面共用目标摘要缓存：重复打补丁时未变化的目标不必重新计算摘要
+    try:
+        hash_cache = TargetIndex()
+    except (OSError, sqlite3.Error):
+        hash_cache = None
+
+    with copy_source:
+        # 已与源文件内容相同的目标不备份也不覆盖
+        identical = set()
+        if not args.force:
+            identical = ReplaceEngine.find_identical(copy_source, matches, args.jobs, hash_cache=hash_cache)
+        pending = [full for full in matches if full not in identical]
+
+        store = None
+        digests = {}
+        backup_errors = 0
+        if not args.no_backup and args.archive:
+            timestamp = ReplaceEngine.backup_timestamp()
+            archive_path = os.path.join(backup_dir or os.path.dirname(source), f"backup-{timestamp}{ARCHIVE_SUFFIX}")
+            backup_dir = None
+            if pending:
+                # 先把全部待替换目标写进压缩包，写入失败的目标不替换
+                digests = ReplaceEngine.hash_targets(pending, args.jobs, hash_cache=hash_cache)
+                archived = []
+                try:
+                    with ArchiveBackupWriter(archive_path) as writer:
+                        for full in pending:
+                            method, msg = writer.put(full, digests[full]) if digests.get(full) else \
+                                (None, "无法读取目标内容")
+                            if method is None:
+                                print(f"错误：{full} - 备份失败：{msg}", file=sys.stderr)
+                            else:
+                                archived.append(full)
+                        writer.close(timestamp)
+                except Exception as e:
+                    print(f"错误：写入备份压缩包失败：{e}", file=sys.stderr)
+                    return 1
+                backup_errors = len(pending) - len(archived)
+                pending = archived
+                print(f"备份压缩包：{archive_path}", file=sys.stderr)
+        elif not args.no_backup:
+            timestamp = ReplaceEngine.backup_timestamp()
+            if not backup_dir:
+                backup_dir = os.path.join(os.path.dirname(source), f"backup-{timestamp}")
+            if pending:
+                os.makedirs(backup_dir, exist_ok=True)
+                # 备份按内容摘要存放，相同内容（本次或同级的其他备份中）只保存一份；
+                # 每个目标备份完成后立即在 manifest.jsonl 中追加一条记录
+                store = BackupStore(backup_dir, sibling_backups(backup_dir), hash_cache=hash_cache,
+                                    timestamp=timestamp)
+                print(f"备份目录：{backup_dir}", file=sys.stderr)
+        else:
+            backup_dir = None
+
+        counts = {"success": 0, "error": 0}
+
+        def on_done(_, outcome):
+            (status, _), logs = outcome
+            for text, level in logs:
+                print(text, file=sys.stderr if level == ReplaceEngine.LOG_ERROR else sys.stdout)
+            counts["success" if status == "success" else "error"] += 1
+
+        try:
+            ReplaceEngine.run_parallel(
+                lambda full: ReplaceEngine.replace_file(source, full, backup_dir, copy_source,
+                                                        store, digests.get(full)),
+                pending, args.jobs, on_done=on_done)
+        finally:
+            if store is not None:
+                store.close()
+
+    success_count = counts["success"]
+    error_count = counts["error"] + backup_errors
+    skipped = f"，跳过 {len(identical)} 个（内容相同）" if identical else ""
+    print(f"替换完成：成功 {success_count} 个{skipped}，失败 {error_count} 个", file=sys.stderr)
+    return 1 if error_count else 0
+
+
+def main(argv=None) -> int:
+    """命令行入口，返回退出码"""
+    args = build_parser().parse_args(argv)
+    if args.command == "rename":
+        return run_rename(args)
+    return run_replace(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
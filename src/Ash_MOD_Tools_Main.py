@@ -14,6 +14,12 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import sys
+
+# 命令行模式（rename / replace）在导入 PyQt5 之前分流，不加载任何界面组件
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] in ("rename", "replace"):
+    from Ash_MOD_Tools_CLI import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
+
 from PyQt5.QtGui import QIcon, QPixmap
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel
@@ -0,0 +1,249 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 全局备份索引（不依赖 PyQt5）：把所有备份的 manifest 汇总进一个 SQLite 库，
+# 按原始路径（以及备份内的相对路径）直接查出每个备份中的对应版本，还原时不再逐个读取 manifest。
+# 每个备份记下 manifest 的大小与修改时间，变化过（或尚未收录）的备份才重新读入。
+
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from TargetIndex import INDEX_DIR
+from BackupStore import (MANIFEST_FILE, MANIFEST_LOG, ArchiveMember, is_backup_archive,
+                         has_manifest, load_manifest)
+
+CATALOG_FILE = "backup_catalog.sqlite3"
+
+# SQLite 单条语句的参数个数有上限，批量查询时分段
+_QUERY_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    path TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    archive INTEGER NOT NULL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS versions (
+    original TEXT NOT NULL,
+    backup TEXT NOT NULL,
+    rel TEXT NOT NULL,
+    hash TEXT,
+    backed_up_at TEXT,
+    mtime_ns INTEGER,
+    mode INTEGER,
+    PRIMARY KEY (original, backup)
+);
+CREATE INDEX IF NOT EXISTS versions_backup_rel ON versions(backup, rel);
+"""
+
+# 某个原始路径在一个备份中的版本：ref 为目录备份中的文件路径或压缩包中的 ArchiveMember
+BackupVersion = namedtuple("BackupVersion", "backup ref hash backed_up_at")
+
+
+def default_catalog_path() -> str:
+    """默认索引文件位置：与目标目录索引放在同一处"""
+    return os.path.join(INDEX_DIR, CATALOG_FILE)
+
+
+def _key(backup: str) -> str:
+    """备份路径的统一写法（Windows 下大小写不同的写法视为同一备份）"""
+    return os.path.normcase(os.path.normpath(os.path.abspath(backup)))
+
+
+def _original_key(path: str) -> str:
+    return os.path.normpath(path)
+
+
+def _signature(backup: str) -> str:
+    """manifest（压缩包备份为压缩包本身）的大小与修改时间，追加记录后必然变化"""
+    if is_backup_archive(backup):
+        paths = [backup]
+    else:
+        paths = [os.path.join(backup, MANIFEST_FILE), os.path.join(backup, MANIFEST_LOG)]
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append("-")
+    return ";".join(parts)
+
+
+def _ref(backup, archive, rel, mtime_ns, mode):
+    if archive:
+        return ArchiveMember(backup, rel, mtime_ns, mode)
+    return os.path.join(backup, rel.replace('/', os.sep))
+
+
+class BackupCatalog:
+    """所有备份的版本索引，每个线程使用自己的 SQLite 连接"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_catalog_path()
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        self._migrate(conn)
+        conn.commit()
+
+    @staticmethod
+    def _migrate(conn):
+        """旧版索引没有 mode 列：补上并让所有备份在下次使用时重新读入"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(versions)")}
+        if "mode" not in columns:
+            conn.execute("ALTER TABLE versions ADD COLUMN mode INTEGER")
+            conn.execute("UPDATE backups SET signature = ''")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self.db_path == ":memory:":
+                conn.executescript(_SCHEMA)  # 内存库每个连接各自独立
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------ 收录与删除 ------------------
+    def sync(self, backup: str) -> bool:
+        """收录一个备份：manifest 未变化时什么都不做，变化过则整体重新读入
+
+        返回备份是否带有 manifest；备份已不存在或没有 manifest 时从索引中删除。
+        manifest 损坏时抛出异常（同 load_manifest），索引中原有的记录保持不变。
+        """
+        key = _key(backup)
+        signature = _signature(key)
+        conn = self._conn()
+        row = conn.execute("SELECT signature FROM backups WHERE path = ?", (key,)).fetchone()
+        if row is not None and row[0] == signature:
+            return True
+        index = load_manifest(key) if has_manifest(key) else None
+        if index is None:
+            self.forget(key)
+            return False
+        # 压缩包中较早的记录没有逐条的备份时间，使用 manifest 中的整体时间
+        rows = [(_original_key(orig), key, entry["backup_rel_path"], entry.get("hash"),
+                 entry.get("backed_up_at") or index.created_at, entry.get("mtime_ns"), entry.get("mode"))
+                for orig, entry in index.by_original.items()]
+        created_at = next((r[4] for r in rows if r[4]), index.created_at)
+        with conn:
+            conn.execute("DELETE FROM versions WHERE backup = ?", (key,))
+            conn.executemany("INSERT OR REPLACE INTO versions (original, backup, rel, hash, backed_up_at, mtime_ns, mode) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO backups (path, signature, archive, created_at) VALUES (?, ?, ?, ?)",
+                         (key, signature, int(index.archive), created_at))
+        return True
+
+    def forget(self, backup: str):
+        """备份被删除：移除它的全部记录"""
+        key = _key(backup)
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM versions WHERE backup = ?", (key,))
+            conn.execute("DELETE FROM backups WHERE path = ?", (key,))
+
+    # ------------------ 查询 ------------------
+    def items(self, backup: str) -> Iterator[Tuple[str, object]]:
+        """逐条产出一个备份中的 (原始路径, 备份内容)"""
+        key = _key(backup)
+        archive = self._is_archive(key)
+        for orig, rel, mtime_ns, mode in self._conn().execute(
+                "SELECT original, rel, mtime_ns, mode FROM versions WHERE backup = ?", (key,)):
+            yield orig, _ref(key, archive, rel, mtime_ns, mode)
+
+    def lookup(self, backup: str, originals: Iterable[str]) -> Dict[str, object]:
+        """按原始路径在一个备份中直接查找，返回 {原始路径: 备份内容}（路径已规范化，没有记录的路径不出现）"""
+        key = _key(backup)
+        archive = self._is_archive(key)
+        conn = self._conn()
+        found = {}
+        originals = list(dict.fromkeys(_original_key(orig) for orig in originals))
+        for i in range(0, len(originals), _QUERY_CHUNK):
+            chunk = originals[i:i + _QUERY_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for orig, rel, mtime_ns, mode in conn.execute(
+                    f"SELECT original, rel, mtime_ns, mode FROM versions WHERE backup = ? AND original IN ({marks})",
+                    [key] + chunk):
+                found[orig] = _ref(key, archive, rel, mtime_ns, mode)
+        return found
+
+    def originals_for(self, backup: str, rel: str) -> List[str]:
+        """备份相对路径对应的全部原始路径（内容相同的多个目标共用一份备份）"""
+        return [row[0] for row in self._conn().execute(
+            "SELECT original FROM versions WHERE backup = ? AND rel = ?", (_key(backup), rel))]
+
+    def versions(self, original: str, backups: Optional[Iterable[str]] = None) -> List[BackupVersion]:
+        """原始路径在已收录备份（给定 backups 时仅限其中）中的版本，按备份时间从早到晚"""
+        rows = self._conn().execute(
+            "SELECT v.backup, b.archive, v.rel, v.mtime_ns, v.mode, v.hash, v.backed_up_at "
+            "FROM versions v JOIN backups b ON b.path = v.backup WHERE v.original = ?",
+            (_original_key(original),)).fetchall()
+        if backups is not None:
+            keys = {_key(backup) for backup in backups if backup}
+            rows = [r for r in rows if r[0] in keys]
+        rows.sort(key=lambda r: (_timestamp_key(r[6]), r[0]))
+        return [BackupVersion(backup, _ref(backup, archive, rel, mtime_ns, mode), digest, backed_up_at)
+                for backup, archive, rel, mtime_ns, mode, digest, backed_up_at in rows]
+
+    def earliest(self, backups: Iterable[str]) -> Dict[str, object]:
+        """在给定的备份中为每个原始路径取备份时间最早的版本，返回 {原始路径: 备份内容}
+
+        备份时间相同时按 backups 中的先后顺序；未记录时间的旧备份视为最早。
+        """
+        order = {}
+        for backup in backups:
+            if backup:
+                order.setdefault(_key(backup), len(order))
+        conn = self._conn()
+        best = {}
+        keys = list(order)
+        for i in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[i:i + _QUERY_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for orig, backup, archive, rel, mtime_ns, mode, backed_up_at in conn.execute(
+                    "SELECT v.original, v.backup, b.archive, v.rel, v.mtime_ns, v.mode, v.backed_up_at "
+                    f"FROM versions v JOIN backups b ON b.path = v.backup WHERE v.backup IN ({marks})", chunk):
+                rank = (_timestamp_key(backed_up_at), order[backup])
+                old = best.get(orig)
+                if old is None or rank < old[0]:
+                    best[orig] = (rank, _ref(backup, archive, rel, mtime_ns, mode))
+        # 结果按备份时间先后排列
+        return {orig: ref for orig, (_, ref) in sorted(best.items(), key=lambda item: item[1][0])}
+
+    def _is_archive(self, key) -> bool:
+        row = self._conn().execute("SELECT archive FROM backups WHERE path = ?", (key,)).fetchone()
+        return bool(row and row[0])
+
+
+def _timestamp_key(text):
+    """backup_timestamp 生成的时间戳（各段不补零）转成可比较的元组，无法解析时排在最前"""
+    try:
+        return tuple(int(part) for part in (text or "").split("-"))
+    except ValueError:
+        return ()
@@ -0,0 +1,379 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 内容寻址备份存储（不依赖 PyQt5）：备份文件以内容摘要命名，存放在备份目录的 objects 下，
+# 相同内容只保存一份；备份记录（manifest）中的条目通过 backup_rel_path/hash 指向这些文件。
+# 目录备份的记录是只追加的 manifest.jsonl：每完成一个备份追加一行，不再整体重写。
+
+import os
+import json
+import shutil
+import stat
+import zipfile
+import threading
+from collections import namedtuple
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ReplaceEngine import (OBJECTS_DIR, LOG_SUCCESS, LOG_ERROR, BACKUP_LINK, BACKUP_MOVE,
+                           object_rel_path, backup_target, target_digest, _undo_backup,
+                           _dir_key, _path_lock, CopySource)
+
+MANIFEST_FILE = "manifest.json"  # 旧版目录备份与压缩包内使用的整体记录
+MANIFEST_LOG = "manifest.jsonl"  # 目录备份的只追加记录，每行一条
+
+# 压缩包备份：所有备份内容与 manifest 写进同一个 zip（顺序写入，还原时按成员随机读取）
+ARCHIVE_SUFFIX = ".zip"
+ARCHIVE_COMPRESSLEVEL = 1  # 模组资源多为已压缩格式，用最快的压缩级别
+STORE_ARCHIVED = "archived"
+
+# 内容已在本备份目录中 / 从其他备份目录硬链接而来，都不写入任何数据
+STORE_EXISTS = "exists"
+STORE_SHARED = "shared"
+
+
+def sibling_backups(backup_dir: str) -> List[str]:
+    """与 backup_dir 同级、使用内容寻址存储的其他备份目录（自动创建的 backup-时间戳 都在同一处）"""
+    parent = os.path.dirname(os.path.abspath(backup_dir))
+    own = _dir_key(backup_dir)
+    found = []
+    try:
+        with os.scandir(parent) as it:
+            for entry in it:
+                try:
+                    if not entry.is_dir() or _dir_key(entry.path) == own:
+                        continue
+                except OSError:
+                    continue
+                if os.path.isdir(os.path.join(entry.path, OBJECTS_DIR)):
+                    found.append(entry.path)
+    except OSError:
+        pass
+    return sorted(found)
+
+
+class ManifestLog:
+    """目录备份的只追加记录：每条备份写一行 JSON 并立即刷新，多线程共用"""
+
+    def __init__(self, backup_dir: str):
+        self.path = os.path.join(backup_dir, MANIFEST_LOG)
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class BackupStore:
+    """单个备份目录中的内容寻址存储
+
+    peers 为其他备份目录：本目录缺少某个内容而其他备份中已有时直接硬链接过来，
+    每个备份目录仍然自成一体，删除任意一个都不影响其他备份。
+    每个目标备份完成后立即在 manifest.jsonl 中追加一条记录（在替换目标之前）。
+    """
+
+    def __init__(self, backup_dir: str, peers: Iterable[str] = (), hash_cache=None,
+                 timestamp: Optional[str] = None):
+        self.backup_dir = backup_dir
+        self.hash_cache = hash_cache  # 目标摘要缓存（TargetIndex），未变化的目标不重复计算
+        self.timestamp = timestamp
+        self.manifest = ManifestLog(backup_dir)
+        own = _dir_key(backup_dir)
+        seen = {own}
+        self.peers = []
+        for peer in peers:
+            key = _dir_key(peer) if peer else None
+            if key and key not in seen:
+                seen.add(key)
+                self.peers.append(peer)
+
+    def path(self, digest: bytes) -> str:
+        return os.path.join(self.backup_dir, object_rel_path(digest).replace('/', os.sep))
+
+    def has(self, digest: bytes) -> bool:
+        return os.path.isfile(self.path(digest))
+
+    def close(self):
+        self.manifest.close()
+
+    def put(self, target: str, digest: Optional[bytes] = None):
+        """把目标存入备份并追加记录，返回 (方式, 信息, 备份路径)，失败时方式为 None
+
+        digest 为目标内容摘要，未提供时在此计算。内容已存在时什么都不写；
+        其他备份目录中已有时硬链接过来；否则按 backup_target 的方式（硬链接 → 移动 → 复制）保存目标本身。
+        """
+        if digest is None:
+            digest = target_digest(target, self.hash_cache)
+            if digest is None:
+                return None, "无法读取目标内容", None
+        path = self.path(digest)
+        with _path_lock(path):
+            if os.path.isfile(path):
+                method, msg = STORE_EXISTS, "内容已存在"
+            elif self._link_from_peer(digest, path):
+                method, msg = STORE_SHARED, "与其他备份共用"
+            else:
+                method, msg = backup_target(target, path)
+        if method is None:
+            return None, msg, path
+        try:
+            self.manifest.append({"original_path": target, "backup_rel_path": object_rel_path(digest),
+                                  "hash": digest.hex(), "backed_up_at": self.timestamp})
+        except OSError as e:
+            # 没有记录就无法还原：按备份失败处理（目标尚未被替换）
+            if method in (BACKUP_LINK, BACKUP_MOVE):
+                _undo_backup(target, path, method)
+            return None, f"写入备份记录失败：{e}", path
+        return method, msg, path
+
+    def _link_from_peer(self, digest, path) -> bool:
+        rel = object_rel_path(digest).replace('/', os.sep)
+        for peer in self.peers:
+            candidate = os.path.join(peer, rel)
+            if not os.path.isfile(candidate):
+                continue
+            temp = f"{path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.link(candidate, temp)
+                os.replace(temp, path)
+                return True
+            except OSError:
+                try:
+                    if os.path.exists(temp):
+                        os.remove(temp)
+                except OSError:
+                    pass
+                return False  # 跨设备或不支持硬链接，其他 peer 多半也一样
+        return False
+
+
+# ------------------ 压缩包备份 ------------------
+# 压缩包内的一份备份内容：archive 为压缩包路径，member 为成员名，
+# mtime_ns / mode 为备份时目标的修改时间与权限位（旧的压缩包没有记录权限位）
+ArchiveMember = namedtuple("ArchiveMember", "archive member mtime_ns mode", defaults=(None,))
+
+
+def is_backup_archive(path: str) -> bool:
+    return bool(path) and path.lower().endswith(ARCHIVE_SUFFIX) and os.path.isfile(path)
+
+
+class ArchiveBackupWriter:
+    """把一次替换要备份的目标依次写进新的压缩包，最后写入 manifest.json
+
+    压缩包写完之后才开始替换目标，中途失败时目标都还未改动。
+    """
+
+    def __init__(self, archive_path: str):
+        self.archive_path = archive_path
+        parent = os.path.dirname(archive_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._zip = zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED,
+                                    compresslevel=ARCHIVE_COMPRESSLEVEL)
+        self._members = set()
+        self._entries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, target: str, digest: bytes):
+        """写入一个目标（相同内容只写一次），返回 (方式, 信息)，失败时方式为 None"""
+        member = object_rel_path(digest)
+        try:
+            st = os.stat(target)
+            if member in self._members:
+                method, msg = STORE_EXISTS, "内容已存在"
+            else:
+                with open(target, "rb") as src, self._zip.open(member, "w", force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                self._members.add(member)
+                method, msg = STORE_ARCHIVED, "已写入压缩包"
+        except OSError as e:
+            return None, f"写入压缩包失败：{e}"
+        self._entries.append({"backup_rel_path": member, "hash": digest.hex(),
+                              "original_path": target, "mtime_ns": st.st_mtime_ns,
+                              "mode": stat.S_IMODE(st.st_mode)})
+        return method, msg
+
+    def close(self, timestamp: Optional[str] = None):
+        """写入 manifest 并关闭压缩包"""
+        if self._zip is None:
+            return
+        for entry in self._entries:
+            entry["backed_up_at"] = timestamp
+        manifest = {"version": 3, "created_at": timestamp, "entries": self._entries}
+        try:
+            self._zip.writestr(MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=2))
+        finally:
+            self._zip.close()
+            self._zip = None
+
+
+class ArchiveReader:
+    """还原时共用的压缩包句柄（zipfile 读取成员时自带锁，可在多个线程中同时使用）"""
+
+    def __init__(self):
+        self._zips = {}
+        self._lock = threading.Lock()
+
+    def get(self, archive: str) -> zipfile.ZipFile:
+        with self._lock:
+            zf = self._zips.get(archive)
+            if zf is None:
+                zf = self._zips[archive] = zipfile.ZipFile(archive, "r")
+            return zf
+
+    def close(self):
+        with self._lock:
+            for zf in self._zips.values():
+                zf.close()
+            self._zips.clear()
+
+
+def restore_archive_member(ref: ArchiveMember, original_path: str, reader: ArchiveReader):
+    """把压缩包中的备份内容还原到原始位置（先写临时文件再替换），返回值格式同 restore_file"""
+    disp = f"{os.path.basename(original_path)} {{{original_path}}}"
+    temp = f"{original_path}.tmp"
+    try:
+        with _path_lock(original_path):
+            zf = reader.get(ref.archive)
+            with zf.open(ref.member) as src, open(temp, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            if ref.mode is not None:
+                os.chmod(temp, ref.mode)
+            if ref.mtime_ns:
+                os.utime(temp, ns=(ref.mtime_ns, ref.mtime_ns))
+            os.replace(temp, original_path)
+        return ("restore", disp), [(f"[还原成功] {original_path}", LOG_SUCCESS)]
+    except (OSError, KeyError, zipfile.BadZipFile) as e:
+        CopySource._discard(temp)
+        text = f"{disp} - 还原失败：{e}"
+        return ("error", text), [(f"错误：{text}", LOG_ERROR)]
+
+
+# ------------------ 读取备份记录 ------------------
+def has_manifest(backup: str) -> bool:
+    """备份（目录或压缩包）是否带有 manifest 记录"""
+    if is_backup_archive(backup):
+        return True
+    return (os.path.exists(os.path.join(backup, MANIFEST_LOG))
+            or os.path.exists(os.path.join(backup, MANIFEST_FILE)))
+
+
+class ManifestIndex:
+    """读入内存的备份记录，可按原始路径或备份相对路径直接查找
+
+    同一原始路径备份过多次时以最后一次为准（还原到最近一次替换前的内容）。
+    """
+
+    def __init__(self, backup: str):
+        self.backup = backup
+        self.archive = is_backup_archive(backup)
+        self.created_at = None  # 压缩包 manifest 中记录的备份时间
+        self.by_original = {}  # 原始路径 -> 条目
+        self.by_rel = {}  # 备份相对路径 -> [原始路径, ...]
+
+    def add(self, entry: dict):
+        rel = entry.get("backup_rel_path")
+        orig = entry.get("original_path")
+        if not rel or not orig:
+            return
+        old = self.by_original.get(orig)
+        if old is not None and old.get("backup_rel_path") != rel:
+            self.by_rel[old["backup_rel_path"]].remove(orig)
+        self.by_original[orig] = entry
+        originals = self.by_rel.setdefault(rel, [])
+        if orig not in originals:
+            originals.append(orig)
+
+    def __len__(self):
+        return len(self.by_original)
+
+    def ref(self, orig: str):
+        """原始路径对应的备份内容：目录备份为文件路径，压缩包备份为 ArchiveMember；没有记录时返回 None"""
+        entry = self.by_original.get(orig)
+        if entry is None:
+            return None
+        rel = entry["backup_rel_path"]
+        if self.archive:
+            return ArchiveMember(self.backup, rel, entry.get("mtime_ns"), entry.get("mode"))
+        return os.path.join(self.backup, rel.replace('/', os.sep))
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        """逐条产出 (原始路径, 备份内容)"""
+        for orig in self.by_original:
+            yield orig, self.ref(orig)
+
+    def originals_for(self, rel: str) -> List[str]:
+        """备份相对路径对应的全部原始路径（内容相同的多个目标共用一份备份）"""
+        return list(self.by_rel.get(rel, ()))
+
+
+def load_manifest(backup: str) -> Optional[ManifestIndex]:
+    """读取备份（目录或压缩包）的记录；没有记录时返回 None，旧版 manifest.json 损坏时抛出异常
+
+    目录备份依次读取旧版 manifest.json 与 manifest.jsonl；jsonl 中无法解析的行
+    （如写入中途断电留下的半行）直接跳过。
+    """
+    index = ManifestIndex(backup)
+    if index.archive:
+        with zipfile.ZipFile(backup, "r") as zf:
+            try:
+                data = json.loads(zf.read(MANIFEST_FILE).decode("utf-8"))
+            except KeyError:
+                return None
+        index.created_at = data.get("created_at")
+        for entry in data.get("entries", []):
+            index.add(entry)
+        return index
+
+    json_path = os.path.join(backup, MANIFEST_FILE)
+    log_path = os.path.join(backup, MANIFEST_LOG)
+    if not os.path.exists(json_path) and not os.path.exists(log_path):
+        return None
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            for entry in json.load(f).get("entries", []):
+                index.add(entry)
+    if os.path.exists(log_path):
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict):
+                    index.add(entry)
+    return index
+
+
+def backup_ref_exists(ref) -> bool:
+    """备份内容是否仍然存在"""
+    if isinstance(ref, ArchiveMember):
+        return os.path.isfile(ref.archive)  # 成员在还原时再检查，不逐个打开压缩包
+    return os.path.exists(ref)
@@ -15,8 +15,9 @@
 import sys
 import os
 import re
+import time
 from pathlib import Path
-from collections import deque
+from collections import deque, OrderedDict
 from typing import List, Tuple, Dict, Optional, Set
 from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -28,10 +29,15 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QH
                              QFileIconProvider, QStyle, QMenu, QScrollArea, QButtonGroup,
                              QRadioButton, QAbstractSpinBox, QSlider)
 from PyQt5.QtCore import QItemSelectionModel
-from PyQt5.QtCore import Qt, QModelIndex, QRectF, QRect, QEvent, QMimeData, QSettings, QFileInfo, QUrl
+from PyQt5.QtCore import (Qt, QModelIndex, QRectF, QRect, QSize, QPoint, QEvent, QMimeData, QSettings,
+                          QFileInfo, QUrl, QAbstractTableModel, QThread, pyqtSignal)
 from PyQt5.QtGui import (QPainter, QPainterPath, QBrush, QColor, QIcon, QPen,
-                         QFontMetrics, QStandardItemModel,
-                         QStandardItem, QDrag, QClipboard, QKeySequence, QDesktopServices)
+                         QFontMetrics, QDrag, QClipboard, QKeySequence, QDesktopServices)
+from RenameEngine import (RenameRuleSet, MATCH_MODES, INSERT_MODES, CASE_MODES, FILTER_MODES,
+                          matches_pattern, filter_entries, validate_rename_operation,
+                          plan_renames, execute_renames, undo_renames, path_key,
+                          iter_dir_files, iter_subfolders, sort_deepest_first)
+from IconCache import shared_icon_cache
 
 
 """自定义代理：绘制制圆角彩色块高亮"""
@@ -412,6 +418,172 @@ class HighlightDelegate(QStyledItemDelegate):
             super().paint(painter, option, index)
 
 
+class _RowCache:
+    """按行号缓存的计算结果，容量有限（最久未用的先淘汰），内存不随行数增长"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def get(self, row):
+        value = self._items.get(row)
+        if value is not None:
+            self._items.move_to_end(row)
+        return value
+
+    def put(self, row, value):
+        self._items[row] = value
+        self._items.move_to_end(row)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+class RenameTableModel(QAbstractTableModel):
+    """重命名列表模型：直接读取 file_data，只在视图请求时计算可见行的文本、高亮和图标
+
+    预览规则变化后先只重算可见行；其余行不在空闲时预先填充，滚动到时才由 data() 计算，
+    结果放入容量有限的行缓存，因此任何列表规模下输入都不会被后台填充拖慢。
+    """
+    HIGHLIGHT_ROLE = Qt.UserRole + 1
+    ROW_CACHE_SIZE = 4096  # 缓存最近绘制过的行（远多于一屏），滚动回来时不必重算
+    FAST_ICON_ROWS = 20000  # 超过该行数时只显示通用图标，不再逐个查询
+
+    def __init__(self, owner, headers, is_right_side=False, parent=None):
+        super().__init__(parent)
+        self.owner = owner  # 数据来源：owner.file_data
+        self.headers = headers
+        self.is_right_side = is_right_side
+        self.rules = None  # 右侧：预览规则快照；左侧：查找高亮规则快照
+        self.icon_cache = shared_icon_cache()
+        # 只缓存视图请求过的行；图标本身按扩展名共用（IconCache），这里只省去每次绘制的 stat
+        self._parts_cache = _RowCache(self.ROW_CACHE_SIZE)
+        self._icon_cache = _RowCache(self.ROW_CACHE_SIZE)
+        self._edits = {}  # 双击编辑后的显示文本（与原先可编辑单元格行为一致）
+
+    # ------------------ 模型刷新 ------------------
+    def reset(self):
+        """file_data 变化后重置模型（O(1)，不逐行创建对象）"""
+        self.beginResetModel()
+        self._parts_cache.clear()
+        self._icon_cache.clear()
+        self._edits.clear()
+        self.endResetModel()
+
+    def set_rules(self, rules):
+        """更新规则快照：行数不变，只让名称列失效重绘，不触发视图重新布局"""
+        self.rules = rules
+        self._parts_cache.clear()
+        if self.is_right_side:
+            self._edits.clear()
+        row_count = self.rowCount()
+        if row_count:
+            self.dataChanged.emit(self.index(0, 2), self.index(row_count - 1, 2))
+
+    # ------------------ 按行计算 ------------------
+    def highlight_parts(self, row):
+        """获取某行名称列的高亮分段（带缓存）"""
+        parts = self._parts_cache.get(row)
+        if parts is not None:
+            return parts
+        _, original_name, _ = self.owner.file_data[row]
+        try:
+            if self.rules is None:
+                parts = [(original_name, None)] if self.is_right_side else []
+            elif self.is_right_side:
+                parts, _ = self.rules.apply(original_name, row)
+            else:
+                parts = self.rules.find_parts(original_name)
+        except Exception as e:
+            print(f"预览错误: {original_name}: {e}")
+            parts = [(original_name, None)] if self.is_right_side else []
+        self._parts_cache.put(row, parts)
+        return parts
+
+    def display_name(self, row):
+        """名称列显示的文本"""
+        if self.is_right_side:
+            return ''.join([text for text, _ in self.highlight_parts(row)])
+        return self.owner.file_data[row][1]
+
+    def icon(self, row):
+        """名称列图标（最近绘制过的行有缓存，同扩展名共用一个系统图标）"""
+        icon = self._icon_cache.get(row)
+        if icon is None:
+            path = self.owner.file_data[row][0]
+            if len(self.owner.file_data) > self.FAST_ICON_ROWS:
+                # 超大列表：按当前模式直接给通用图标，连 stat 也省掉
+                icon = self.icon_cache.icon(path, is_dir=getattr(self.owner, 'folder_mode', False), fast=True)
+            else:
+                icon = self.icon_cache.icon(path)
+            self._icon_cache.put(row, icon)
+        return icon
+
+    # ------------------ QAbstractTableModel 接口 ------------------
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.owner.file_data)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self.headers):
+            return self.headers[section]
+        return None
+
+    # 平铺列表：声明没有子项，QTreeView 布局时就不必逐行询问 hasChildren
+    ITEM_FLAGS = Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsEditable | Qt.ItemNeverHasChildren
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return self.ITEM_FLAGS
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        column = index.column()
+        if row >= len(self.owner.file_data):
+            return None
+
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            edited = self._edits.get((row, column))
+            if edited is not None:
+                return edited
+            if column in (0, 4):
+                return str(row + 1)
+            if column == 2:
+                return self.display_name(row)
+            if column == 3:
+                src_path = self.owner.file_data[row][0]
+                return src_path if self.is_right_side else self.owner._get_display_path(src_path)
+            return ""
+        if role == Qt.UserRole:
+            return self.owner.file_data[row][0]
+        if column == 2:
+            if role == self.HIGHLIGHT_ROLE:
+                return self.highlight_parts(row)
+            if role == Qt.DecorationRole:
+                return self.icon(row)
+        if role == Qt.TextAlignmentRole and column in (0, 4):
+            return int(Qt.AlignLeft | Qt.AlignVCenter)
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        self._edits[(index.row(), index.column())] = value
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+
 class FolderDropDialog(QDialog):
     """文件夹拖放处理对话框"""
     def __init__(self, parent=None):
@@ -699,13 +871,109 @@ class ColorConfigDialog(QDialog):
         return self.colors.copy()
 
 
+class PathScanWorker(QThread):
+    """后台扫描添加的文件/文件夹，分批把结果发回界面线程，可随时取消"""
+    batch_signal = pyqtSignal(list)
+    progress_signal = pyqtSignal(int)
+    finished_signal = pyqtSignal(bool)  # 参数：是否被取消
+
+    BATCH_SIZE = 500  # 每批最多条目数
+    BATCH_INTERVAL = 0.1  # 两批之间最长间隔（秒）
+
+    def __init__(self, paths, recursive=False, folder_mode=False):
+        super().__init__()
+        self.paths = [str(p) for p in paths]
+        self.recursive = recursive
+        self.folder_mode = folder_mode
+        self.is_running = True
+        self.found_count = 0
+        self._batch = []
+        self._last_emit = time.monotonic()
+
+    def run(self):
+        for path in self.paths:
+            if not self.is_running:
+                break
+            try:
+                if self.folder_mode:
+                    self._scan_folders(path)
+                else:
+                    self._scan_files(path)
+            except Exception as e:
+                print(f"处理路径失败 {path}: {e}")
+        self._flush()
+        self.finished_signal.emit(not self.is_running)
+
+    def _scan_files(self, path):
+        """文件名模式：导入文件本身或文件夹内的文件"""
+        if os.path.isfile(path):
+            self._add(path)
+        elif os.path.isdir(path):
+            for file_path in iter_dir_files(path, self.recursive):
+                if not self.is_running:
+                    return
+                self._add(file_path)
+        else:
+            print(f"路径不存在，跳过: {path}")
+
+    def _scan_folders(self, path):
+        """文件夹名模式：导入文件夹本身，递归时导入全部子文件夹（最深层在前）
+
+        发出的路径都是文件夹，界面线程不必再逐个判断。
+        """
+        if not os.path.isdir(path):
+            print(f"文件夹不存在: {path}")
+            return
+        if not os.access(path, os.R_OK):
+            print(f"无读取权限: {path}")
+            return
+        if not self.recursive:
+            self._add(path)
+            return
+        # 需要整体按深度排序，先收集本文件夹下的全部子文件夹，期间照常更新计数
+        all_dirs = []
+        for dir_path in iter_subfolders(path):
+            if not self.is_running:
+                return
+            all_dirs.append(dir_path)
+            self.found_count += 1
+            if len(all_dirs) % self.BATCH_SIZE == 0:
+                self.progress_signal.emit(self.found_count)
+        self.found_count -= len(all_dirs)
+        for dir_path in sort_deepest_first(all_dirs):
+            self._add(dir_path)
+
+    def _add(self, path):
+        self._batch.append(path)
+        self.found_count += 1
+        if len(self._batch) >= self.BATCH_SIZE or time.monotonic() - self._last_emit >= self.BATCH_INTERVAL:
+            self._flush()
+
+    def _flush(self):
+        self._last_emit = time.monotonic()
+        if self._batch:
+            self.batch_signal.emit(self._batch)
+            self._batch = []
+        self.progress_signal.emit(self.found_count)
+
+    def stop(self):
+        self.is_running = False
+
+
 class BatchRenameWidget(QWidget):
+    PREVIEW_DELAY_MS = 150  # 选项停止变化多久后刷新预览
+
     def __init__(self):
         super().__init__()
         self.file_data: List[Tuple[str, str, Dict]] = []  # (src_path_str, original_name, processed_info)
         self.original_file_data: List[Tuple[str, str, Dict]] = []  # 备份原始文件数据
         self.removed_items = []
         self.last_undo_stack = deque(maxlen=20)
+        self._folder_common_parent = None  # 文件夹共同父级缓存，重建列表时失效
+        self._path_index: Set[str] = set()  # file_data 中已有路径的索引，用于 O(1) 去重
+        self._scan_worker = None  # 正在运行的后台扫描
+        self._scan_queue = deque()  # 等待扫描的任务：(paths, recursive, folder_mode)
+        self._stopped_scans = set()  # 已停止但线程尚未退出的扫描，退出前保持引用
         self.sync_vertical_enabled = True
         self.sync_horizontal_enabled = True
         self.sync_column_enabled = True
@@ -722,6 +990,14 @@ class BatchRenameWidget(QWidget):
         # 加载颜色配置
         self.load_color_config()
 
+        # 预览调度：输入连续变化时合并为一次预览
+        self._find_highlight_pending = False
+        self._shown_rule_error = None  # 查找框上当前标出的正则错误
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(self.PREVIEW_DELAY_MS)
+        self._preview_timer.timeout.connect(self.on_preview)
+
         self._setup_ui()
 
         # 同步滚动
@@ -730,8 +1006,8 @@ class BatchRenameWidget(QWidget):
         self.left_tree.horizontalScrollBar().valueChanged.connect(self.sync_horizontal)
         self.right_tree.horizontalScrollBar().valueChanged.connect(self.sync_horizontal)
 
-        self.find_edit.textChanged.connect(self._update_find_highlight)
-        self.match_mode.currentIndexChanged.connect(self._update_find_highlight)
+        self.find_edit.textChanged.connect(self.schedule_find_highlight)
+        self.match_mode.currentIndexChanged.connect(self.schedule_find_highlight)
 
     def _setup_ui(self):
         layout = QHBoxLayout(self)
@@ -744,13 +1020,13 @@ class BatchRenameWidget(QWidget):
         self.left_tree = QTreeView()
         self.left_tree.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.left_tree.setRootIsDecorated(False)
+        self.left_tree.setUniformRowHeights(True)  # 行高一致，大列表布局不必逐行测量
         self.left_tree.setIndentation(0)
         # 禁用自动滚动到最左侧
         self.left_tree.setAutoScroll(False)
         
         # 左侧模型 - 添加箭头列
-        self.left_model = QStandardItemModel(0, 5)
-        self.left_model.setHorizontalHeaderLabels(["编号", "", "原始目标名", "路径", "编号"])
+        self.left_model = RenameTableModel(self, ["编号", "", "原始目标名", "路径", "编号"])
         self.left_tree.setModel(self.left_model)
         
         # 设置列宽 - 箭头列宽度刚好放下箭头
@@ -786,6 +1062,19 @@ class BatchRenameWidget(QWidget):
         left_buttons.addWidget(btn_clear)
         # left_buttons.addWidget(self.recursive_cb)
         left_layout.addLayout(left_buttons)
+
+        # 后台扫描状态：实时计数 + 取消按钮，扫描时才显示
+        self.scan_status = QWidget()
+        scan_layout = QHBoxLayout(self.scan_status)
+        scan_layout.setContentsMargins(2, 2, 2, 2)
+        self.scan_label = QLabel()
+        self.scan_cancel_btn = QPushButton("取消")
+        self.scan_cancel_btn.setToolTip("停止扫描，已找到的项目保留在列表中")
+        self.scan_cancel_btn.clicked.connect(self.cancel_scan)
+        scan_layout.addWidget(self.scan_label, 1)
+        scan_layout.addWidget(self.scan_cancel_btn)
+        self.scan_status.hide()
+        left_layout.addWidget(self.scan_status)
         left_layout.addWidget(self.left_tree)
         btn_add_folder.clicked.connect(self.on_add_folder)
         btn_add_files.clicked.connect(self.on_add_files)
@@ -796,13 +1085,13 @@ class BatchRenameWidget(QWidget):
         self.right_tree = QTreeView()
         self.right_tree.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.right_tree.setRootIsDecorated(False)
+        self.right_tree.setUniformRowHeights(True)
         self.right_tree.setIndentation(0)
         # 禁用自动滚动到最左侧
         self.right_tree.setAutoScroll(False)
         
         # 右侧模型 - 添加箭头列
-        self.right_model = QStandardItemModel(0, 5)
-        self.right_model.setHorizontalHeaderLabels(["编号", "", "新目标名", "路径", "编号"])
+        self.right_model = RenameTableModel(self, ["编号", "", "新目标名", "路径", "编号"], is_right_side=True)
         self.right_tree.setModel(self.right_model)
         
         # 设置自定义代理 - 右侧树视图使用红色箭头
@@ -1120,7 +1409,7 @@ class BatchRenameWidget(QWidget):
         
         # 使用add_row函数添加筛选控件
         self.filter_mode_combo = QComboBox()
-        self.filter_mode_combo.addItems(["前缀", "后缀", "包含关键词", "正则匹配"])
+        self.filter_mode_combo.addItems(FILTER_MODES)
         add_row("筛选模式：", [self.filter_mode_combo], filter_layout)
         
         self.filter_pattern_edit = QLineEdit()
@@ -1128,7 +1417,7 @@ class BatchRenameWidget(QWidget):
         add_row("筛选内容：", [self.filter_pattern_edit], filter_layout)
         
         self.skip_mode_combo = QComboBox()
-        self.skip_mode_combo.addItems(["前缀", "后缀", "包含关键词", "正则匹配"])
+        self.skip_mode_combo.addItems(FILTER_MODES)
         add_row("跳过模式：", [self.skip_mode_combo], filter_layout)
         
         self.skip_pattern_edit = QLineEdit()
@@ -1246,7 +1535,7 @@ class BatchRenameWidget(QWidget):
         
         # 匹配模式（位于多目标之后）
         self.match_mode = QComboBox()
-        self.match_mode.addItems(["普通匹配", "正则匹配"])
+        self.match_mode.addItems(MATCH_MODES)
         add_row("匹配模式：", [self.match_mode], find_layout)
         
         # 创建配对数量行（默认跟随多目标选项显示隐藏），对齐并缩小行距
@@ -1315,11 +1604,7 @@ class BatchRenameWidget(QWidget):
         self.replace_color_btn.clicked.connect(lambda: self._choose_color_direct("replace"))
         add_color_row("替换为：", [self.replace_edit], self.replace_color_btn, single_target_layout)
         
-        # 连接textChanged信号到预览方法，确保即使不开启高光也能实时更新
-        self.find_edit.textChanged.connect(self.on_preview)
-        self.find_edit.textChanged.connect(self._update_find_highlight)  # 查找内容变化时更新查找高亮
-        self.replace_edit.textChanged.connect(self.on_preview)
-        self.replace_edit.textChanged.connect(self._update_find_highlight)  # 替换内容变化时也更新查找高亮
+        # 查找/替换内容变化时的预览刷新统一在下方 all_widgets 中连接（防抖合并）
         
         find_layout.addWidget(self.single_target_widget)
         
@@ -1435,7 +1720,7 @@ class BatchRenameWidget(QWidget):
         number_layout.addLayout(enable_row)
         
         self.insert_after_combo = QComboBox()
-        self.insert_after_combo.addItems(["开头", "末尾", "关键词前", "关键词后"])
+        self.insert_after_combo.addItems(INSERT_MODES)
         self.insert_after_combo.setCurrentIndex(1)
         self.insert_after_edit = QLineEdit()
         self.insert_after_edit.setPlaceholderText("指定关键词")
@@ -1558,7 +1843,7 @@ class BatchRenameWidget(QWidget):
         # 杂项 - 移到顶部容器，紧挨着删除范围组
         case_group, case_layout = create_group("杂项")
         self.case_combo = QComboBox()
-        self.case_combo.addItems(["不变", "大写", "小写", "标题格式"])
+        self.case_combo.addItems(CASE_MODES)
         add_row("大小写：", [self.case_combo], case_layout)
         top_inputs_layout.addWidget(case_group)
 
@@ -1593,13 +1878,13 @@ class BatchRenameWidget(QWidget):
         ]
         for w in all_widgets:
             if isinstance(w, QSpinBox):
-                w.valueChanged.connect(self.on_preview)
+                w.valueChanged.connect(self.schedule_preview)
             elif isinstance(w, QComboBox):
-                w.currentIndexChanged.connect(self.on_preview)
+                w.currentIndexChanged.connect(self.schedule_preview)
             elif isinstance(w, QLineEdit):
-                w.textChanged.connect(self.on_preview)
+                w.textChanged.connect(self.schedule_preview)
             elif isinstance(w, QCheckBox):
-                w.stateChanged.connect(self.on_preview)
+                w.stateChanged.connect(self.schedule_preview)
 
         self.remove_from.valueChanged.connect(self._update_remove_to_min)
         self._update_remove_to_min()
@@ -1710,6 +1995,7 @@ class BatchRenameWidget(QWidget):
         start_row = current_row
         found = False
         target_row = -1
+        rules = self._build_rule_set()
         
         # 从当前行开始查找
         for row in range(start_row, len(self.file_data)):
@@ -1718,9 +2004,8 @@ class BatchRenameWidget(QWidget):
             if not src.exists():
                 continue
                 
-            parts, _ = self.build_new_name(original_name, row)
             # 应用时排除被标记为删除的片段
-            new_name = ''.join([text for text, role in parts if role != "delete"])
+            new_name = rules.new_name(original_name, row)
             dst = src.with_name(new_name)
             
             if src == dst:
@@ -1740,9 +2025,8 @@ class BatchRenameWidget(QWidget):
         # 执行单个重命名
         src_path, original_name, processed_info = self.file_data[target_row]
         src = Path(src_path)
-        parts, _ = self.build_new_name(original_name, target_row)
         # 应用时排除被标记为删除的片段
-        new_name = ''.join([text for text, role in parts if role != "delete"])
+        new_name = rules.new_name(original_name, target_row)
         dst = src.with_name(new_name)
         
         try:
@@ -1907,173 +2191,144 @@ class BatchRenameWidget(QWidget):
         self.on_preview()
         
     def add_paths(self, paths, recursive=False):
-        """添加文件路径 - 修复路径处理问题"""
-        # 清除文件夹模式标志
-        self.folder_mode = False
-        if hasattr(self, 'folder_paths'):
+        """添加文件路径（文件夹内的文件在后台扫描，结果分批加入列表）"""
+        self._start_scan(paths, recursive, folder_mode=False)
+
+    def add_folder_names(self, folder_paths, recursive=False):
+        """添加文件夹名称（用于重命名文件夹，子文件夹在后台扫描）"""
+        self._start_scan(folder_paths, recursive, folder_mode=True)
+
+    # ------------------ 后台扫描 ------------------
+    def _start_scan(self, paths, recursive, folder_mode):
+        """排队一次扫描任务；拖入文件夹和文件时会连续提交，按顺序执行"""
+        self._scan_queue.append((list(paths), recursive, folder_mode))
+        if self._scan_worker is None:
+            self._run_next_scan()
+
+    def _run_next_scan(self):
+        """启动队列中的下一次扫描"""
+        if not self._scan_queue:
+            self.scan_status.hide()
+            return
+        paths, recursive, folder_mode = self._scan_queue.popleft()
+
+        # 切换文件/文件夹模式标志（与原先同步添加时一致）
+        self.folder_mode = folder_mode
+        if folder_mode:
+            if not hasattr(self, 'folder_paths'):
+                self.folder_paths = set()
+        elif hasattr(self, 'folder_paths'):
             self.folder_paths.clear()
-        
-        added_count = 0
-        duplicate_count = 0
-        
+
+        self._scan_added = 0
+        self._scan_duplicates = 0
+        worker = PathScanWorker(paths, recursive, folder_mode)
+        worker.batch_signal.connect(self._on_scan_batch)
+        worker.progress_signal.connect(self._on_scan_progress)
+        worker.finished_signal.connect(self._on_scan_finished)
+        self._scan_worker = worker
+        self._on_scan_progress(0)
+        self.scan_cancel_btn.setEnabled(True)
+        self.scan_status.show()
+        worker.start()
+
+    def _on_scan_batch(self, paths):
+        """把一批扫描结果追加到列表末尾（左右模型只插入新行，不整体重置）"""
+        if not self._is_current_scan(self.sender()):
+            return  # 已停止的扫描残留的信号
+        new_paths = []
+        batch_keys = set()
         for path in paths:
-            path_str = str(path)
-            try:
-                # 安全地检查路径是否存在
-                path_obj = Path(path_str)
-                if not path_obj.exists():
-                    print(f"路径不存在，跳过: {path_str}")
-                    continue
-                    
-                if path_obj.is_dir():
-                    if recursive:
-                        # 安全地遍历目录
-                        try:
-                            for root, _, files in os.walk(path_str):
-                                for file in files:
-                                    file_path = os.path.join(root, file)
-                                    try:
-                                        if self._add_file_to_trees(file_path):
-                                            added_count += 1
-                                        else:
-                                            duplicate_count += 1
-                                    except Exception as file_error:
-                                        print(f"添加文件失败 {file_path}: {file_error}")
-                                        continue
-                        except Exception as walk_error:
-                            print(f"遍历目录失败 {path_str}: {walk_error}")
-                            continue
-                    else:
-                        # 非递归模式，安全地扫描当前目录
-                        try:
-                            for entry in os.scandir(path_str):
-                                if entry.is_file():
-                                    try:
-                                        if self._add_file_to_trees(entry.path):
-                                            added_count += 1
-                                        else:
-                                            duplicate_count += 1
-                                    except Exception as file_error:
-                                        print(f"添加文件失败 {entry.path}: {file_error}")
-                                        continue
-                        except Exception as scan_error:
-                            print(f"扫描目录失败 {path_str}: {scan_error}")
-                            continue
-                elif path_obj.is_file():
-                    if self._add_file_to_trees(path_str):
-                        added_count += 1
-                    else:
-                        duplicate_count += 1
-            except Exception as e:
-                print(f"处理路径失败 {path_str}: {e}")
-                continue  # 继续处理其他路径
-                
-        self.on_preview()
-        
-        # 备份原始文件数据
-        self.original_file_data = self.file_data.copy()
-        
-        # 显示添加结果（注释掉弹窗提示）
-        # if duplicate_count > 0:
-        #     QMessageBox.information(self, "添加完成", 
-        #         f"成功添加 {added_count} 个文件，跳过 {duplicate_count} 个重复文件")
+            key = path_key(path)
+            if key in self._path_index or key in batch_keys:
+                self._scan_duplicates += 1
+                continue
+            batch_keys.add(key)
+            new_paths.append(path)
+        if not new_paths:
+            return
+
+        first = len(self.file_data)
+        last = first + len(new_paths) - 1
+        self.left_model.beginInsertRows(QModelIndex(), first, last)
+        self.right_model.beginInsertRows(QModelIndex(), first, last)
+        if self.folder_mode:
+            for path in new_paths:
+                if self._add_folder_to_trees(path):
+                    self.folder_paths.add(path)
+        else:
+            for path in new_paths:
+                self._add_file_to_trees(path)
+        self.left_model.endInsertRows()
+        self.right_model.endInsertRows()
+        # 文件夹的显示路径依赖共同父级：只用新增的文件夹更新，变化时让已有行的路径列重绘
+        if self.folder_mode and self._extend_folder_common_parent(new_paths) and first > 0:
+            self.left_model.dataChanged.emit(self.left_model.index(0, 3), self.left_model.index(first - 1, 3))
+        self._scan_added += len(new_paths)
+
+    def _on_scan_progress(self, found_count):
+        """更新扫描计数"""
+        kind = "文件夹" if self.folder_mode else "文件"
+        self.scan_label.setText(f"正在扫描{kind}... 已找到 {found_count} 个")
+
+    def _on_scan_finished(self, cancelled):
+        """扫描结束：刷新预览、备份原始数据，再继续队列中的下一次扫描"""
+        worker = self.sender()
+        if not self._is_current_scan(worker):
+            return
+        self._scan_worker = None
+        worker.wait()  # finished_signal 是 run() 的最后一步，这里只等线程真正退出
+        if cancelled:
+            print(f"扫描已取消，已添加 {self._scan_added} 项")
+        elif self._scan_duplicates:
+            print(f"扫描完成：添加 {self._scan_added} 项，跳过 {self._scan_duplicates} 个重复项")
 
-    def add_folder_names(self, folder_paths, recursive=False):
-        """添加文件夹名称（用于重命名文件夹）"""
-        # 设置文件夹模式标志
-        self.folder_mode = True
-        if not hasattr(self, 'folder_paths'):
-            self.folder_paths = set()
-        
-        added_count = 0
-        duplicate_count = 0
-        permission_error_count = 0
-        
-        for folder_path in folder_paths:
-            folder_str = str(folder_path)
-            try:
-                # 检查文件夹是否存在和可访问
-                if not os.path.exists(folder_str):
-                    print(f"文件夹不存在: {folder_str}")
-                    continue
-                    
-                if not os.access(folder_str, os.R_OK):
-                    print(f"无读取权限: {folder_str}")
-                    permission_error_count += 1
-                    continue
-                
-                if recursive:
-                    # 递归模式：添加文件夹及其所有子文件夹，按深度降序排序
-                    all_dirs = []
-                    for root, dirs, _ in os.walk(folder_str):
-                        # 过滤掉无权限的目录
-                        dirs[:] = [d for d in dirs if os.access(os.path.join(root, d), os.R_OK)]
-                        
-                        for dir_name in dirs:
-                            dir_path = os.path.join(root, dir_name)
-                            try:
-                                # 检查目录是否为符号链接
-                                if os.path.islink(dir_path):
-                                    continue  # 跳过符号链接
-                                
-                                # 计算路径深度（分隔符数量）
-                                depth = dir_path.count(os.sep)
-                                all_dirs.append((depth, dir_path))
-                            except (PermissionError, OSError) as e:
-                                print(f"跳过无权限目录 {dir_path}: {e}")
-                                permission_error_count += 1
-                    
-                    # 按深度降序排序（最深层的在上方）
-                    all_dirs.sort(key=lambda x: x[0], reverse=True)
-                    
-                    # 按排序后的顺序添加文件夹
-                    for depth, dir_path in all_dirs:
-                        if self._add_folder_to_trees(dir_path):
-                            self.folder_paths.add(dir_path)
-                            added_count += 1
-                        else:
-                            duplicate_count += 1
-                else:
-                    # 非递归模式：只添加当前文件夹
-                    if self._add_folder_to_trees(folder_str):
-                        self.folder_paths.add(folder_str)
-                        added_count += 1
-                    else:
-                        duplicate_count += 1
-            except (PermissionError, OSError) as e:
-                print(f"添加文件夹失败（权限错误） {folder_str}: {e}")
-                permission_error_count += 1
-            except Exception as e:
-                print(f"添加文件夹失败 {folder_str}: {e}")
-        
-        # 重建左侧树视图以显示文件夹
-        self._rebuild_left_tree()
-        
         self.on_preview()
-        
         # 备份原始文件数据
         self.original_file_data = self.file_data.copy()
-        
-        # 显示添加结果（注释掉弹窗提示）
-        # message_parts = []
-        # if added_count > 0:
-        #     message_parts.append(f"成功添加 {added_count} 个文件夹")
-        # if duplicate_count > 0:
-        #     message_parts.append(f"跳过 {duplicate_count} 个重复文件夹")
-        # if permission_error_count > 0:
-        #     message_parts.append(f"跳过 {permission_error_count} 个无权限文件夹")
-        # 
-        # if message_parts:
-        #     QMessageBox.information(self, "添加完成", "，".join(message_parts))
+        self._run_next_scan()
+
+    def _is_current_scan(self, worker):
+        """信号是否来自当前扫描（已停止甚至已销毁的线程发出的排队信号要忽略）"""
+        return worker is not None and worker is self._scan_worker
+
+    def cancel_scan(self):
+        """取消当前扫描和排队中的扫描，已加入列表的项目保留"""
+        self._scan_queue.clear()
+        if self._scan_worker is not None:
+            self._scan_worker.stop()
+            self.scan_cancel_btn.setEnabled(False)
+            self.scan_label.setText("正在取消扫描...")
+
+    def stop_scan(self):
+        """立即停止后台扫描（清空列表、关闭窗口时调用）"""
+        self._scan_queue.clear()
+        worker = self._scan_worker
+        if worker is None:
+            return
+        self._scan_worker = None  # 之后到达的批次和结束信号都会被忽略
+        worker.stop()
+        if not worker.wait(1000):
+            # 卡在慢速目录上时不阻塞界面，等线程退出后再释放
+            self._stopped_scans.add(worker)
+            worker.finished.connect(lambda: self._release_scan(worker))
+        self.scan_status.hide()
+
+    def _release_scan(self, worker):
+        """已停止的扫描线程退出后释放引用"""
+        worker.wait()
+        self._stopped_scans.discard(worker)
 
     def _add_folder_to_trees(self, folder_path: str) -> bool:
         """添加文件夹到树形视图，返回是否成功添加"""
-        if any(item[0] == folder_path for item in self.file_data):
+        key = path_key(folder_path)
+        if key in self._path_index:
             return False  # 文件夹已存在
 
         try:
             original_name = os.path.basename(folder_path)
             self.file_data.append((folder_path, original_name, {}))
+            self._path_index.add(key)
             
             # 不要在这里立即重建，让调用者统一处理
             return True
@@ -2087,149 +2342,99 @@ class BatchRenameWidget(QWidget):
         # 保留空方法以保持兼容性，但直接返回空集合
         return set()
 
+    def _get_folder_common_parent(self):
+        """计算所有文件夹路径的共同父级（每次重建列表后只计算一次），无法计算时返回 None"""
+        if self._folder_common_parent is not None:
+            return self._folder_common_parent[0]
+        folder_paths = [item[0] for item in self.file_data if os.path.isdir(item[0])]
+        common_parent = self._common_folder_parent(folder_paths)
+        self._folder_common_parent = (common_parent, len(folder_paths))
+        return common_parent
+
+    def _extend_folder_common_parent(self, new_folders) -> bool:
+        """后台扫描追加了一批文件夹：在已算出的共同父级上合并新文件夹（不再逐行 stat），返回是否变化"""
+        if self._folder_common_parent is None or not new_folders:
+            return False  # 尚未计算过，显示时再整体计算
+        old_parent, count = self._folder_common_parent
+        if count and old_parent is None:
+            common_parent = None  # 已有的文件夹不在同一驱动器上，追加后仍然如此
+        else:
+            common_parent = self._common_folder_parent(([old_parent] if count else []) + list(new_folders))
+        self._folder_common_parent = (common_parent, count + len(new_folders))
+        return common_parent != old_parent
+
+    @staticmethod
+    def _common_folder_parent(folder_paths):
+        """文件夹路径的共同父级；不在同一驱动器上或无法计算时返回 None"""
+        try:
+            if folder_paths:
+                # 检查所有路径是否在同一驱动器上，不同驱动器时直接显示文件夹名
+                first_drive = os.path.splitdrive(folder_paths[0])[0]
+                if all(os.path.splitdrive(path)[0] == first_drive for path in folder_paths[1:]):
+                    return os.path.commonpath(folder_paths)
+        except (ValueError, OSError):
+            pass
+        return None
+
     def _get_relative_folder_path(self, folder_path: str) -> str:
         """获取文件夹的相对路径（从共同父级开始）"""
         try:
-            # 找到所有文件夹路径的共同父级
-            folder_paths = [item[0] for item in self.file_data if os.path.isdir(item[0])]
-            if not folder_paths:
-                return os.path.basename(folder_path)
-            
-            # 使用pathlib.Path获得更好的跨平台兼容性
             folder_path_obj = Path(folder_path)
+            common_parent = self._get_folder_common_parent()
+            if common_parent is None:
+                return folder_path_obj.name
             
-            # 检查所有路径是否在同一驱动器上
-            try:
-                # 使用os.path.commonpath找到共同路径
-                common_parent = os.path.commonpath(folder_paths)
-                
-                # 检查是否在同一驱动器上
-                if len(folder_paths) > 1:
-                    first_drive = Path(folder_paths[0]).drive
-                    for path in folder_paths[1:]:
-                        if Path(path).drive != first_drive:
-                            # 不同驱动器，直接返回文件夹名
-                            return os.path.basename(folder_path)
-                
-                # 如果共同父级就是当前文件夹的父级，返回文件夹名
-                if common_parent == str(folder_path_obj.parent):
-                    return folder_path_obj.name
-                
-                # 否则返回从共同父级开始的相对路径
-                relative_path = os.path.relpath(folder_path, common_parent)
-                return relative_path
-                
-            except (ValueError, OSError):
-                # 如果路径跨不同驱动器或无法计算共同路径，返回文件夹名
+            # 如果共同父级就是当前文件夹的父级，返回文件夹名
+            if common_parent == str(folder_path_obj.parent):
                 return folder_path_obj.name
             
+            # 否则返回从共同父级开始的相对路径
+            return os.path.relpath(folder_path, common_parent)
+            
         except Exception as e:
             print(f"计算相对路径失败 {folder_path}: {e}")
             # 出错时返回文件夹名而不是完整路径
             return os.path.basename(folder_path)
 
+    def _get_display_path(self, src_path: str) -> str:
+        """左侧路径列显示的内容：文件夹模式下显示从共同父级开始的相对路径"""
+        if getattr(self, 'folder_mode', False) and src_path in getattr(self, 'folder_paths', set()):
+            return self._get_relative_folder_path(src_path)
+        return src_path
+
     def _add_file_to_trees(self, file_path: str) -> bool:
         """添加文件到树形视图，返回是否成功添加"""
-        if any(item[0] == file_path for item in self.file_data):
+        key = path_key(file_path)
+        if key in self._path_index:
             return False  # 文件已存在
 
         try:
             original_name = os.path.basename(file_path)
             self.file_data.append((file_path, original_name, {}))
-
-            # 添加到左侧模型
-            idx = len(self.file_data)
-            item0 = QStandardItem(str(idx))
-            item0.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            item0.setData(file_path, Qt.UserRole)
-            
-            item1 = QStandardItem("")  # 箭头列，空内容
-            item1.setData(file_path, Qt.UserRole)
-            
-            item2 = QStandardItem(original_name)
-            item2.setData(file_path, Qt.UserRole)
-            
-            # 根据是否是文件夹模式显示不同的路径
-            display_path = file_path
-            if hasattr(self, 'folder_mode') and self.folder_mode and file_path in getattr(self, 'folder_paths', set()):
-                # 文件夹模式下，显示从共同父级开始的相对路径
-                display_path = self._get_relative_folder_path(file_path)
-            
-            item3 = QStandardItem(display_path)
-            item3.setData(file_path, Qt.UserRole)
-            
-            item4 = QStandardItem(str(idx))
-            item4.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            item4.setData(file_path, Qt.UserRole)
-            
-            row = [item0, item1, item2, item3, item4]
-            self.left_model.appendRow(row)
-
-            # 设置图标
-            file_info = QFileInfo(file_path)
-            icon_provider = QFileIconProvider()
-            icon = icon_provider.icon(file_info)
-            item2.setIcon(icon)
+            self._path_index.add(key)
             
+            # 不要在这里立即刷新模型，让调用者统一重建
             return True
         except Exception as e:
             print(f"添加文件失败 {file_path}: {e}")
             return False
 
     def _rebuild_left_tree(self):
-        """重建左侧树 - 添加异常处理和性能优化"""
+        """重建左侧树 - 只重置模型（右侧行数跟随），行内容在显示时按需计算"""
         try:
-            self.left_model.removeRows(0, self.left_model.rowCount())
-            
-            # 批量添加项目以提高性能
-            items_to_add = []
-            
-            for idx, (src_path, original_name, _) in enumerate(self.file_data):
-                try:
-                    item0 = QStandardItem(str(idx + 1))
-                    item0.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                    item0.setData(src_path, Qt.UserRole)
-                    
-                    item1 = QStandardItem("")  # 箭头列，空内容
-                    item1.setData(src_path, Qt.UserRole)
-                    
-                    item2 = QStandardItem(original_name)
-                    item2.setData(src_path, Qt.UserRole)
-                    
-                    # 根据是否是文件夹模式显示不同的路径
-                    display_path = src_path
-                    if hasattr(self, 'folder_mode') and self.folder_mode and src_path in self.folder_paths:
-                        # 文件夹模式下，显示从共同父级开始的相对路径
-                        display_path = self._get_relative_folder_path(src_path)
-                    
-                    item3 = QStandardItem(display_path)
-                    item3.setData(src_path, Qt.UserRole)
-                    
-                    item4 = QStandardItem(str(idx + 1))
-                    item4.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                    item4.setData(src_path, Qt.UserRole)
-                    
-                    row = [item0, item1, item2, item3, item4]
-                    items_to_add.append(row)
-                    
-                    # 设置图标
-                    file_info = QFileInfo(src_path)
-                    icon_provider = QFileIconProvider()
-                    icon = icon_provider.icon(file_info)
-                    item2.setIcon(icon)
-                    
-                except Exception as e:
-                    print(f"重建左侧树时处理文件错误: {src_path} - {e}")
-                    continue
-            
-            # 批量添加所有项目
-            for row_items in items_to_add:
-                self.left_model.appendRow(row_items)
-                
+            # file_data 被替换/筛选/重命名后都会走到这里，同步重建路径索引
+            self._reindex_paths()
+            self._folder_common_parent = None
+            self.left_model.reset()
+            self.right_model.reset()
         except Exception as e:
             print(f"重建左侧树时发生严重错误: {e}")
             QMessageBox.critical(self, "重建失败", f"重建文件列表时发生错误: {str(e)}")
 
+    def _reindex_paths(self):
+        """按当前 file_data 重建路径索引"""
+        self._path_index = {path_key(item[0]) for item in self.file_data}
+
     def on_add_folder(self):
         """添加文件夹 - 修复递归复选框逻辑"""
         folder_path = QFileDialog.getExistingDirectory(self, "选择文件夹")
@@ -2257,8 +2462,7 @@ class BatchRenameWidget(QWidget):
                 return
         
         try:
-            self.left_model.removeRows(0, self.left_model.rowCount())
-            self.right_model.removeRows(0, self.right_model.rowCount())
+            self.stop_scan()
             self.file_data.clear()
             self.original_file_data.clear()  # 清空原始数据备份
             self.removed_items.clear()
@@ -2269,6 +2473,7 @@ class BatchRenameWidget(QWidget):
             if hasattr(self, 'folder_paths'):
                 self.folder_paths.clear()
             
+            self._rebuild_left_tree()
             self.on_preview()
             
             # 清空筛选条件
@@ -2371,542 +2576,136 @@ class BatchRenameWidget(QWidget):
         self.left_tree.viewport().update()
 
     def _update_find_highlight(self):
-        """更新查找高亮 - 只高亮查找关键词 - 作为独立逻辑运行"""
+        """更新查找高亮 - 只高亮查找关键词 - 作为独立逻辑运行（左侧在绘制时按行计算）"""
+        self._find_highlight_pending = False
         try:
-            find_text = self.find_edit.text()
-            is_regex = (self.match_mode.currentIndex() == 1)
-
-            def highlight_items(model):
-                if model is None:
-                    return
-
-                for row in range(model.rowCount()):
-                    index = model.index(row, 2)  # 文件名列现在是第2列
-                    try:
-                        text = model.data(index) or ""
-                    except Exception:
-                        text = ""
-                        
-                    # 获取已有的高亮信息（排除之前的查找高亮）
-                    highlight_info = index.data(Qt.UserRole + 1) or []
-                    
-                    # 清除之前的查找高亮
-                    if highlight_info:
-                        highlight_info = [(part, role) for part, role in highlight_info if role != "find"]
-                    
-                    # 查找高亮作为独立逻辑，不受高光开关影响，只根据输入框内容显示
-                    if find_text and text:
-                        # 两侧树都使用自定义高亮代理
-                        if model == self.right_model or model == self.left_model:
-                            # 查找匹配的文本并添加高亮
-                            new_highlight_info = []
-                            if is_regex:
-                                try:
-                                    matches = re.finditer(find_text, text)
-                                    last_end = 0
-                                    for match in matches:
-                                        start, end = match.span()
-                                        if start > last_end:
-                                            # 添加非查找部分
-                                            before_text = text[last_end:start]
-                                            if before_text:
-                                                new_highlight_info.append((before_text, None))
-                                        new_highlight_info.append((text[start:end], "find"))
-                                        last_end = end
-                                    if last_end < len(text):
-                                        # 添加剩余部分
-                                        remaining_text = text[last_end:]
-                                        if remaining_text:
-                                            new_highlight_info.append((remaining_text, None))
-                                except re.error:
-                                    # 正则表达式错误，使用原始高亮信息
-                                    new_highlight_info = highlight_info
-                            else:
-                                # 普通匹配（优化版本，避免引入额外空格）
-                                find_len = len(find_text)
-                                start = 0
-                                last_pos = 0
-                                while True:
-                                    pos = text.find(find_text, start)
-                                    if pos == -1:
-                                        # 添加剩余部分
-                                        if last_pos < len(text):
-                                            remaining_text = text[last_pos:]
-                                            if remaining_text:
-                                                new_highlight_info.append((remaining_text, None))
-                                        break
-                                    
-                                    # 添加查找前的部分
-                                    if pos > last_pos:
-                                        before_text = text[last_pos:pos]
-                                        if before_text:
-                                            new_highlight_info.append((before_text, None))
-                                    
-                                    # 添加查找部分
-                                    new_highlight_info.append((find_text, "find"))
-                                    last_pos = pos + find_len
-                                    start = pos + find_len
-                            
-                            # 更新高亮信息
-                            item = model.itemFromIndex(index)
-                            if item:
-                                item.setData(new_highlight_info, Qt.UserRole + 1)
-                        # 统一通过代理的高亮信息渲染，无需直接设置背景
-                    else:
-                        # 没有查找文本，恢复原始高亮
-                        if model == self.right_model or model == self.left_model:
-                            item = model.itemFromIndex(index)
-                            if item:
-                                item.setData(highlight_info, Qt.UserRole + 1)
-
-            highlight_items(self.left_model)
-            highlight_items(self.right_model)
-
+            find_rules = RenameRuleSet(find_text=self.find_edit.text(),
+                                       match_mode=self.match_mode.currentText())
+            self.left_model.set_rules(find_rules)
         except Exception as e:
             print(f"_update_find_highlight方法发生异常: {e}")
-            # 可选：显示用户友好的错误提示
-            # QMessageBox.warning(self, "高亮错误", f"查找高亮功能出错: {str(e)}")
+
+    def _build_rule_set(self):
+        """读取当前界面参数，生成本次预览/应用使用的重命名规则快照"""
+        prefix_suffix_cb = getattr(self, "enable_prefix_suffix_cb", None)
+        return RenameRuleSet(
+            find_text=self.find_edit.text(),
+            replace_text=self.replace_edit.text(),
+            match_mode=self.match_mode.currentText(),
+            highlight=self.highlight_enabled.isChecked(),
+            prefix_suffix_enabled=(prefix_suffix_cb.isChecked() if prefix_suffix_cb else False),
+            prefix=self.prefix_edit.text(),
+            suffix=self.suffix_edit.text(),
+            number_enabled=self.enable_number_cb.isChecked(),
+            number_prefix=self.number_prefix_edit.text(),
+            number_suffix=self.number_suffix_edit.text(),
+            start=self.start_spin.value(),
+            step=self.step_spin.value(),
+            pad=self.pad_spin.value(),
+            insert_mode=self.insert_after_combo.currentText(),
+            insert_text=self.insert_after_edit.text(),
+            delete_enabled=self.enable_delete_cb.isChecked(),
+            delete_from=self.remove_from.value(),
+            delete_to=self.remove_to.value(),
+            case=self.case_combo.currentText(),
+        )
+
+    @staticmethod
+    def _rule_set_error(rules):
+        """规则中无效正则的错误信息（只在需要替换时才算错误），没有错误时返回 None"""
+        return rules.regex_error if rules.replace_text else None
+
+    def _warn_rule_set_error(self, rules) -> bool:
+        """点击应用时正则无效则弹窗提示一次（替代逐行弹窗），返回是否有错误"""
+        error = self._rule_set_error(rules)
+        if error is not None:
+            QMessageBox.warning(self, "正则表达式错误", f"正则表达式无效: {error}")
+        return error is not None
+
+    def _show_rule_set_error(self, rules):
+        """自动预览时在查找框上就地标出无效的正则（输入到一半时不弹窗抢焦点）"""
+        error = self._rule_set_error(rules)
+        if error == self._shown_rule_error:
+            return
+        self._shown_rule_error = error
+        if error is not None:
+            self.find_edit.setStyleSheet("QLineEdit { border: 1px solid red; }")
+            self.find_edit.setToolTip(f"正则表达式无效: {error}")
+        else:
+            self.find_edit.setStyleSheet("")
+            self.find_edit.setToolTip("")
 
     def _is_file_matching_find(self, original_name):
         """检查文件是否匹配查找条件"""
-        find_text = self.find_edit.text()
-        if not find_text:
-            return True  # 如果没有查找内容，认为所有文件都匹配
+        return self._build_rule_set().is_matching(original_name)
 
-        if self.match_mode.currentText() == "普通匹配":
-            return find_text in original_name
-        else:
-            try:
-                return bool(re.search(find_text, original_name))
-            except re.error:
-                return False
-                
     def build_new_name(self, original_name, index):
-        """构建新文件名 - 优化编号处理逻辑"""
-        processed_parts = []
-        processed_info = {}
-        new_name_parts = [(original_name, None)]  # 默认部分
-        
-        # 检查是否匹配查找条件
-        is_matching = self._is_file_matching_find(original_name)
-
-        # 查找替换处理
-        current_text = original_name
-        
-
-
-                
+        """构建新文件名（单次调用）；批量计算请先 _build_rule_set() 再逐行 apply()"""
+        return self._build_rule_set().apply(original_name, index)
 
+    def schedule_preview(self, *args):
+        """选项变化时调用：重新计时，停止输入 PREVIEW_DELAY_MS 后只预览一次"""
+        self._preview_timer.start()
 
-
-        find_text = self.find_edit.text()
-        replace_text = self.replace_edit.text()
-        
-        if find_text:
-            # 查找替换功能无论是否开启高光都执行
-            # 但高亮显示部分仍然依赖highlight_enabled状态
-            
-            # 处理高亮显示（只有在启用高光时）
-            if self.highlight_enabled.isChecked():
-                # 先构建查找高亮信息（不替换，只高亮）
-                if self.match_mode.currentText() == "普通匹配":
-                    if find_text in original_name:
-                        parts = []
-                        start = 0
-                        while True:
-                            pos = original_name.find(find_text, start)
-                            if pos == -1:
-                                if start < len(original_name):
-                                    parts.append((original_name[start:], None))
-                                break
-                            if pos > start:
-                                parts.append((original_name[start:pos], None))
-                            parts.append((find_text, "find"))  # 高亮查找内容
-                            start = pos + len(find_text)
-                        new_name_parts = parts
-                else:
-                    try:
-                        # 正则查找高亮
-                        matches = list(re.finditer(find_text, original_name))
-                        if matches:
-                            parts = []
-                            last_end = 0
-                            for match in matches:
-                                start, end = match.span()
-                                if start > last_end:
-                                    parts.append((original_name[last_end:start], None))
-                                parts.append((original_name[start:end], "find"))  # 高亮匹配内容
-                                last_end = end
-                            if last_end < len(original_name):
-                                parts.append((original_name[last_end:], None))
-                            new_name_parts = parts
-                    except re.error:
-                        pass
-            
-            # 查找替换处理
-            if replace_text and find_text:  # 只有同时有查找和替换文本时才处理替换
-                if self.match_mode.currentText() == "普通匹配":
-                    if find_text and find_text in original_name:
-                        # 如果启用了高亮，需要重新构建高亮信息以包含替换部分
-                        if self.highlight_enabled.isChecked():
-                            parts = []
-                            start = 0
-                            while True:
-                                pos = original_name.find(find_text, start)
-                                if pos == -1:
-                                    if start < len(original_name):
-                                        parts.append((original_name[start:], None))
-                                    break
-                                if pos > start:
-                                    parts.append((original_name[start:pos], None))
-                                parts.append((replace_text, "replace"))
-                                start = pos + len(find_text)
-                            new_name_parts = parts
-                        else:
-                            # 不启用高亮时简单替换
-                            new_name_parts = [(original_name.replace(find_text, replace_text), None)]
-                        processed_info["find"] = True
-                        original_name = original_name.replace(find_text, replace_text)
-                else:
-                    try:
-                        # 正则替换暂不支持部分高亮
-                        new_name = re.sub(find_text, replace_text, original_name)
-                        new_name_parts = [(new_name, "replace") if self.highlight_enabled.isChecked() else (new_name, None)]
-                        processed_info["find"] = True
-                        original_name = new_name
-                    except re.error as e:
-                        QMessageBox.warning(self, "正则表达式错误", f"正则表达式无效: {str(e)}")
-                        return new_name_parts, processed_info
-
-        # 前后缀（仅对匹配查找条件的文件生效，且启用时）
-        prefix = self.prefix_edit.text()
-        suffix = self.suffix_edit.text()
-        prefix_suffix_enabled = getattr(self, "enable_prefix_suffix_cb", None)
-        prefix_suffix_enabled = (prefix_suffix_enabled.isChecked() if prefix_suffix_enabled else False)
-        if prefix and is_matching and prefix_suffix_enabled:
-            new_name_parts.insert(0, (prefix, "prefix"))
-            processed_info["prefix"] = True
-
-        if suffix and is_matching and prefix_suffix_enabled:
-            new_name_parts.append((suffix, "suffix"))
-            processed_info["suffix"] = True
-
-        # 编号（仅在启用编号时且文件匹配查找条件）- 简化逻辑
-        if self.enable_number_cb.isChecked() and is_matching:
-            number_prefix = self.number_prefix_edit.text()
-            number_suffix = self.number_suffix_edit.text()
-            start_num = self.start_spin.value()
-            step_num = self.step_spin.value()
-            pad_num = self.pad_spin.value()
-
-            step = step_num if step_num != 0 else 1
-            num = start_num + index * step
-            pad = pad_num if pad_num != 0 else 0
-            num_str = str(num).zfill(pad) if pad > 0 else str(num)
-            num_full = number_prefix + num_str + number_suffix
-            
-            insert_mode = self.insert_after_combo.currentText()
-            insert_text = self.insert_after_edit.text()
-            
-            try:
-                if insert_mode == "开头":
-                    # 分别处理编号前缀、编号数字、编号后缀的颜色
-                    if number_prefix:
-                        new_name_parts.insert(0, (number_prefix, "number_prefix"))
-                    new_name_parts.insert(0 if not number_prefix else 1, (num_str, "number"))
-                    if number_suffix:
-                        new_name_parts.insert(0 if not number_prefix else 2, (number_suffix, "number_suffix"))
-                elif insert_mode == "末尾":
-                    # 分别处理编号前缀、编号数字、编号后缀的颜色
-                    if number_prefix:
-                        new_name_parts.append((number_prefix, "number_prefix"))
-                    new_name_parts.append((num_str, "number"))
-                    if number_suffix:
-                        new_name_parts.append((number_suffix, "number_suffix"))
-                elif insert_mode == "关键词前" and insert_text:
-                    # 查找关键词位置并插入
-                    new_parts = []
-                    found = False
-                    for text, role in new_name_parts:
-                        if not found and insert_text in text:
-                            pos = text.find(insert_text)
-                            if pos > 0:
-                                new_parts.append((text[:pos], role))
-                            # 分别处理编号前缀、编号数字、编号后缀的颜色
-                            if number_prefix:
-                                new_parts.append((number_prefix, "number_prefix"))
-                            new_parts.append((num_str, "number"))
-                            if number_suffix:
-                                new_parts.append((number_suffix, "number_suffix"))
-                            new_parts.append((text[pos:], role))
-                            found = True
-                        else:
-                            new_parts.append((text, role))
-                    if found:
-                        new_name_parts = new_parts
-                    else:
-                        # 分别处理编号前缀、编号数字、编号后缀的颜色
-                        if number_prefix:
-                            new_name_parts.append((number_prefix, "number_prefix"))
-                        new_name_parts.append((num_str, "number"))
-                        if number_suffix:
-                            new_name_parts.append((number_suffix, "number_suffix"))
-                elif insert_mode == "关键词后" and insert_text:
-                    # 查找关键词位置并插入
-                    new_parts = []
-                    found = False
-                    for text, role in new_name_parts:
-                        if not found and insert_text in text:
-                            pos = text.find(insert_text) + len(insert_text)
-                            new_parts.append((text[:pos], role))
-                            # 分别处理编号前缀、编号数字、编号后缀的颜色
-                            if number_prefix:
-                                new_parts.append((number_prefix, "number_prefix"))
-                            new_parts.append((num_str, "number"))
-                            if number_suffix:
-                                new_parts.append((number_suffix, "number_suffix"))
-                            new_parts.append((text[pos:], role))
-                            found = True
-                        else:
-                            new_parts.append((text, role))
-                    if found:
-                        new_name_parts = new_parts
-                    else:
-                        # 分别处理编号前缀、编号数字、编号后缀的颜色
-                        if number_prefix:
-                            new_name_parts.append((number_prefix, "number_prefix"))
-                        new_name_parts.append((num_str, "number"))
-                        if number_suffix:
-                            new_name_parts.append((number_suffix, "number_suffix"))
-                processed_info["number"] = True
-            except Exception as e:
-                QMessageBox.warning(self, "插入错误", f"编号插入过程中发生错误: {str(e)}")
-                return new_name_parts, processed_info
-
-        # 删除范围（基于1-based输入） - 仅对匹配查找条件的文件生效
-        if self.enable_delete_cb.isChecked() and is_matching:  # 只有在启用删除功能且文件匹配查找条件时才处理
-            frm = self.remove_from.value()
-            to = self.remove_to.value()
-            if frm > 0 and to >= frm:
-                # 合并所有部分以处理删除，但保留原有的角色信息
-                full_text = ''.join([text for text, _ in new_name_parts])
-                
-                # 检查起始位置是否超出文本长度
-                if frm > len(full_text):
-                    # 起始位置超出范围，跳过删除处理
-                    pass
-                else:
-                    frm_0 = max(0, frm - 1)
-                    to_0 = max(frm_0, to - 1)
-                    
-                    # 调整删除范围，确保不超出文本长度
-                    actual_to_0 = min(to_0, len(full_text) - 1) if len(full_text) > 0 else -1
-                
-                    if frm_0 <= actual_to_0 and len(full_text) > 0:
-                        # 使用颜色背景标记删除范围，而不是实际删除字符
-                        # 需要重新构建new_name_parts，但要保留原有的角色信息
-                        new_new_name_parts = []
-                        current_pos = 0
-                    
-                    for text, role in new_name_parts:
-                        text_start = current_pos
-                        text_end = current_pos + len(text)
-                        
-                        # 检查文本是否与删除范围重叠（使用实际的结束位置）
-                        if text_end <= frm_0 or text_start > actual_to_0:
-                            # 文本完全在删除范围之外，保持原样
-                            new_new_name_parts.append((text, role))
-                        elif text_start >= frm_0 and text_end <= actual_to_0 + 1:
-                            # 文本完全在删除范围之内，标记为delete
-                            new_new_name_parts.append((text, "delete"))
-                        else:
-                            # 文本部分与删除范围重叠，需要分割
-                            if text_start < frm_0:
-                                # 删除范围之前的部分
-                                before_part = text[:frm_0 - text_start]
-                                new_new_name_parts.append((before_part, role))
-                            
-                            # 删除范围部分
-                            delete_start = max(0, frm_0 - text_start)
-                            delete_end = min(len(text), actual_to_0 + 1 - text_start)
-                            if delete_start < delete_end:
-                                delete_part = text[delete_start:delete_end]
-                                new_new_name_parts.append((delete_part, "delete"))
-                            
-                            if text_end > actual_to_0 + 1:
-                                # 删除范围之后的部分
-                                after_part = text[delete_end:]
-                                new_new_name_parts.append((after_part, role))
-                        
-                        current_pos = text_end
-                    
-                    new_name_parts = new_new_name_parts
-                    processed_info["delete"] = True
-                # 如果起始位置超出范围，不处理删除
-
-        # 大小写转换（保留高光分段）
-        case = self.case_combo.currentText()
-        if case != "不变":
-            # 合并所有部分以用于整体判断（例如标题格式保留扩展名）
-            full_text = ''.join([text for text, _ in new_name_parts])
-
-            if case == "大写":
-                # 对每个分段进行大写转换，保留原有角色（高光）
-                new_name_parts = [(text.upper(), role) for text, role in new_name_parts]
-            elif case == "小写":
-                # 对每个分段进行小写转换，保留原有角色（高光）
-                new_name_parts = [(text.lower(), role) for text, role in new_name_parts]
-            elif case == "标题格式":
-                # 仅对文件名部分做标题化，保留扩展名，并保留分段及其角色
-                name_part, ext = os.path.splitext(full_text)
-                name_len = len(name_part)
-
-                cursor = 0
-                titled_parts = []
-                for text, role in new_name_parts:
-                    start = cursor
-                    end = cursor + len(text)
-
-                    if end <= name_len:
-                        # 完全在文件名部分
-                        titled_parts.append((text.title(), role))
-                    elif start >= name_len:
-                        # 完全在扩展名部分
-                        titled_parts.append((text, role))
-                    else:
-                        # 横跨边界，分割后分别处理
-                        split_pos = name_len - start
-                        name_sub = text[:split_pos].title()
-                        ext_sub = text[split_pos:]
-                        if name_sub:
-                            titled_parts.append((name_sub, role))
-                        if ext_sub:
-                            titled_parts.append((ext_sub, role))
-                    cursor = end
-
-                new_name_parts = titled_parts
-
-            processed_info["case"] = True
-
-        return new_name_parts, processed_info
+    def schedule_find_highlight(self, *args):
+        """查找内容/匹配模式变化时调用：与预览一起合并刷新"""
+        self._find_highlight_pending = True
+        self._preview_timer.start()
 
     def on_preview(self):
-        """预览功能 - 增强错误处理和性能优化"""
+        """预览功能 - 只更新规则快照，新名称在行可见时优先计算，其余行空闲时补算"""
+        self._preview_timer.stop()  # 已在此刻预览，取消尚未触发的调度
+        if self._find_highlight_pending:
+            self._update_find_highlight()
         try:
-            self.right_model.removeRows(0, self.right_model.rowCount())
-            if not self.file_data:
-                return
-
-            # 批量处理错误收集
-            error_files = []
-            max_name_width = 0  # 记录最长名称的宽度
-            
-            for idx, file_info in enumerate(self.file_data):
-                if len(file_info) < 2:
-                    error_files.append(f"索引 {idx}: 数据格式错误")
-                    continue
-                    
-                src_path, original_name, _ = file_info
-                try:
-                    parts, processed_info = self.build_new_name(original_name, idx)
-                    # 保存 processed_info
-                    self.file_data[idx] = (src_path, original_name, processed_info)
-                    
-                    # 创建右侧模型行
-                    item0 = QStandardItem(str(idx + 1))
-                    item0.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                    
-                    item1 = QStandardItem("")  # 箭头列，空内容
-                    
-                    # 文件名项，存储高亮部分信息
-                    full_name = ''.join([text for text, _ in parts])
-                    item2 = QStandardItem(full_name)
-                    item2.setData(parts, Qt.UserRole + 1)  # 存储高亮信息
-                    
-                    item3 = QStandardItem(src_path)
-                    item4 = QStandardItem(str(idx + 1))
-                    item4.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                    
-                    # 设置图标
-                    file_info_q = QFileInfo(src_path)
-                    icon_provider = QFileIconProvider()
-                    icon = icon_provider.icon(file_info_q)
-                    item2.setIcon(icon)
-                    
-                    self.right_model.appendRow([item0, item1, item2, item3, item4])
-                    
-                    # 计算当前名称的显示宽度 - 修复中文宽度计算问题
-                    font_metrics = self.right_tree.fontMetrics()
-                    # 使用boundingRect来更准确地计算包含中文的文本宽度
-                    name_rect = font_metrics.boundingRect(full_name + "   ")  # 添加一些边距
-                    name_width = name_rect.width()
-                    if name_width > max_name_width:
-                        max_name_width = name_width
-                    
-                except Exception as e:
-                    error_msg = f"{original_name}: {str(e)}"
-                    error_files.append(error_msg)
-                    print(f"预览错误: {error_msg}")
-                    continue
-            
-            # 自动调整名称列宽度 - 提前调整避免重叠（现在是第2列）
-            if max_name_width > 0:
-                header = self.right_tree.header()
-                current_width = self.right_tree.columnWidth(2)  # 第2列是文件名
-                # 提前两位距离开始调整：如果计算宽度接近当前宽度就调整
-                # 当名称宽度达到当前列宽的80%时就开始调整，避免重叠
-                if max_name_width > (current_width * 0.8):
-                    # 添加额外边距，确保有足够的空间
-                    extra_margin = 20  # 额外20像素边距
-                    target_width = max_name_width + extra_margin
-                    # 限制最大宽度为窗口宽度的一半，避免过宽
-                    max_allowed = self.width() // 2
-                    new_width = min(target_width, max_allowed, 500)  # 最大500像素
-                    self.right_tree.setColumnWidth(2, new_width)  # 第2列
-                    # 如果启用了列宽同步，同步左侧
-                    if self.sync_column_enabled:
-                        self.left_tree.setColumnWidth(2, new_width)
-            
-            # 显示批量错误信息
-            if error_files:
-                error_count = len(error_files)
-                if error_count <= 3:
-                    QMessageBox.warning(self, "预览错误", 
-                        f"以下文件预览失败（共{error_count}个）：\n" + "\n".join(error_files))
-                else:
-                    QMessageBox.warning(self, "预览错误", 
-                        f"以下文件预览失败（共{error_count}个，显示前3个）：\n" + 
-                        "\n".join(error_files[:3]) + f"\n... 还有{error_count-3}个错误")
-                    
+            rules = self._build_rule_set()
+            self._show_rule_set_error(rules)
+            self.right_model.set_rules(rules)
+            if self.file_data:
+                self._adjust_name_column_width()
         except Exception as e:
             QMessageBox.critical(self, "预览失败", f"预览过程中发生严重错误: {str(e)}")
             print(f"预览严重错误: {e}")
 
-            self._sync_scroll_positions()
-            # 先清空所有查找高亮信息（包括左侧和右侧）
-            for row in range(self.right_model.rowCount()):
-                index = self.right_model.index(row, 1)
-                item = self.right_model.itemFromIndex(index)
-                if item:
-                    item.setData([], Qt.UserRole + 1)
-            for row in range(self.left_model.rowCount()):
-                index = self.left_model.index(row, 2)  # 左侧文件名列是第2列
-                item = self.left_model.itemFromIndex(index)
-                if item:
-                    item.setData([], Qt.UserRole + 1)
-            # 重新应用预览高亮
-            for idx, file_info in enumerate(self.file_data):
-                src_path, original_name, processed_info = file_info
-                parts, _ = self.build_new_name(original_name, idx)
-                index = self.right_model.index(idx, 1)
-                item = self.right_model.itemFromIndex(index)
-                if item:
-                    item.setData(parts, Qt.UserRole + 1)
-            # 最后应用查找高亮
-            self._update_find_highlight()
-
-        except Exception as e:
-            QMessageBox.warning(self, "预览错误", f"预览过程中发生错误: {str(e)}")
+    def _visible_rows(self, tree_view):
+        """返回视图当前可见的行范围 (first, last)，没有行时返回 None"""
+        row_count = tree_view.model().rowCount()
+        if row_count == 0:
+            return None
+        viewport = tree_view.viewport()
+        first = tree_view.indexAt(QPoint(0, 0)).row()
+        last = tree_view.indexAt(QPoint(0, viewport.height() - 1)).row()
+        first = max(first, 0)
+        last = row_count - 1 if last < 0 else last
+        return first, last
+
+    def _adjust_name_column_width(self):
+        """按可见行的新名称自动调整名称列宽度 - 提前调整避免重叠（第2列）"""
+        visible = self._visible_rows(self.right_tree)
+        if visible is None:
+            return
+        font_metrics = self.right_tree.fontMetrics()
+        max_name_width = 0  # 记录最长名称的宽度
+        for row in range(visible[0], visible[1] + 1):
+            # 使用boundingRect来更准确地计算包含中文的文本宽度
+            name = self.right_model.display_name(row)
+            name_width = font_metrics.boundingRect(name + "   ").width()  # 添加一些边距
+            if name_width > max_name_width:
+                max_name_width = name_width
+        if max_name_width <= 0:
+            return
+        current_width = self.right_tree.columnWidth(2)
+        # 当名称宽度达到当前列宽的80%时就开始调整，避免重叠
+        if max_name_width > (current_width * 0.8):
+            extra_margin = 20  # 额外20像素边距
+            target_width = max_name_width + extra_margin
+            # 限制最大宽度为窗口宽度的一半，避免过宽
+            max_allowed = self.width() // 2
+            new_width = min(target_width, max_allowed, 500)  # 最大500像素
+            self.right_tree.setColumnWidth(2, new_width)
+            # 如果启用了列宽同步，同步左侧
+            if self.sync_column_enabled:
+                self.left_tree.setColumnWidth(2, new_width)
 
     def _sync_scroll_positions(self):
         if self.sync_vertical_enabled:
@@ -2927,23 +2726,7 @@ class BatchRenameWidget(QWidget):
 
     def _matches_pattern(self, file_name: str, pattern: str, mode: str) -> bool:
         """检查文件名是否匹配指定模式的辅助方法"""
-        if not pattern.strip():
-            return True
-            
-        try:
-            if mode == "前缀":
-                return file_name.startswith(pattern)
-            elif mode == "后缀":
-                return file_name.endswith(pattern)
-            elif mode == "包含关键词":
-                return pattern in file_name
-            elif mode == "正则匹配":
-                import re
-                return bool(re.search(pattern, file_name))
-            else:
-                return True
-        except Exception:
-            return False
+        return matches_pattern(file_name, pattern, mode)
 
     def on_apply_new_filter(self):
         """应用新的筛选逻辑"""
@@ -2957,24 +2740,9 @@ class BatchRenameWidget(QWidget):
         skip_mode = self.skip_mode_combo.currentText()
         skip_pattern = self.skip_pattern_edit.text().strip()
         
-        # 基于原始数据进行筛选
-        filtered_data = []
-        for item in self.original_file_data:
-            src_path, original_name, processed_info = item
-            path = Path(src_path)
-            file_name = original_name
-            
-            # 第一步：应用筛选模式
-            if filter_pattern:
-                if not self._matches_pattern(file_name, filter_pattern, filter_mode):
-                    continue
-            
-            # 第二步：应用跳过模式（基于筛选结果）
-            if skip_pattern:
-                if self._matches_pattern(file_name, skip_pattern, skip_mode):
-                    continue
-            
-            filtered_data.append(item)
+        # 基于原始数据进行筛选：先应用筛选模式，再应用跳过模式
+        filtered_data = filter_entries(self.original_file_data, filter_mode, filter_pattern,
+                                       skip_mode, skip_pattern)
         
         # 更新文件数据
         self.file_data = filtered_data
@@ -3105,165 +2873,30 @@ class BatchRenameWidget(QWidget):
             self.left_tree.setColumnWidth(logicalIndex, newSize)
 
     def _validate_rename_operation(self, src: Path, dst: Path, new_name: str) -> bool:
-        """验证重命名操作的安全性
-        
-        Args:
-            src: 源文件/文件夹路径
-            dst: 目标文件/文件夹路径
-            new_name: 新名称
-            
-        Returns:
-            bool: 是否通过安全检查
-        """
-        try:
-            # 1. 检查源路径是否存在且可访问
-            if not src.exists():
-                return False
-                
-            # 2. 检查新名称是否为空
-            if not new_name.strip():
-                return False
-                
-            # 3. 检查新名称长度限制（Windows最大路径260字符，但实际限制更复杂）
-            if len(new_name) > 255:
-                return False
-                
-            # 4. 检查非法字符（Windows文件系统限制）
-            illegal_chars = ['<', '>', ':', '"', '|', '?', '*']
-            if any(char in new_name for char in illegal_chars):
-                return False
-                
-            # 5. 检查保留名称（Windows保留名称）
-            reserved_names = ['CON', 'PRN', 'AUX', 'NUL', 'COM1', 'COM2', 'COM3', 'COM4', 
-                            'COM5', 'COM6', 'COM7', 'COM8', 'COM9', 'LPT1', 'LPT2', 
-                            'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9']
-            name_without_ext = Path(new_name).stem.upper()
-            if name_without_ext in reserved_names:
-                return False
-                
-            # 6. 检查路径分隔符
-            if '/' in new_name or '\\' in new_name:
-                return False
-                
-            # 7. 检查Unicode字符兼容性
-            try:
-                new_name.encode('utf-8')
-            except UnicodeEncodeError:
-                return False
-                
-            # 8. 检查目标路径是否在系统关键目录
-            system_dirs = ['C:\\Windows', 'C:\\Program Files', 'C:\\Program Files (x86)',
-                         'C:\\System32', 'C:\\Users', 'C:\\ProgramData']
-            dst_str = str(dst).lower()
-            if any(system_dir.lower() in dst_str for system_dir in system_dirs):
-                return False
-                
-            # 9. 检查是否尝试重命名到根目录
-            if dst.parent == dst:
-                return False
-                
-            # 10. 检查源和目标是否在同一文件系统（避免跨设备移动）
-            if src.parent != dst.parent:
-                # 对于文件夹重命名，确保目标路径有效
-                try:
-                    dst.parent.resolve()
-                except (OSError, ValueError):
-                    return False
-                    
-            return True
-            
-        except (OSError, ValueError, AttributeError):
-            return False
+        """验证重命名操作的安全性"""
+        return validate_rename_operation(src, dst, new_name)
 
     def on_apply_all(self):
         """执行全部重命名操作，包含完整的冲突检测（无弹窗版）"""
         if not self.file_data:
             return
 
-        # 计算所有重命名操作并进行冲突检测
-        rename_ops = []
-        new_names: Set[str] = set()  # 用于检测内部冲突
-        
-        # 如果是文件夹模式，按路径深度降序排序（深层优先）
-        file_data_to_process = self.file_data
-        if hasattr(self, 'folder_mode') and self.folder_mode:
-            # 创建带深度的列表
-            file_data_with_depth = []
-            for idx, (src_path, original_name, processed_info) in enumerate(self.file_data):
-                depth = src_path.count(os.sep)
-                file_data_with_depth.append((depth, idx, src_path, original_name, processed_info))
-            
-            # 按深度降序排序（深度大的优先）
-            file_data_with_depth.sort(key=lambda x: x[0], reverse=True)
-            file_data_to_process = [(src_path, original_name, processed_info) for _, _, src_path, original_name, processed_info in file_data_with_depth]
-        
-        for idx, (src_path, original_name, processed_info) in enumerate(file_data_to_process):
-            src = Path(src_path)
-            if not src.exists():
-                continue
-                
-            parts, _ = self.build_new_name(original_name, idx)
-            # 应用时排除被标记为删除的片段
-            new_name = ''.join([text for text, role in parts if role != "delete"])
-            dst = src.with_name(new_name)
-            
-            if src == dst:
-                continue
-                
-            # 检测内部冲突（同一批重命名中的重复）
-            if new_name in new_names:
-                # 有冲突时直接返回，不执行任何操作
-                return
-                
-            # 检测外部冲突（目标文件已存在）
-            if dst.exists():
-                # 有外部冲突时跳过这些文件
-                continue
-            
-            # 增强安全检查
-            if not self._validate_rename_operation(src, dst, new_name):
-                continue
-                    
-            # 只有在确认要重命名时才添加到集合中
-            new_names.add(new_name)
-            rename_ops.append((src, dst))
+        # 计算所有重命名操作并进行冲突检测（文件夹模式深层优先）
+        rules = self._build_rule_set()
+        if self._warn_rule_set_error(rules):
+            return
+        try:
+            rename_ops = plan_renames(self.file_data, rules,
+                                      folder_mode=getattr(self, 'folder_mode', False))
+        except ValueError:
+            # 有内部冲突时直接返回，不执行任何操作
+            return
 
         if not rename_ops:
             return
 
         # 执行重命名操作
-        performed = []
-        failed = []
-        
-        for src, dst in rename_ops:
-            try:
-                # 再次验证操作
-                if not self._validate_rename_operation(src, dst, dst.name):
-                    failed.append(f"{src.name}: 安全检查失败")
-                    continue
-                    
-                src.rename(dst)
-                performed.append((src, dst))
-            except PermissionError as e:
-                failed.append(f"{src.name}: 权限不足 - {str(e)}")
-                print(f"重命名权限错误: {e}")
-            except FileExistsError as e:
-                failed.append(f"{src.name}: 目标文件已存在 - {str(e)}")
-                print(f"重命名文件存在错误: {e}")
-            except OSError as e:
-                # 细化操作系统错误
-                if "文件名、目录名或卷标语法不正确" in str(e):
-                    failed.append(f"{src.name}: 非法文件名 - {str(e)}")
-                elif "系统找不到指定的路径" in str(e):
-                    failed.append(f"{src.name}: 路径不存在 - {str(e)}")
-                elif "另一个程序正在使用此文件" in str(e):
-                    failed.append(f"{src.name}: 文件被占用 - {str(e)}")
-                else:
-                    failed.append(f"{src.name}: 系统错误 - {str(e)}")
-                print(f"重命名系统错误: {e}")
-            except Exception as e:
-                failed.append(f"{src.name}: 未知错误 - {str(e)}")
-                print(f"重命名未知错误: {e}")
+        performed, failed = execute_renames(rename_ops)
 
         # 处理结果
         if performed:
@@ -3289,42 +2922,17 @@ class BatchRenameWidget(QWidget):
             return
 
         inverse_ops = self.last_undo_stack.pop()
-        performed = []
-        failed = []
-        
-        for dst_path, src_path in inverse_ops:
-            try:
-                # 检查源文件是否存在
-                if not dst_path.exists():
-                    # 源文件不存在，跳过
-                    continue
-                    
-                # 检查目标文件是否已存在，存在则跳过不覆盖
-                if src_path.exists():
-                    # 目标已存在，跳过
-                    continue
-                        
-                # 执行撤销重命名
-                dst_path.rename(src_path)
-                performed.append((dst_path, src_path))
-                
-            except Exception as e:
-                # 静默处理错误，不记录也不弹窗
-                pass
+        # 目标已存在时跳过不覆盖，错误静默处理
+        performed = undo_renames(inverse_ops)
 
         # 更新文件数据和界面
         if performed:
-            # 更新 file_data 中对应路径（把 dst -> src）
-            # 使用列表收集所有需要更新的路径，避免break导致只更新第一个匹配项
-            updated_indices = set()
-            for dst_path, src_path in performed:
-                dst_str = str(dst_path)
-                src_str = str(src_path)
-                for i, (path_str, original_name, _) in enumerate(self.file_data):
-                    if path_str == dst_str:  # 用重命名后的路径(dst)来查找需要撤销的项目
-                        self.file_data[i] = (src_str, Path(src_str).name, {})
-                        updated_indices.add(i)
-                        # 不break，继续查找可能存在的其他匹配项
+            # 更新 file_data 中对应路径（把 dst -> src），同一路径的所有条目都要更新
+            restored = {str(dst_path): str(src_path) for dst_path, src_path in performed}
+            for i, (path_str, original_name, _) in enumerate(self.file_data):
+                src_str = restored.get(path_str)  # 用重命名后的路径(dst)来查找需要撤销的项目
+                if src_str is not None:
+                    self.file_data[i] = (src_str, Path(src_str).name, {})
                         
             # 重建左侧树
             self._rebuild_left_tree()
@@ -3348,11 +2956,9 @@ class BatchRenameWidget(QWidget):
                         paths.append(path)
                 else:
                     # 从其他列获取路径
-                    item = self.left_model.itemFromIndex(index) if index.model() == self.left_model else self.right_model.itemFromIndex(index)
-                    if item:
-                        path = item.data(Qt.UserRole)
-                        if path:
-                            paths.append(path)
+                    path = index.data(Qt.UserRole)
+                    if path:
+                        paths.append(path)
             if paths:
                 QApplication.clipboard().setText("\n".join(paths))
 
@@ -3524,9 +3130,7 @@ class BatchRenameWidget(QWidget):
             
         # 如果还是没有，尝试从UserRole获取
         if not path_data:
-            item = self.left_model.itemFromIndex(index) if model == self.left_model else self.right_model.itemFromIndex(index)
-            if item:
-                path_data = item.data(Qt.UserRole)
+            path_data = index.data(Qt.UserRole)
         
         if path_data:
             if full_path:
@@ -3551,12 +3155,7 @@ class BatchRenameWidget(QWidget):
         
         # 尝试从UserRole获取完整路径数据（最可靠的方式）
         try:
-            if model == self.left_model:
-                item = self.left_model.itemFromIndex(index)
-            else:
-                item = self.right_model.itemFromIndex(index)
-            if item:
-                path_data = item.data(Qt.UserRole)
+            path_data = index.data(Qt.UserRole)
         except Exception as e:
             pass
         
@@ -3686,14 +3285,8 @@ class BatchRenameWidget(QWidget):
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            # 按行号降序排序，从大到小删除
-            # 重要：必须从两个模型中同时删除对应的行
-            for row in sorted(rows_to_remove, reverse=True):
-                self.left_model.removeRow(row)
-                self.right_model.removeRow(row)
-            
-            # 更新文件数据
-            self._update_file_data_after_remove()
+            # 两侧模型共用 file_data，更新数据后统一重置
+            self._update_file_data_after_remove(rows_to_remove)
     
     def _remove_unselected_items(self, tree_view):
         """移除未选定项"""
@@ -3705,10 +3298,7 @@ class BatchRenameWidget(QWidget):
             reply = QMessageBox.question(self, "确认", "确定要移除所有项目吗？",
                                        QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.Yes:
-                # 重要：必须同时清空两个模型
-                self.left_model.clear()
-                self.right_model.clear()
-                self._update_file_data_after_remove()
+                self._update_file_data_after_remove(range(len(self.file_data)))
             return
         
         # 获取所有选中的行
@@ -3729,86 +3319,22 @@ class BatchRenameWidget(QWidget):
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            # 按行号降序排序，从大到小删除
-            # 重要：必须从两个模型中同时删除对应的行
-            for row in sorted(unselected_rows, reverse=True):
-                self.left_model.removeRow(row)
-                self.right_model.removeRow(row)
-            
-            # 更新文件数据
-            self._update_file_data_after_remove()
+            # 两侧模型共用 file_data，更新数据后统一重置
+            self._update_file_data_after_remove(unselected_rows)
     
     def _clear_window(self):
         """清空窗口 - 使用现有的on_clear逻辑"""
         # 直接调用现有的清空逻辑
         self.on_clear()
     
-    def _update_file_data_after_remove(self):
-        """移除项目后更新文件数据"""
-        # 获取左右树视图中剩余的项目
-        remaining_paths = set()
-        
-        # 从左树获取 - 使用Qt.UserRole中的路径数据
-        for row in range(self.left_model.rowCount()):
-            # 从任意一列获取UserRole数据，因为所有列都存储了相同的路径
-            item = self.left_model.item(row, 0)  # 使用第0列
-            if item:
-                path_data = item.data(Qt.UserRole)
-                if path_data:
-                    # 使用完整绝对路径避免同名文件误删
-                    try:
-                        abs_path = str(Path(path_data).resolve())
-                        remaining_paths.add(abs_path)
-                    except Exception:
-                        # 如果路径解析失败，使用原始路径
-                        remaining_paths.add(path_data)
-        
-        # 更新file_data，只保留仍在树视图中的项目
-        new_file_data = []
-        for path, original_name, highlight_info in self.file_data:
-            try:
-                abs_path = str(Path(path).resolve())
-                if abs_path in remaining_paths:
-                    new_file_data.append((path, original_name, highlight_info))
-            except Exception:
-                # 如果路径解析失败，使用原始路径匹配
-                if path in remaining_paths:
-                    new_file_data.append((path, original_name, highlight_info))
+    def _update_file_data_after_remove(self, removed_rows):
+        """移除项目后更新文件数据，并同步刷新左右两侧"""
+        removed_rows = set(removed_rows)
+        self.file_data = [item for row, item in enumerate(self.file_data) if row not in removed_rows]
         
-        self.file_data = new_file_data
-        
-        # 重新构建预览 - 确保右窗口内容正确更新
-        try:
-            self.on_preview()
-        except Exception as e:
-            # 如果预览失败，至少保持左右窗口同步
-            self._sync_models_after_remove()
-            
-            # 如果还有数据但预览失败，至少保持左右窗口同步
-            if self.file_data:
-                self.right_model.clear()
-                self.right_model.setHorizontalHeaderLabels(['序号', '箭头', '新名称', '路径', '原始序号'])
-                # 不再调用不存在的函数，仅同步模型
-    
-    def _sync_models_after_remove(self):
-        """移除项目后同步左右模型"""
-        # 确保右模型与左模型保持同步
-        left_row_count = self.left_model.rowCount()
-        right_row_count = self.right_model.rowCount()
-        
-        if left_row_count != right_row_count:
-            # 重新同步行数
-            if left_row_count > right_row_count:
-                # 添加缺失的行到右模型
-                for row in range(right_row_count, left_row_count):
-                    items = []
-                    for col in range(5):
-                        item = QStandardItem()
-                        items.append(item)
-                    self.right_model.appendRow(items)
-            else:
-                # 移除多余的行从右模型
-                self.right_model.removeRows(left_row_count, right_row_count - left_row_count)
+        # 重建左侧树并重新构建预览 - 确保左右窗口内容一致
+        self._rebuild_left_tree()
+        self.on_preview()
 
 
 class MainWindow(QMainWindow):
@@ -3975,6 +3501,10 @@ class MainWindow(QMainWindow):
             event.ignore()
             super().dropEvent(event)
 
+    def closeEvent(self, event):
+        self.rename_widget.stop_scan()
+        event.accept()
+
     def keyPressEvent(self, event):
         """键盘事件 - 增强错误处理"""
         try:
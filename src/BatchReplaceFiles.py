@@ -17,8 +17,8 @@ import sys
 import shutil
 import re
 import time
-import json
 import subprocess
+import itertools
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QLineEdit, QFileDialog, QTreeWidget,
@@ -26,9 +26,10 @@ from PyQt5.QtWidgets import (
     QSizePolicy, QMessageBox, QStyle, QSplitter, QMenu, QAction,
     QTextEdit, QDialog, QFormLayout, QCheckBox, QAbstractItemView,
     QKeySequenceEdit, QListWidget, QListWidgetItem, QHeaderView,
-    QInputDialog, QFileIconProvider
+    QInputDialog, QFileIconProvider, QSpinBox, QListView
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QUrl, QRegExp, QRect, QFileSystemWatcher, QPoint, QSettings, QTimer, QEvent, QFileInfo
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QUrl, QRegExp, QRect, QFileSystemWatcher, QPoint, QSettings, QTimer, QEvent, QFileInfo, \
+    QAbstractListModel, QModelIndex, QSize
 from PyQt5.QtGui import (
     QDragEnterEvent, QDropEvent, QMouseEvent, QDragMoveEvent, 
     QColor, QKeySequence, QTextCursor, QTextCharFormat, QRegExpValidator,
@@ -38,6 +39,21 @@ from PyQt5.QtGui import (
 # 导入编译后的资源文件（必须保留，否则图标无法加载）
 import resources
 
+from ReplaceEngine import (MATCH_MODES, LOG_BACKUP, LOG_SUCCESS, LOG_ERROR, split_keywords,
+                           iter_matches, iter_files, safe_copy, replace_file,
+                           restore_file, backup_timestamp, run_parallel,
+                           default_jobs, MAX_JOBS, CopySource, find_identical,
+                           skip_identical_result, hash_targets)
+from BackupStore import (BackupStore, sibling_backups, ArchiveBackupWriter, ArchiveReader, ArchiveMember,
+                         ARCHIVE_SUFFIX, is_backup_archive, restore_archive_member, has_manifest,
+                         backup_ref_exists)
+from IconCache import shared_icon_cache
+from TargetIndex import TargetIndex
+from BackupCatalog import BackupCatalog
+from NameIndex import NameIndex
+from PathSets import PathSet
+import sqlite3
+
 
 class FindDialog(QDialog):
     """查找对话框（已无用，保留避免报错）"""
@@ -65,26 +81,100 @@ class FindDialog(QDialog):
         self.cancel_btn.setToolTip("取消查找操作")
 
 
-class EnhancedTextEdit(QTextEdit):
-    """增强版文本编辑框（修复日志颜色异常问题）"""
+class LogLineModel(QAbstractListModel):
+    """结果/日志的行模型：每行一条 (文本, 颜色)，超过上限时丢弃最早的行，内存不随处理文件数增长"""
+    MAX_ROWS = 100000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._metrics = None
+        self._width = 0  # 最长一行的像素宽度，用于水平滚动条
+        self._longest = 0  # 最长一行的字符数，只有更长的行才需要重新测量
+
+    def set_font_metrics(self, metrics):
+        self._metrics = metrics
+        self._width = max((metrics.horizontalAdvance(text) for text, _ in self._rows), default=0)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        text, color = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return text
+        if role == Qt.ForegroundRole and color is not None:
+            return QBrush(color)
+        if role == Qt.SizeHintRole and self._metrics is not None:
+            # 所有行尺寸一致（视图开启了 uniformItemSizes），宽度取最长一行
+            return QSize(self._width + 8, self._metrics.height() + 2)
+        return None
+
+    def append_rows(self, rows):
+        """整批追加 [(文本, 颜色), ...]，只触发一次插入通知"""
+        if not rows:
+            return
+        if len(rows) > self.MAX_ROWS:
+            rows = rows[-self.MAX_ROWS:]
+        excess = len(self._rows) + len(rows) - self.MAX_ROWS
+        if excess > 0:
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            del self._rows[:excess]
+            self.endRemoveRows()
+        longest = max(rows, key=lambda r: len(r[0]))[0]
+        if len(longest) > self._longest and self._metrics is not None:
+            self._longest = len(longest)
+            self._width = max(self._width, self._metrics.horizontalAdvance(longest))
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._width = 0
+        self._longest = 0
+        self.endResetModel()
+
+    def text(self, row):
+        return self._rows[row][0]
+
+    def all_text(self):
+        return "\n".join(text for text, _ in self._rows)
+
+
+class LogListView(QListView):
+    """结果/日志显示框：虚拟化列表只绘制可见行，追加的文本先缓存，定时整批插入"""
+    FLUSH_INTERVAL_MS = 50  # 缓存的行最多等待这么久再插入
+
     def __init__(self, parent=None, is_log=False):
         super().__init__(parent)
         self.is_log = is_log
-        self.setReadOnly(True)
-        self.setTextInteractionFlags(
-            Qt.TextSelectableByMouse | 
-            Qt.TextSelectableByKeyboard | 
-            Qt.LinksAccessibleByMouse | 
-            Qt.LinksAccessibleByKeyboard
-        )
-        self.setLineWrapMode(QTextEdit.NoWrap)
+        self.line_model = LogLineModel(self)
+        self.line_model.set_font_metrics(self.fontMetrics())
+        self.setModel(self.line_model)
+        # 行高一致 + 分批布局：插入大量行时不逐行计算尺寸
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(1000)
+        self.setTextElideMode(Qt.ElideNone)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
         self.setFocusPolicy(Qt.StrongFocus)
         self.add_shortcuts()
-        # 保存默认格式
-        self.default_format = QTextCharFormat(self.currentCharFormat())
-        
+
+        self._pending = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self.flush)
+
         # 添加悬停提示
         self.setToolTip("显示结果或日志信息，可选中复制内容")
 
@@ -93,19 +183,25 @@ class EnhancedTextEdit(QTextEdit):
         # 复制
         copy_action = QAction("复制", self)
         copy_action.setShortcut(QKeySequence.Copy)
+        copy_action.setShortcutContext(Qt.WidgetShortcut)
         copy_action.triggered.connect(self.copy)
         copy_action.setToolTip("复制选中的内容 (Ctrl+C)")
         self.addAction(copy_action)
-        
+
         # 全选
         select_all_action = QAction("全选", self)
         select_all_action.setShortcut(QKeySequence.SelectAll)
+        select_all_action.setShortcutContext(Qt.WidgetShortcut)
         select_all_action.triggered.connect(self.selectAll)
         select_all_action.setToolTip("选中所有内容 (Ctrl+A)")
         self.addAction(select_all_action)
 
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.line_model.set_font_metrics(self.fontMetrics())
+
     def keyPressEvent(self, event: QKeyEvent):
-        """仅处理复制、全选快捷键"""
         if event.matches(QKeySequence.Copy):
             self.copy()
             event.accept()
@@ -113,67 +209,75 @@ class EnhancedTextEdit(QTextEdit):
             self.selectAll()
             event.accept()
         else:
-            if event.key() in (Qt.Key_Left, Qt.Key_Right, Qt.Key_Up, Qt.Key_Down, 
-                              Qt.Key_PageUp, Qt.Key_PageDown, Qt.Key_Home, Qt.Key_End) or \
-               event.modifiers() & Qt.ShiftModifier:
-                super().keyPressEvent(event)
-            else:
-                event.ignore()
-
-    def mousePressEvent(self, event: QMouseEvent):
-        self.setFocus()
-        super().mousePressEvent(event)
+            super().keyPressEvent(event)
 
     def show_context_menu(self, position):
         """右键菜单（移除查找）"""
+        self.flush()
+        has_rows = self.line_model.rowCount() > 0
         menu = QMenu()
-        
+
         # 复制
         copy_action = menu.addAction("复制")
         copy_action.setShortcut(QKeySequence.Copy)
         copy_action.triggered.connect(self.copy)
-        copy_action.setEnabled(not self.textCursor().selection().isEmpty())
+        copy_action.setEnabled(self.selectionModel().hasSelection())
         copy_action.setToolTip("复制选中的内容 (Ctrl+C)")
-        
+
         # 全选
         select_all_action = menu.addAction("全选")
         select_all_action.setShortcut(QKeySequence.SelectAll)
         select_all_action.triggered.connect(self.selectAll)
-        select_all_action.setEnabled(not self.toPlainText().strip() == "")
+        select_all_action.setEnabled(has_rows)
         select_all_action.setToolTip("选中所有内容 (Ctrl+A)")
-        
+
         menu.addSeparator()
-        
+
         # 清空
         clear_action = menu.addAction("清空")
         clear_action.triggered.connect(self.clear)
-        clear_action.setEnabled(not self.toPlainText().strip() == "")
+        clear_action.setEnabled(has_rows)
         clear_action.setToolTip("清空当前窗口内容")
-        
-        menu.exec_(self.mapToGlobal(position))
 
+        menu.exec_(self.viewport().mapToGlobal(position))
+
+    # ------------------ 追加与刷新 ------------------
     def append_text(self, text, color=None):
-        """修复颜色异常问题：每次添加文本后强制恢复默认格式"""
-        self.blockSignals(True)
-        cursor = self.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        self.setTextCursor(cursor)
-        
-        # 保存当前格式
-        current_format = QTextCharFormat(self.currentCharFormat())
-        
-        if color:
-            temp_format = QTextCharFormat(current_format)
-            temp_format.setForeground(color)
-            self.setCurrentCharFormat(temp_format)
-        
-        self.insertPlainText(text + "\n")
-        
-        # 强制恢复为默认格式，修复颜色继承问题
-        self.setCurrentCharFormat(QTextCharFormat(self.default_format))
-        
-        self.blockSignals(False)
-        self.moveCursor(QTextCursor.End)
+        """追加一段文本（可含多行），统一颜色"""
+        self.append_rows([(line, color) for line in text.split("\n")])
+
+    def append_rows(self, rows):
+        """追加 [(文本, 颜色), ...]：先放进缓存，定时器到期后整批插入"""
+        self._pending.extend(rows)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        """把缓存的行插入模型；原本停在底部时继续跟随到最后一行"""
+        self._flush_timer.stop()
+        if not self._pending:
+            return
+        bar = self.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum()
+        rows, self._pending = self._pending, []
+        self.line_model.append_rows(rows)
+        if at_bottom:
+            self.scrollToBottom()
+
+    def clear(self):
+        self._flush_timer.stop()
+        self._pending = []
+        self.line_model.clear()
+
+    def copy(self):
+        """按行号顺序复制选中的行"""
+        rows = sorted(index.row() for index in self.selectionModel().selectedRows())
+        if rows:
+            QApplication.clipboard().setText("\n".join(self.line_model.text(r) for r in rows))
+
+    def toPlainText(self):
+        self.flush()
+        return self.line_model.all_text()
 
 
 class ShortcutLineEdit(QLineEdit):
@@ -230,23 +334,66 @@ class FileReplacerThread(QThread):
     progress_signal = pyqtSignal(int, str)
     finished_signal = pyqtSignal(list)
     log_signal = pyqtSignal(str, QColor)  # 添加颜色参数
-
-    def __init__(self, source_file, targets, backup_dir=None, preview_only=False, restore=False, target_root=None, restore_map=None):
+    log_batch_signal = pyqtSignal(list)  # 逐文件日志整批发送：[(文本, 颜色), ...]
+
+    LOG_BATCH_SIZE = 500  # 每批最多日志行数
+    BATCH_INTERVAL = 0.1  # 日志/进度两次发送之间最长间隔（秒）
+
+    # 核心逻辑日志级别对应的颜色
+    LOG_COLORS = {
+        LOG_BACKUP: QColor(Qt.darkGreen),
+        LOG_SUCCESS: QColor(Qt.blue),
+        LOG_ERROR: QColor(Qt.red),
+    }
+
+    def __init__(self, source_file, targets, backup_dir=None, preview_only=False, restore=False, target_root=None, restore_map=None, jobs=1,
+                 skip_identical=False, manifest_timestamp=None, hash_cache=None, backup_peers=(), archive_path=None,
+                 catalog=None, scan=None):
+        """scan(on_skip, is_running) 返回匹配文件的迭代器（替换时在本线程中遍历），参数无效时在此处抛出 ValueError"""
         super().__init__()
         self.source_file = source_file
-        self.targets = targets[:]
+        self.targets = list(targets)
         self.backup_dir = backup_dir
         self.preview_only = preview_only
         self.restore = restore
         self.target_root = target_root
         self.restore_map = restore_map or {}
+        self.jobs = jobs  # 并发处理的目标文件数
+        self.skip_identical = skip_identical  # 替换前比对内容，跳过已与源文件相同的目标
+        self.manifest_timestamp = manifest_timestamp  # 备份记录中的备份时间
+        self.identical = set()
+        self.hash_cache = hash_cache  # 目标摘要缓存（TargetIndex），未变化的目标不重复计算
+        self.backup_peers = list(backup_peers)  # 其他备份目录，已有的内容直接硬链接过来
+        self.store = None
+        self.digests = {}
+        self.archive_path = archive_path  # 不为空时备份写进这个压缩包（不使用 backup_dir）
+        self.archived = set()
+        self.backup_errors = {}  # 备份失败（或源文件无法读取）的目标 -> 结果，这些目标不再替换
+        self.archive_reader = ArchiveReader()  # 从压缩包还原时共用
+        self.catalog = catalog  # 全局备份索引（BackupCatalog），本次备份完成后收录
         self.is_running = True
+        self.matches = scan(on_skip=self._report_skip, is_running=lambda: self.is_running) if scan else None
+
+    def _report_skip(self, full):
+        self.log_signal.emit(f"已跳过: {full} (匹配到跳过关键词)", QColor(Qt.black))
 
     def run(self):
         results = []
+        if self.matches is not None:
+            # 进度需要总数、压缩包要在替换前写完全部备份、结果按目标顺序输出，
+            # 所以匹配结果在这里整体取出（只保存匹配的文件，候选文件仍是流式遍历）
+            self.log_signal.emit("正在查找匹配文件...", QColor(Qt.black))
+            try:
+                self.targets = list(self.matches)
+            except Exception as e:
+                self.log_signal.emit(f"错误：查找匹配文件失败：{str(e)}", QColor(Qt.red))
+                self.targets = []
+            if self.targets:
+                self.log_signal.emit(f"找到 {len(self.targets)} 个匹配文件", QColor(Qt.blue))
         total = len(self.targets)
         if total == 0:
-            self.finished_signal.emit(["未找到匹配的文件 {未找到匹配的文件}"])
+            # 替换时没有匹配：结果为空，由界面提示
+            self.finished_signal.emit([] if self.matches is not None else ["未找到匹配的文件 {未找到匹配的文件}"])
             return
         if self.preview_only:
             for full in self.targets:
@@ -254,77 +401,295 @@ class FileReplacerThread(QThread):
                 results.append(f"{filename} {{{full}}}")
             self.finished_signal.emit(results)
             return
-        
-        for idx, full in enumerate(self.targets):
-            if not self.is_running:
+
+        done_count = 0
+        pending_logs = []
+        last_percent = -1
+        last_emit = time.monotonic()
+
+        def flush_logs():
+            nonlocal pending_logs
+            if pending_logs:
+                self.log_batch_signal.emit(pending_logs)
+                pending_logs = []
+
+        def on_done(idx, outcome):
+            # 在本线程中按完成顺序汇总进度和日志，攒够一批或到时间才发给界面线程
+            nonlocal done_count, last_percent, last_emit
+            done_count += 1
+            _, logs = outcome
+            for text, level in logs:
+                pending_logs.append((text, self.LOG_COLORS.get(level, QColor(Qt.black))))
+            percent = int(done_count / total * 100)
+            now = time.monotonic()
+            due = now - last_emit >= self.BATCH_INTERVAL
+            if due or len(pending_logs) >= self.LOG_BATCH_SIZE:
+                flush_logs()
+            if due or percent != last_percent:
+                self.progress_signal.emit(percent, os.path.basename(self.targets[idx]))
+                last_percent = percent
+            if due:
+                last_emit = now
+
+        # 替换时所有目标共用同一个源：只打开/读取一次
+        self.copy_source = None
+        if not self.restore and self.source_file:
+            try:
+                self.copy_source = CopySource(self.source_file)
+            except OSError as e:
+                self.log_signal.emit(f"错误：无法读取源文件 {self.source_file}：{e}", QColor(Qt.red))
+                # 源文件打不开时任何目标都不能替换，也就不做备份（否则会留下无记录的备份）
+                for full in self.targets:
+                    self._backup_failed(full, f"无法读取源文件：{e}")
+        try:
+            if self.copy_source is not None and self.skip_identical:
+                self.log_signal.emit(f"正在比对 {total} 个目标与源文件的内容...", QColor(Qt.black))
+                self.identical = find_identical(self.copy_source, self.targets, self.jobs,
+                                                is_running=lambda: self.is_running,
+                                                hash_cache=self.hash_cache)
+                if self.identical:
+                    self.log_signal.emit(f"{len(self.identical)} 个目标已与源文件相同，将跳过", QColor(Qt.blue))
+            # 只备份真正会被替换的文件，跳过的目标没有备份
+            pending = [t for t in self.targets if t not in self.identical]
+            if self.copy_source is not None and self.archive_path and pending:
+                # 压缩包按内容摘要存放成员：先算出摘要，相同内容只写一次
+                self.log_signal.emit(f"正在计算 {len(pending)} 个待备份目标的内容摘要...", QColor(Qt.black))
+                self.digests = hash_targets(pending, self.jobs, is_running=lambda: self.is_running,
+                                            hash_cache=self.hash_cache)
+                self._write_archive(pending)
+            elif self.copy_source is not None and self.backup_dir and pending:
+                # 备份按内容摘要存放（相同内容只保存一份），每个目标备份完成后立即追加一条记录；
+                # 目录在确有文件需要备份时才创建
+                try:
+                    os.makedirs(self.backup_dir, exist_ok=True)
+                except OSError as e:
+                    self.log_signal.emit(f"错误：创建备份目录失败：{str(e)}", QColor(Qt.red))
+                    for full in pending:
+                        self._backup_failed(full, f"创建备份目录失败：{str(e)}")
+                else:
+                    self.store = BackupStore(self.backup_dir, self.backup_peers + sibling_backups(self.backup_dir),
+                                             hash_cache=self.hash_cache, timestamp=self.manifest_timestamp)
+                    self.log_signal.emit(f"备份记录将逐条追加到: {self.store.manifest.path}", QColor(Qt.black))
+            outcomes = run_parallel(self._process_target, self.targets, self.jobs,
+                                    is_running=lambda: self.is_running, on_done=on_done)
+        finally:
+            flush_logs()
+            if self.copy_source is not None:
+                self.copy_source.close()
+            if self.store is not None:
+                self.store.close()
+            self.archive_reader.close()
+            if self.catalog is not None and (self.store is not None or self.archive_path):
+                self._sync_catalog(self.archive_path or self.backup_dir)
+        # 结果保持目标原有顺序；被终止时只记录第一个未处理的文件
+        for full, outcome in zip(self.targets, outcomes):
+            if outcome is None:
                 results.append(("error", f"{full} - 操作被终止"))
                 break
-            
-            filename = os.path.basename(full)
-            disp = f"{filename} {{{full}}}"
-            try:
-                if self.restore:
-                    # 当提供 restore_map 时，按映射还原，不强制要求备份目录存在
-                    if self.restore_map:
-                        original_target_path = self.restore_map.get(full)
-                        if not original_target_path:
-                            results.append(("error", f"{disp} - 缺少还原映射"))
-                            self.log_signal.emit(f"错误：{disp} - 缺少还原映射", QColor(Qt.red))
-                            continue
-                    else:
-                        if not self.backup_dir or not os.path.exists(self.backup_dir):
-                            results.append(("error", f"{disp} - 备份目录不存在"))
-                            self.log_signal.emit(f"错误：{disp} - 备份目录不存在", QColor(Qt.red))
-                            continue
-                        if not self.target_root or not os.path.exists(self.target_root):
-                            results.append(("error", f"{disp} - 备份时的目标根路径无效"))
-                            self.log_signal.emit(f"错误：{disp} - 备份时的目标根路径无效", QColor(Qt.red))
-                            continue
-                        rel_path = os.path.relpath(full, self.backup_dir)
-                        original_target_path = os.path.normpath(os.path.join(self.target_root, rel_path))
-                    
-                    if not os.path.exists(full):
-                        results.append(("error", f"{disp} - 备份文件不存在：{full}"))
-                        self.log_signal.emit(f"错误：{disp} - 备份文件不存在：{full}", QColor(Qt.red))
-                        continue
-                    
-                    success, msg = safe_copy(full, original_target_path)
-                    if success:
-                        results.append(("restore", f"{os.path.basename(original_target_path)} {{{original_target_path}}}"))
-                        self.log_signal.emit(f"[还原成功] {original_target_path}", QColor(Qt.blue))
-                    else:
-                        results.append(("error", f"{os.path.basename(original_target_path)} {{{original_target_path}}} - 还原失败：{msg}"))
-                        self.log_signal.emit(f"错误：{os.path.basename(original_target_path)} {{{original_target_path}}} - 还原失败：{msg}", QColor(Qt.red))
-                
+            results.append(outcome[0])
+
+        self.finished_signal.emit(results)
+
+    def _write_archive(self, pending):
+        """压缩包备份：替换开始前把待替换的目标依次写进一个压缩包，写入失败的目标不再替换"""
+        self.log_signal.emit(f"正在把 {len(pending)} 个目标写入备份压缩包：{self.archive_path}", QColor(Qt.black))
+        try:
+            writer = ArchiveBackupWriter(self.archive_path)
+        except Exception as e:
+            self.log_signal.emit(f"错误：创建备份压缩包失败：{str(e)}", QColor(Qt.red))
+            for full in pending:
+                self._backup_failed(full, f"创建备份压缩包失败：{str(e)}")
+            return
+        last_emit = time.monotonic()
+        try:
+            for count, full in enumerate(pending, 1):
+                if not self.is_running:
+                    break
+                digest = self.digests.get(full)
+                method, msg = writer.put(full, digest) if digest is not None else (None, "无法读取目标内容")
+                if method is None:
+                    self._backup_failed(full, msg)
                 else:
-                    if self.backup_dir:
-                        # 将备份文件直接放入同一备份文件夹（不再创建父级子目录）
-                        backup_path = os.path.join(self.backup_dir, os.path.basename(full))
-                        success, msg = safe_copy(full, backup_path)
-                        if not success:
-                            results.append(("error", f"{disp} - 备份失败：{msg}"))
-                            self.log_signal.emit(f"错误：{disp} - 备份失败：{msg}", QColor(Qt.red))
-                            continue
-                        self.log_signal.emit(f"已备份：{full} → {backup_path}", QColor(Qt.darkGreen))
-                    
-                    success, msg = safe_copy(self.source_file, full)
-                    if success:
-                        results.append(("success", disp))
-                        self.log_signal.emit(f"[替换成功] {disp}", QColor(Qt.blue))
-                    else:
-                        results.append(("error", f"{disp} - 替换失败：{msg}"))
-                        self.log_signal.emit(f"错误：{disp} - 替换失败：{msg}", QColor(Qt.red))
-            
+                    self.archived.add(full)
+                if time.monotonic() - last_emit >= self.BATCH_INTERVAL:
+                    self.progress_signal.emit(int(count / len(pending) * 100), f"备份 {os.path.basename(full)}")
+                    last_emit = time.monotonic()
+        finally:
+            try:
+                writer.close(self.manifest_timestamp)
+                self.log_signal.emit(f"已写入备份压缩包：{self.archive_path}（{len(self.archived)} 个文件）",
+                                     QColor(Qt.black))
             except Exception as e:
-                error_details = f"{disp} - 未知错误：{str(e)}"
-                results.append(("error", error_details))
-                self.log_signal.emit(f"错误：{error_details}", QColor(Qt.red))
-            
-            percent = int((idx + 1) / total * 100)
-            self.progress_signal.emit(percent, filename)
-        
-        self.finished_signal.emit(results)
-    
+                self.log_signal.emit(f"错误：写入备份压缩包失败：{str(e)}", QColor(Qt.red))
+                # 压缩包不完整时一个目标都不替换
+                for full in list(self.archived):
+                    self._backup_failed(full, f"写入备份压缩包失败：{str(e)}")
+                self.archived.clear()
+
+    def _sync_catalog(self, backup):
+        """把本次备份收录进全局备份索引（之后还原时直接查表）"""
+        try:
+            self.catalog.sync(backup)
+        except Exception as e:
+            self.log_signal.emit(f"更新备份索引失败：{str(e)}", QColor(Qt.red))
+        finally:
+            self.catalog.close()
+
+    def _backup_failed(self, full, msg):
+        disp = f"{os.path.basename(full)} {{{full}}}"
+        self.backup_errors[full] = (("error", f"{disp} - 备份失败：{msg}"),
+                                    [(f"错误：{disp} - 备份失败：{msg}", LOG_ERROR)])
+
+    def _process_target(self, full):
+        """处理单个目标（在线程池中执行），返回 (result, logs)"""
+        filename = os.path.basename(full)
+        disp = f"{filename} {{{full}}}"
+        try:
+            if self.restore:
+                # 当提供 restore_map（原始路径 -> 备份文件）时，targets 为原始路径，按映射还原，
+                # 不强制要求备份目录存在；同一份备份内容可以还原到多个原始位置
+                if self.restore_map:
+                    backup_file = self.restore_map.get(full)
+                    if not backup_file:
+                        return ("error", f"{disp} - 缺少还原映射"), [(f"错误：{disp} - 缺少还原映射", LOG_ERROR)]
+                    if isinstance(backup_file, ArchiveMember):
+                        return restore_archive_member(backup_file, full, self.archive_reader)
+                    return restore_file(backup_file, full)
+                # 兼容旧版 manifest.txt：targets 为备份文件，按目标根路径拼接相对路径
+                if not self.backup_dir or not os.path.exists(self.backup_dir):
+                    return ("error", f"{disp} - 备份目录不存在"), [(f"错误：{disp} - 备份目录不存在", LOG_ERROR)]
+                if not self.target_root or not os.path.exists(self.target_root):
+                    return (("error", f"{disp} - 备份时的目标根路径无效"),
+                            [(f"错误：{disp} - 备份时的目标根路径无效", LOG_ERROR)])
+                rel_path = os.path.relpath(full, self.backup_dir)
+                original_target_path = os.path.normpath(os.path.join(self.target_root, rel_path))
+                return restore_file(full, original_target_path)
+            if full in self.identical:
+                return skip_identical_result(full)
+            if self.archive_path and full not in self.archived and full not in self.backup_errors:
+                self._backup_failed(full, "未写入备份压缩包")
+            if full in self.backup_errors:
+                return self.backup_errors[full]
+            if self.archive_path:
+                result, logs = replace_file(self.source_file, full, None, self.copy_source)
+                return result, [(f"已备份：{full} → {self.archive_path}", LOG_BACKUP)] + logs
+            return replace_file(self.source_file, full, self.backup_dir, self.copy_source,
+                                self.store, self.digests.get(full))
+
+        except Exception as e:
+            error_details = f"{disp} - 未知错误：{str(e)}"
+            return ("error", error_details), [(f"错误：{error_details}", LOG_ERROR)]
+
+    def stop(self):
+        self.is_running = False
+
+
+class MatchScanWorker(QThread):
+    """后台预览：遍历一次选中的目标，分批把匹配文件发回界面线程，可随时取消"""
+    batch_signal = pyqtSignal(list)
+    log_signal = pyqtSignal(str, QColor)
+    finished_signal = pyqtSignal(int, bool)  # 参数：匹配总数、是否被取消
+
+    BATCH_SIZE = 500  # 每批最多条目数
+    BATCH_INTERVAL = 0.1  # 两批之间最长间隔（秒）
+
+    def __init__(self, scan):
+        """scan(on_skip, is_running) 返回匹配文件的迭代器，参数无效时在此处抛出 ValueError"""
+        super().__init__()
+        self.is_running = True
+        self.found_count = 0
+        self.matches = scan(on_skip=self._report_skip, is_running=lambda: self.is_running)
+
+    def _report_skip(self, full):
+        self.log_signal.emit(f"已跳过: {full} (匹配到跳过关键词)", QColor(Qt.black))
+
+    def run(self):
+        batch = []
+        last_emit = time.monotonic()
+        try:
+            for full in self.matches:
+                batch.append(full)
+                self.found_count += 1
+                if len(batch) >= self.BATCH_SIZE or time.monotonic() - last_emit >= self.BATCH_INTERVAL:
+                    self.batch_signal.emit(batch)
+                    batch = []
+                    last_emit = time.monotonic()
+        except Exception as e:
+            self.log_signal.emit(f"预览失败: {str(e)}", QColor(Qt.red))
+        if batch:
+            self.batch_signal.emit(batch)
+        self.finished_signal.emit(self.found_count, not self.is_running)
+
+    def stop(self):
+        self.is_running = False
+
+
+class TreeSearchWorker(QThread):
+    """后台搜索目标目录树：首次搜索某个目录时建立文件名索引，之后只查索引，
+    分批把匹配项发回界面线程，可随时取消"""
+    batch_signal = pyqtSignal(list)  # [(路径, 是否为文件夹), ...]
+    log_signal = pyqtSignal(str, QColor)
+    finished_signal = pyqtSignal(int, bool)  # 参数：匹配总数、是否被取消
+
+    BATCH_SIZE = 200  # 每批最多条目数
+    BATCH_INTERVAL = 0.1  # 两批之间最长间隔（秒）
+
+    def __init__(self, name_index, roots, search_text, search_dirs, excluded=(), blocked_parents=()):
+        super().__init__()
+        self.name_index = name_index
+        self.roots = list(roots)
+        self.search_text = search_text
+        self.search_dirs = search_dirs  # True 搜文件夹，False 搜文件
+        self.excluded = excluded  # 已移除的路径（PathSet 快照）
+        self.blocked_parents = set(blocked_parents)
+        self.is_running = True
+        self.found_count = 0
+        self._batch = []
+        self._last_emit = time.monotonic()
+
+    def run(self):
+        is_running = lambda: self.is_running
+        try:
+            self.name_index.build_pending(is_running)
+            for root in self.roots:
+                if not self.is_running:
+                    break
+                if root in self.excluded:
+                    continue
+                if os.path.isdir(root):
+                    if not self.name_index.has_root(root) and not self.name_index.build(root, is_running):
+                        break
+                    for path, is_dir in self.name_index.search([root], self.search_text, self.search_dirs,
+                                                               self.excluded, self.blocked_parents, is_running):
+                        self._add(path, is_dir)
+                elif os.path.isfile(root):
+                    self._match(root, False)
+        except Exception as e:
+            self.log_signal.emit(f"搜索失败: {str(e)}", QColor(Qt.red))
+        self._flush()
+        self.finished_signal.emit(self.found_count, not self.is_running)
+
+    def _match(self, path, is_dir):
+        """单独添加的顶层文件：直接比对名称"""
+        if is_dir != self.search_dirs or self.search_text not in os.path.basename(path).lower():
+            return
+        # 搜索模式屏蔽：父目录在屏蔽集合中的项不再出现在结果里
+        if os.path.dirname(path) in self.blocked_parents:
+            return
+        self._add(path, is_dir)
+
+    def _add(self, path, is_dir):
+        self._batch.append((path, is_dir))
+        self.found_count += 1
+        if len(self._batch) >= self.BATCH_SIZE or time.monotonic() - self._last_emit >= self.BATCH_INTERVAL:
+            self._flush()
+
+    def _flush(self):
+        if self._batch:
+            self.batch_signal.emit(self._batch)
+            self._batch = []
+        self._last_emit = time.monotonic()
+
     def stop(self):
         self.is_running = False
 
@@ -365,6 +730,14 @@ class DraggableTreeWidget(QTreeWidget):
         self.itemExpanded.connect(self.on_item_expanded)
         # 新增：连接折叠信号，及时维护展开状态集合
         self.itemCollapsed.connect(self.on_item_collapsed)
+        # 路径 → 节点索引：随节点插入、移除、修改路径自动维护（同一路径在搜索结果中可能对应多个节点）
+        self._path_items = {}
+        self._item_keys = {}  # id(节点) → 索引中的路径（QTreeWidgetItem 不可哈希）
+        model = self.model()
+        model.rowsInserted.connect(self._on_rows_inserted)
+        model.rowsAboutToBeRemoved.connect(self._on_rows_about_to_be_removed)
+        model.modelAboutToBeReset.connect(self._clear_path_index)
+        model.dataChanged.connect(self._on_item_data_changed)
         # 安装事件过滤器处理右键点击
         self.viewport().installEventFilter(self)
         
@@ -375,6 +748,84 @@ class DraggableTreeWidget(QTreeWidget):
         """设置父窗口引用（用于调用方法）"""
         self.main_window = main_window
 
+    # ---------------- 路径索引 ----------------
+    def items_for_path(self, path):
+        """按路径取节点（O(1)），返回列表"""
+        if not path:
+            return []
+        return list(self._path_items.get(os.path.normpath(path), ()))
+
+    def _index_subtree(self, item):
+        stack = [item]
+        while stack:
+            node = stack.pop()
+            path = node.data(0, Qt.UserRole)
+            if path:
+                key = os.path.normpath(path)
+                self._path_items.setdefault(key, []).append(node)
+                self._item_keys[id(node)] = key
+            stack.extend(node.child(i) for i in range(node.childCount()))
+
+    def _unindex_item(self, node):
+        key = self._item_keys.pop(id(node), None)
+        if key is None:
+            return
+        remaining = [x for x in self._path_items.get(key, ()) if x is not node]
+        if remaining:
+            self._path_items[key] = remaining
+        else:
+            self._path_items.pop(key, None)
+
+    def _unindex_subtree(self, item):
+        stack = [item]
+        while stack:
+            node = stack.pop()
+            self._unindex_item(node)
+            stack.extend(node.child(i) for i in range(node.childCount()))
+
+    def _child_items(self, parent_index, first, last):
+        parent = self.itemFromIndex(parent_index) if parent_index.isValid() else self.invisibleRootItem()
+        return [parent.child(row) for row in range(first, last + 1)]
+
+    def _on_rows_inserted(self, parent_index, first, last):
+        for item in self._child_items(parent_index, first, last):
+            if item is not None:
+                self._index_subtree(item)
+
+    def _on_rows_about_to_be_removed(self, parent_index, first, last):
+        for item in self._child_items(parent_index, first, last):
+            if item is not None:
+                self._unindex_subtree(item)
+
+    def _clear_path_index(self):
+        self._path_items.clear()
+        self._item_keys.clear()
+
+    def _on_item_data_changed(self, top_left, bottom_right, roles=()):
+        """节点路径被修改（重命名）时更新索引"""
+        if roles and Qt.UserRole not in roles:
+            return
+        item = self.itemFromIndex(top_left)
+        if item is None:
+            return
+        path = item.data(0, Qt.UserRole)
+        key = os.path.normpath(path) if path else None
+        if self._item_keys.get(id(item)) == key:
+            return
+        self._unindex_item(item)
+        if key:
+            self._path_items.setdefault(key, []).append(item)
+            self._item_keys[id(item)] = key
+
+    @staticmethod
+    def _is_within(item, root_ids):
+        """item 是否位于 root_ids 中某个节点的子树内（含自身）"""
+        while item is not None:
+            if id(item) in root_ids:
+                return True
+            item = item.parent()
+        return False
+
     # 修复全选快捷键：确保树状图能处理Shift+A
     def keyPressEvent(self, event: QKeyEvent):
         if self.main_window:
@@ -430,16 +881,12 @@ class DraggableTreeWidget(QTreeWidget):
                     continue
                 
                 # 检查是否已存在（修复问题2：允许在清空后重新拖入）
-                exists = False
-                for i in range(self.topLevelItemCount()):
-                    top_item = self.topLevelItem(i)
-                    if top_item.data(0, Qt.UserRole) == path:
-                        exists = True
-                        break
+                exists = any(item.parent() is None and item.data(0, Qt.UserRole) == path
+                             for item in self.items_for_path(path))
                 
                 # 特殊情况：如果树为空且路径在已移除列表中，允许重新添加
                 if not exists and self.topLevelItemCount() == 0 and path in self.main_window.removed_items:
-                    self.main_window.removed_items.remove(path)
+                    self.main_window.removed_items.discard(path)
                 
                 if exists:
                     QMessageBox.information(self.main_window, "提示", f"路径已存在: {path}")
@@ -486,57 +933,14 @@ class DraggableTreeWidget(QTreeWidget):
                     parent_item.takeChild(0)
             except Exception:
                 pass
-            # 获取目录内容并按类型排序（文件夹在前，文件在后）
-            dirs = []
-            files = []
-            for f in os.listdir(path):
-                full_path = os.path.join(path, f)
-                # 跳过已移除的项目
-                if full_path in self.main_window.removed_items:
-                    continue
-                if os.path.isdir(full_path):
-                    dirs.append(f)
-                else:
-                    files.append(f)
-            
-            # 文件夹按名称排序
-            dirs.sort(key=str.lower)
-            
-            # 文件按后缀排序，再按名称排序
-            def get_file_sort_key(filename):
-                name, ext = os.path.splitext(filename)
-                return (ext.lower(), name.lower())
-            
-            files.sort(key=get_file_sort_key)
-            
             # 先添加文件夹，再添加文件
-            for f in dirs + files:
+            for f, is_dir in self.list_children(path):
                 child_path = os.path.join(path, f)
-                child_item = QTreeWidgetItem([f])
-                child_item.setData(0, Qt.UserRole, child_path)
-                
-                # 设置图标 - 使用Windows资源管理器图标
-                if os.path.isdir(child_path):
-                    # 使用系统文件夹图标
-                    file_info = QFileInfo(child_path)
-                    icon_provider = QFileIconProvider()
-                    icon = icon_provider.icon(file_info)
-                    child_item.setIcon(0, icon)
-                    # 标记为可展开（即使还没有加载子项）
-                    child_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
-                else:
-                    # 使用系统文件图标
-                    file_info = QFileInfo(child_path)
-                    icon_provider = QFileIconProvider()
-                    icon = icon_provider.icon(file_info)
-                    child_item.setIcon(0, icon)
-                    # 文件没有子项
-                    child_item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicator)
-                
+                child_item = self.make_child_item(child_path, is_dir)
                 parent_item.addChild(child_item)
                 
                 # 如果是已展开的目录，递归标记为已加载
-                if os.path.isdir(child_path) and child_path in self.expanded_paths:
+                if is_dir and child_path in self.expanded_paths:
                     self.load_children(child_item, child_path)
                     self.loaded_dirs.add(child_path)
                     
@@ -544,6 +948,98 @@ class DraggableTreeWidget(QTreeWidget):
             if self.main_window:
                 self.main_window.log(f"无法访问 {path}: {e}")
 
+    def list_children(self, path):
+        """获取目录内容并按类型排序（文件夹在前，文件在后），返回 [(名称, 是否为文件夹), ...]"""
+        dirs = []
+        files = []
+        removed = self.main_window.removed_items if self.main_window else ()
+        with os.scandir(path) as it:
+            for entry in it:
+                # 跳过已移除的项目
+                if entry.path in removed:
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+        
+        # 文件夹按名称排序
+        dirs.sort(key=str.lower)
+        
+        # 文件按后缀排序，再按名称排序
+        def get_file_sort_key(filename):
+            name, ext = os.path.splitext(filename)
+            return (ext.lower(), name.lower())
+        
+        files.sort(key=get_file_sort_key)
+        return [(f, True) for f in dirs] + [(f, False) for f in files]
+
+    def make_child_item(self, child_path, is_dir):
+        """创建子项节点：设置图标（Windows资源管理器图标）和展开指示器"""
+        child_item = QTreeWidgetItem([os.path.basename(child_path)])
+        child_item.setData(0, Qt.UserRole, child_path)
+        # 使用系统文件夹/文件图标（按扩展名缓存）
+        child_item.setIcon(0, shared_icon_cache().icon(child_path, is_dir=is_dir))
+        if is_dir:
+            # 标记为可展开（即使还没有加载子项）
+            child_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        else:
+            # 文件没有子项
+            child_item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicator)
+        return child_item
+
+    def sync_children(self, parent_item, path):
+        """重新列举目录，只增删有变化的子项，其余子项（及其展开状态、选中状态）保持不变"""
+        try:
+            wanted = self.list_children(path)
+        except OSError as e:
+            if self.main_window:
+                self.main_window.log(f"无法访问 {path}: {e}")
+            return
+        wanted_set = set(wanted)
+        # 先移除已消失（或类型改变）的子项，剩余子项的相对顺序不变
+        for i in range(parent_item.childCount() - 1, -1, -1):
+            child = parent_item.child(i)
+            key = (os.path.basename(child.data(0, Qt.UserRole)),
+                   child.childIndicatorPolicy() == QTreeWidgetItem.ShowIndicator)
+            if key not in wanted_set:
+                self.forget_loaded(child)
+                parent_item.takeChild(i)
+        # 再按目标顺序插入新出现的子项
+        existing = {os.path.basename(parent_item.child(i).data(0, Qt.UserRole)): parent_item.child(i)
+                    for i in range(parent_item.childCount())}
+        new_items = []
+        for i, (f, is_dir) in enumerate(wanted):
+            child = parent_item.child(i)
+            if child is not None and os.path.basename(child.data(0, Qt.UserRole)) == f:
+                continue
+            if f in existing:
+                # 仅大小写不同的同名项排序可能变化：移动到目标位置
+                moved = parent_item.takeChild(parent_item.indexOfChild(existing[f]))
+                parent_item.insertChild(i, moved)
+                continue
+            child_path = os.path.join(path, f)
+            child_item = self.make_child_item(child_path, is_dir)
+            parent_item.insertChild(i, child_item)
+            self.loaded_dirs.discard(child_path)
+            new_items.append(child_item)
+        # 新出现的目录若之前展开过，恢复展开（展开时懒加载子项）
+        self.restore_expanded_state(new_items)
+
+    def forget_loaded(self, item):
+        """节点被移除时，从已加载目录记录中删除它及其子孙"""
+        self.loaded_dirs.discard(item.data(0, Qt.UserRole))
+        for i in range(item.childCount()):
+            self.forget_loaded(item.child(i))
+
+    def find_items(self, path):
+        """按路径查找节点"""
+        return self.items_for_path(path)
+
     # ---------------- 鼠标事件处理（修复选择问题） ----------------
     def mousePressEvent(self, event: QMouseEvent):
         """修复问题1：点击展开箭头不改变选择状态"""
@@ -785,6 +1281,12 @@ class DraggableTreeWidget(QTreeWidget):
             rename_action.setEnabled(len(self.selectedItems()) == 1)  # 只允许单个选中项重命名
             rename_action.setToolTip("重命名选中的文件或文件夹")
             menu.addAction(rename_action)
+
+            restore_version_action = QAction("还原到历史版本...", self)
+            restore_version_action.triggered.connect(self.main_window.restore_selected_version)
+            restore_version_action.setEnabled(len(self.selectedItems()) == 1)
+            restore_version_action.setToolTip("从列表中的备份里选择选中文件的一个版本进行还原")
+            menu.addAction(restore_version_action)
             
             menu.addSeparator()
             
@@ -826,74 +1328,55 @@ class DraggableTreeWidget(QTreeWidget):
         # 若暂停展开状态跟踪，则不更新集合，避免误清空
         if getattr(self, "suspend_expand_tracking", False):
             return
-        self.expanded_paths.clear()
-        def recurse(item):
-            path = item.data(0, Qt.UserRole)
-            if item.isExpanded():
-                self.expanded_paths.add(path)
-            for i in range(item.childCount()):
-                recurse(item.child(i))
-        for i in range(self.topLevelItemCount()):
-            recurse(self.topLevelItem(i))
-
-    def restore_expanded_state(self):
-        """恢复展开状态"""
-        def recurse(item):
-            path = item.data(0, Qt.UserRole)
-            if path in self.expanded_paths:
-                item.setExpanded(True)
-            for i in range(item.childCount()):
-                recurse(item.child(i))
-        for i in range(self.topLevelItemCount()):
-            recurse(self.topLevelItem(i))
+        # 只有加载过子项的目录才可能处于展开状态，无需遍历整棵树
+        self.expanded_paths = {
+            item.data(0, Qt.UserRole)
+            for path in self.loaded_dirs
+            for item in self.items_for_path(path)
+            if item.isExpanded()
+        }
 
-
-def safe_copy(src_path, dst_path, buffer_size=1024*1024):
-    """安全复制函数（保留原逻辑）"""
-    if not os.path.exists(src_path):
-        return False, f"源文件不存在：{src_path}"
-    
-    dst_dir = os.path.dirname(dst_path)
-    os.makedirs(dst_dir, exist_ok=True)
-    
-    temp_dst = f"{dst_path}.tmp"
-    try:
-        with open(src_path, 'rb') as src_file:
-            with open(temp_dst, 'wb') as dst_file:
-                while True:
-                    buffer = src_file.read(buffer_size)
-                    if not buffer:
-                        break
-                    dst_file.write(buffer)
-        
-        shutil.copystat(src_path, temp_dst)
-        if os.path.exists(dst_path):
-            os.remove(dst_path)
-        os.rename(temp_dst, dst_path)
-        
-        return True, "复制成功"
-    except PermissionError:
-        if os.path.exists(temp_dst):
-            os.remove(temp_dst)
-        return False, "权限不足（文件可能被其他程序占用）"
-    except Exception as e:
-        if os.path.exists(temp_dst):
-            os.remove(temp_dst)
-        return False, f"复制失败：{str(e)}"
+    def restore_expanded_state(self, items=None):
+        """恢复展开状态（items 不为空时只处理这些节点的子树）"""
+        root_ids = None if items is None else {id(item) for item in items}
+        # 父目录先展开：展开时懒加载的子项随后即可按路径找到
+        for path in sorted((p for p in self.expanded_paths if p), key=len):
+            for item in self.items_for_path(path):
+                if root_ids is None or self._is_within(item, root_ids):
+                    item.setExpanded(True)
 
 
 class FileReplacerApp(QMainWindow):
     """主窗口（修复所有交互问题）"""
+    SEARCH_DELAY_MS = 300  # 输入关键词后延迟多久开始搜索
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.backup_dir = None
-        self.original_tree_items = []  # 存储原始项的路径而非对象，避免引用问题
-        self.removed_items = []  # 存储被手动移除的项，用于撤销操作
+        self.original_tree_items = PathSet()  # 存储原始项的路径而非对象，避免引用问题（保持添加顺序）
+        self.removed_items = PathSet()  # 存储被手动移除的项（其下的子项一并视为移除），用于撤销操作
         self.file_watcher = QFileSystemWatcher()  # 自动刷新监控
         self.operation_history = []  # 操作历史，用于撤销功能
         self.search_block_parents = set()  # 搜索模式下屏蔽的父目录集合
         self.search_query = ""  # 保存当前搜索关键词
         self.search_type = ""  # 保存当前搜索类型
+        self.search_worker = None  # 正在进行的后台搜索
+        self.preview_worker = None  # 正在进行的后台预览
+        self._stopped_previews = set()  # 已取消但尚未退出的预览线程
+        self.name_index = NameIndex()  # 目标目录树的文件名索引，搜索时不再重新扫描磁盘
+        self._stopped_searches = set()  # 已取消但尚未退出的搜索线程
+        # 目标目录索引：再次预览/替换时只重新列举有变化的目录
+        try:
+            self.target_index = TargetIndex()
+        except (OSError, sqlite3.Error) as e:
+            print(f"目标目录索引不可用，改为每次完整扫描: {e}")
+            self.target_index = None
+        # 全局备份索引：还原时按原始路径直接查出各备份中的版本；不可用时退回内存中的临时索引
+        try:
+            self.backup_catalog = BackupCatalog()
+        except (OSError, sqlite3.Error) as e:
+            print(f"备份索引不可用，改为仅在本次运行中建立: {e}")
+            self.backup_catalog = BackupCatalog(":memory:")
         self.init_shortcuts()  # 初始化快捷键
         self.init_ui()
         self.init_file_watcher()
@@ -1052,7 +1535,7 @@ class FileReplacerApp(QMainWindow):
         match_layout.setContentsMargins(10, 10, 10, 10)
         match_group.setLayout(match_layout)
         self.match_combo = QComboBox()
-        self.match_combo.addItems(["后缀匹配", "关键词匹配", "正则表达式"])
+        self.match_combo.addItems(MATCH_MODES)
         self.match_combo.setToolTip("""
         后缀匹配：根据文件后缀名进行匹配
         关键词匹配：根据文件名包含的关键词进行匹配
@@ -1107,6 +1590,12 @@ class FileReplacerApp(QMainWindow):
         self.backup_enable.stateChanged.connect(self.update_backup_controls)
         self.backup_enable.setToolTip("勾选则在替换文件前创建备份，以便需要时还原")
         
+        self.archive_backup_cb = QCheckBox("压缩包")
+        self.archive_backup_cb.setChecked(QSettings("BatchReplace", "Options").value("archive_backup", False, type=bool))
+        self.archive_backup_cb.setToolTip("把每次替换的备份写进一个 backup-时间戳.zip（含 manifest），\n"
+                                          "大量小文件时备份、清除都更快；还原时直接从压缩包读取")
+        self.archive_backup_cb.toggled.connect(lambda v: QSettings("BatchReplace", "Options").setValue("archive_backup", v))
+
         self.backup_edit = DraggableLineEdit()
         self.backup_edit.setPlaceholderText("不填则自动在目标目录创建 backup-年-月-日-时-分")
         self.backup_edit.setToolTip("指定备份文件的保存目录，不填则自动创建")
@@ -1138,6 +1627,7 @@ class FileReplacerApp(QMainWindow):
         row_inputs = QHBoxLayout()
         self.backup_edit.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         row_inputs.addWidget(self.backup_enable)
+        row_inputs.addWidget(self.archive_backup_cb)
         row_inputs.addWidget(self.backup_edit)
         row_inputs.addWidget(self.btn_backup_select)
         row_inputs.addWidget(self.btn_backup_clear)
@@ -1200,6 +1690,13 @@ class FileReplacerApp(QMainWindow):
         self.tree_search.setToolTip("输入关键词搜索文件或文件夹，支持部分匹配")
         # 添加回车键触发搜索
         self.tree_search.returnPressed.connect(self.on_search_clicked)
+        # 输入时自动搜索（防抖），新的输入会取消上一次尚未完成的搜索
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self._on_search_timer)
+        self.tree_search.textChanged.connect(self.schedule_search)
+        self.search_type_combo.currentIndexChanged.connect(self.schedule_search)
         
         self.btn_search = QPushButton("搜索")
         self.btn_search.clicked.connect(self.on_search_clicked)
@@ -1279,6 +1776,22 @@ class FileReplacerApp(QMainWindow):
         ops_layout.addWidget(self.btn_restore_all)
         ops_layout.addWidget(self.btn_clear_selected)
         ops_layout.addWidget(self.btn_clear_all)
+
+        # 并发数：同时备份/替换的文件数，机械硬盘建议调小
+        jobs_label = QLabel("并发:")
+        self.jobs_spin = QSpinBox()
+        self.jobs_spin.setRange(1, MAX_JOBS)
+        self.jobs_spin.setValue(QSettings("BatchReplace", "Options").value("jobs", default_jobs(), type=int))
+        self.jobs_spin.setToolTip("同时处理的文件数（SSD/网络共享可调大，机械硬盘建议 1~2）")
+        self.jobs_spin.valueChanged.connect(lambda v: QSettings("BatchReplace", "Options").setValue("jobs", v))
+        ops_layout.addWidget(jobs_label)
+        ops_layout.addWidget(self.jobs_spin)
+
+        self.skip_identical_cb = QCheckBox("跳过相同文件")
+        self.skip_identical_cb.setChecked(QSettings("BatchReplace", "Options").value("skip_identical", True, type=bool))
+        self.skip_identical_cb.setToolTip("替换前比对内容，已与源文件完全相同的目标不备份也不覆盖")
+        self.skip_identical_cb.toggled.connect(lambda v: QSettings("BatchReplace", "Options").setValue("skip_identical", v))
+        ops_layout.addWidget(self.skip_identical_cb)
         
         # 进度条
         prog_widget = QWidget()
@@ -1328,7 +1841,7 @@ class FileReplacerApp(QMainWindow):
         self.preview_header.setContentsMargins(0, 0, 0, 0)
         self.preview_header.setToolTip("显示文件列表统计信息")
         
-        self.result_list = EnhancedTextEdit(is_log=False)
+        self.result_list = LogListView(is_log=False)
         self.result_list.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.result_list.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.result_list.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -1345,7 +1858,7 @@ class FileReplacerApp(QMainWindow):
         log_layout = QVBoxLayout(log_group)
         log_layout.setContentsMargins(5, 2, 5, 5)
         
-        self.log_list = EnhancedTextEdit(is_log=True)
+        self.log_list = LogListView(is_log=True)
         self.log_list.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.log_list.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.log_list.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -1374,42 +1887,82 @@ class FileReplacerApp(QMainWindow):
         # 增加监控超时，避免频繁刷新
         self.last_refresh_time = 0
         self.refresh_delay = 1000  # 1秒延迟
+        self.pending_changed_dirs = set()  # 延迟期间累积的变化目录
+        self.change_timer = QTimer(self)
+        self.change_timer.setSingleShot(True)
+        self.change_timer.timeout.connect(self.apply_pending_changes)
 
     def on_dir_changed(self, path):
-        """目录变化时自动刷新（增加延迟）"""
-        current_time = time.time() * 1000  # 毫秒
-        if current_time - self.last_refresh_time > self.refresh_delay:
-            self.last_refresh_time = current_time
-            self.log(f"检测到目录变化：{path}，自动刷新")
-            # 保留搜索与展开状态
-            self.refresh_tree_preserve_state()
-            # 取消搜索模式下的自动展开，避免干扰用户视图
-            self.update_watcher()
+        """目录变化时自动刷新（增加延迟，延迟期间的多次变化合并为一次刷新）"""
+        if self.target_index is not None:
+            # 不受刷新延迟影响：每次变化都让索引中的该目录失效
+            try:
+                self.target_index.invalidate(path)
+            except sqlite3.Error as e:
+                print(f"更新目标目录索引失败: {e}")
+        self.pending_changed_dirs.add(os.path.normpath(path))
+        if not self.change_timer.isActive():
+            # 距上次刷新已超过延迟则立即刷新，否则等到延迟结束
+            elapsed = time.time() * 1000 - self.last_refresh_time
+            self.change_timer.start(max(0, int(self.refresh_delay - elapsed)))
 
     def on_file_changed(self, path):
-        """文件变化时自动刷新（增加延迟）"""
-        current_time = time.time() * 1000  # 毫秒
-        if current_time - self.last_refresh_time > self.refresh_delay:
-            self.last_refresh_time = current_time
-            self.log(f"检测到文件变化：{path}，自动刷新")
-            # 保留搜索与展开状态
-            self.refresh_tree_preserve_state()
-            # 取消搜索模式下的自动展开，避免干扰用户视图
-            self.update_watcher()
+        """文件变化时自动刷新所在目录（增加延迟）"""
+        self.on_dir_changed(os.path.dirname(path))
+
+    def apply_pending_changes(self):
+        """增量刷新：只重新列举发生变化的目录，增删对应的节点"""
+        changed = self.pending_changed_dirs
+        self.pending_changed_dirs = set()
+        if not changed:
+            return
+        self.last_refresh_time = time.time() * 1000
+        if len(changed) == 1:
+            self.log(f"检测到目录变化：{next(iter(changed))}，自动刷新")
+        else:
+            self.log(f"检测到 {len(changed)} 个目录变化，自动刷新")
+        for path in changed:
+            self.name_index.refresh_dir(path)
+
+        if self.search_query:
+            # 搜索模式：从文件名索引重新搜索（不重新扫描磁盘），保留展开状态
+            self.apply_search_filter_preserve_state()
+            return
+        # 父目录先处理，其下已删除的子目录节点随之移除
+        for path in sorted(changed):
+            self.refresh_dir_items(path)
+        self.update_watcher()
+
+    def refresh_dir_items(self, path):
+        """同步单个目录在目录树中的节点"""
+        # 顶层项：已删除的移除，重新出现的（例如改名后又改回）恢复
+        for i in range(self.target_tree.topLevelItemCount() - 1, -1, -1):
+            item = self.target_tree.topLevelItem(i)
+            p = item.data(0, Qt.UserRole)
+            if p and os.path.normpath(os.path.dirname(p)) == path and not os.path.exists(p):
+                self.target_tree.forget_loaded(item)
+                self.target_tree.takeTopLevelItem(i)
+        for root in self.original_tree_items:
+            if os.path.normpath(os.path.dirname(root)) == path and os.path.exists(root) \
+                    and root not in self.removed_items and not self.target_tree.find_items(root):
+                self.load_tree_lazy(root)
+
+        for item in self.target_tree.find_items(path):
+            p = item.data(0, Qt.UserRole)
+            if not os.path.isdir(p):
+                # 目录本身已被删除：移除节点
+                self.target_tree.forget_loaded(item)
+                parent = item.parent()
+                if parent is not None:
+                    parent.removeChild(item)
+                else:
+                    self.target_tree.takeTopLevelItem(self.target_tree.indexOfTopLevelItem(item))
+            elif p in self.target_tree.loaded_dirs:
+                self.target_tree.sync_children(item, p)
 
     def update_watcher(self):
         """更新监控列表（顶层目录、已展开/已加载目录、搜索结果顶层文件的父目录，及搜索模式祖先目录）"""
         try:
-            # 清空现有监控
-            try:
-                self.file_watcher.removePaths(self.file_watcher.directories())
-            except Exception:
-                pass
-            try:
-                self.file_watcher.removePaths(self.file_watcher.files())
-            except Exception:
-                pass
-
             monitored_dirs = set()
 
             # 顶层节点（无论是否为搜索结果视图）
@@ -1454,8 +2007,15 @@ class FileReplacerApp(QMainWindow):
                         cur = new_cur
                 monitored_dirs.update(extra_ancestors)
 
-            # 添加目录到监控（不监控文件，降低抖动）
-            for d in monitored_dirs:
+            # 只增删有变化的监控目录（不监控文件，降低抖动）
+            watched_files = self.file_watcher.files()
+            if watched_files:
+                self.file_watcher.removePaths(watched_files)
+            stale = [d for d in self.file_watcher.directories() if d not in monitored_dirs]
+            if stale:
+                self.file_watcher.removePaths(stale)
+            watched = set(self.file_watcher.directories())
+            for d in monitored_dirs - watched:
                 try:
                     self.file_watcher.addPath(d)
                 except Exception as e:
@@ -1471,27 +2031,13 @@ class FileReplacerApp(QMainWindow):
             return
             
         try:
-            # 检查是否已存在相同路径的项（修复问题1：防止重复）
-            exists = False
-            def check_existing(item):
-                nonlocal exists
-                if item.data(0, Qt.UserRole) == path:
-                    exists = True
-                    return
-                for i in range(item.childCount()):
-                    check_existing(item.child(i))
-                    if exists:
-                        return
-            
+            # 检查是否已存在相同路径的项（修复问题1：防止重复），按路径索引查找
+            existing = self.target_tree.items_for_path(path)
             if parent_item is None:
-                for i in range(self.target_tree.topLevelItemCount()):
-                    check_existing(self.target_tree.topLevelItem(i))
-                    if exists:
-                        return
-            else:
-                check_existing(parent_item)
-                if exists:
+                if existing:
                     return
+            elif any(DraggableTreeWidget._is_within(item, {id(parent_item)}) for item in existing):
+                return
             
             item = QTreeWidgetItem([os.path.basename(path)])
             item.setData(0, Qt.UserRole, path)
@@ -1503,10 +2049,7 @@ class FileReplacerApp(QMainWindow):
                 item.setIcon(0, icon)
             else:
                 # 使用Windows资源管理器图标
-                file_info = QFileInfo(path)
-                icon_provider = QFileIconProvider()
-                icon = icon_provider.icon(file_info)
-                item.setIcon(0, icon)
+                item.setIcon(0, shared_icon_cache().icon(path))
             
             # 如果是目录，设置为可展开（但不立即加载子项）
             if os.path.isdir(path):
@@ -1521,7 +2064,7 @@ class FileReplacerApp(QMainWindow):
             
             # 记录顶层项路径而非对象
             if parent_item is None and path not in self.original_tree_items:
-                self.original_tree_items.append(path)
+                self.original_tree_items.add(path)
                 
             # 如果是搜索结果中的目录且之前已展开，则立即加载子项
             if parent_item is not None and os.path.isdir(path) and path in self.target_tree.expanded_paths:
@@ -1540,8 +2083,6 @@ class FileReplacerApp(QMainWindow):
         # 保存当前状态用于撤销
         current_state = {
             'type': 'clear_tree',
-            'original_items': self.original_tree_items.copy(),
-            'removed_items': self.removed_items.copy(),
             'search_state': {
                 'query': self.search_query,
                 'type': self.search_type
@@ -1549,20 +2090,25 @@ class FileReplacerApp(QMainWindow):
         }
         self.operation_history.append(current_state)
         
+        self.stop_search()
+        self.name_index.clear()
         self.target_tree.clear()
         # 清空已加载目录记录
         self.target_tree.loaded_dirs.clear()
-        # 将所有原始项添加到已移除列表
-        self.removed_items.extend(self.original_tree_items)
-        self.original_tree_items.clear()
+        # 将所有原始项添加到已移除列表（撤销历史只记录差异）
+        current_state['removed_added'] = self.removed_items.update(self.original_tree_items)
+        current_state['original_popped'] = self.original_tree_items.pop_indexed(self.original_tree_items)
         self.target_tree.expanded_paths.clear()
         self.file_watcher.removePaths(self.file_watcher.directories())
         self.file_watcher.removePaths(self.file_watcher.files())
         self.log("已清空目标目录树")
 
     def on_search_clicked(self):
-        """修复搜索功能，搜文件/文件夹模式只显示包含关键词的目标和其子级，不显示父节点，实现懒加载"""
+        """搜文件/文件夹模式只显示包含关键词的目标和其子级，不显示父节点，实现懒加载；
+        搜索在后台线程进行，匹配项分批加入目录树，新的搜索会取消旧的搜索"""
         try:
+            self._search_timer.stop()
+            self.stop_search()
             search_text = self.tree_search.text().strip().lower()
             search_type = self.search_type_combo.currentText()
             
@@ -1580,99 +2126,83 @@ class FileReplacerApp(QMainWindow):
                     if path not in self.removed_items:
                         self.load_tree_lazy(path)
                 return
-            
-            # 定义文件排序函数
-            def get_file_sort_key(filename):
-                name, ext = os.path.splitext(filename)
-                return (ext.lower(), name.lower())
-            
-            # 按类型过滤搜索
-            def match_item(path):
-                """判断路径是否符合搜索条件"""
-                name = os.path.basename(path).lower()
-                if search_text not in name:
-                    return False
-                # 按类型过滤
-                if search_type == "搜文件夹":
-                    return os.path.isdir(path)
-                elif search_type == "搜文件":
-                    return os.path.isfile(path)
-                return False  # 其他情况不匹配
-            
-            # 收集所有匹配的目标路径
-            matched_targets = []
-            
-            # 递归搜索所有匹配的目标
-            def search_targets(path):
-                if path in self.removed_items or not os.path.exists(path):
-                    return
-                    
-                if os.path.isfile(path):
-                    if search_type == "搜文件" and match_item(path):
-                        matched_targets.append(path)
-                elif os.path.isdir(path):
-                    # 如果是文件夹且匹配搜索条件
-                    if search_type == "搜文件夹" and match_item(path):
-                        matched_targets.append(path)
-                    
-                    # 递归搜索子项（无论是否匹配，都继续搜索子级）
-                    try:
-                        for f in os.listdir(path):
-                            child_path = os.path.join(path, f)
-                            search_targets(child_path)
-                    except Exception as e:
-                        self.log(f"访问目录失败: {path}, 错误: {str(e)}")
-            
-            # 开始搜索所有顶层目录
-            for path in self.original_tree_items:
-                if path not in self.removed_items and os.path.exists(path):
-                    search_targets(path)
-            
-            # 处理搜索结果
-            if not matched_targets:
-                self.log(f"未找到包含 '{search_text}' 的{search_type}")
-                # 末尾：更新监控，让搜索结果中的顶层节点（目录/文件父目录）进入监控集合
-                self.update_watcher()
-                return
-            
-            # 为每个匹配项创建节点（不显示父节点）
-            for path in matched_targets:
-                # 额外过滤：跳过已被移除的路径，避免在外部重命名后又被加入
-                if path in self.removed_items:
-                    continue
-                # 搜索模式屏蔽：若其父目录在屏蔽集合中，则跳过
-                parent_dir = os.path.dirname(path)
-                if parent_dir in self.search_block_parents:
-                    continue
-                # 创建当前匹配项作为顶层节点
-                item = QTreeWidgetItem([os.path.basename(path)])
-                item.setData(0, Qt.UserRole, path)
-                
-                # 设置图标和子项指示器（使用系统真实图标，与非搜索状态一致）
-                file_info = QFileInfo(path)
-                icon_provider = QFileIconProvider()
-                icon = icon_provider.icon(file_info)
-                item.setIcon(0, icon)
-                if os.path.isdir(path):
-                    item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)  # 显示展开指示器
-                else:
-                    item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicator)  # 不显示展开指示器
-                
-                self.target_tree.addTopLevelItem(item)
-                
-                # 如果是已展开的目录，加载其所有子级
-                if os.path.isdir(path) and path in self.target_tree.expanded_paths:
-                    self.target_tree.load_children(item, path)
-                    self.target_tree.loaded_dirs.add(path)
-            
-            # 显示结果统计
-            self.log(f"找到 {len(matched_targets)} 个包含 '{search_text}' 的{search_type}")
-            # 末尾：更新监控，让搜索结果中的顶层节点（目录/文件父目录）进入监控集合
-            self.update_watcher()
+
+            worker = TreeSearchWorker(self.name_index, self.original_tree_items, search_text, search_type == "搜文件夹",
+                                      excluded=self.removed_items.copy(), blocked_parents=self.search_block_parents)
+            worker.batch_signal.connect(self._on_search_batch)
+            worker.log_signal.connect(self.log)
+            worker.finished_signal.connect(self._on_search_finished)
+            self.search_worker = worker
+            worker.start()
         except Exception as e:
             self.log(f"搜索失败: {str(e)}", QColor(Qt.red))
             QMessageBox.warning(self, "搜索错误", f"搜索过程中发生错误: {str(e)}")
 
+    def schedule_search(self, *args):
+        """输入关键词或切换搜索类型后延迟执行搜索，连续输入只搜索最后一次"""
+        self._search_timer.start()
+
+    def _on_search_timer(self):
+        # 关键词与类型都未变化时不重复搜索（例如刷新/重置时清空输入框）
+        search_text = self.tree_search.text().strip().lower()
+        if search_text == self.search_query and (not search_text or self.search_type == self.search_type_combo.currentText()):
+            return
+        self.on_search_clicked()
+
+    def _on_search_batch(self, batch):
+        """把一批匹配项作为顶层节点加入目录树（不显示父节点）"""
+        if self.sender() is not self.search_worker or self.search_worker is None:
+            return  # 已取消的搜索
+        items = []
+        for path, is_dir in batch:
+            # 额外过滤：跳过搜索开始后才被移除的路径
+            if path in self.removed_items:
+                continue
+            item = QTreeWidgetItem([os.path.basename(path)])
+            item.setData(0, Qt.UserRole, path)
+            
+            # 设置图标和子项指示器（使用系统真实图标，与非搜索状态一致）
+            item.setIcon(0, shared_icon_cache().icon(path, is_dir=is_dir))
+            if is_dir:
+                item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)  # 显示展开指示器
+            else:
+                item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicator)  # 不显示展开指示器
+            items.append(item)
+        self.target_tree.addTopLevelItems(items)
+        # 之前已展开的目录：展开时懒加载其子级
+        self.target_tree.restore_expanded_state(items)
+
+    def _on_search_finished(self, count, cancelled):
+        worker = self.sender()
+        if worker is not self.search_worker or worker is None:
+            return
+        self.search_worker = None
+        worker.wait()
+        # 显示结果统计
+        if count:
+            self.log(f"找到 {count} 个包含 '{self.search_query}' 的{self.search_type}")
+        else:
+            self.log(f"未找到包含 '{self.search_query}' 的{self.search_type}")
+        # 末尾：更新监控，让搜索结果中的顶层节点（目录/文件父目录）进入监控集合
+        self.update_watcher()
+
+    def stop_search(self):
+        """取消正在进行的搜索（新搜索、重置、刷新、关闭窗口时调用）"""
+        worker = self.search_worker
+        if worker is None:
+            return
+        self.search_worker = None  # 之后到达的批次和结束信号都会被忽略
+        worker.stop()
+        if not worker.wait(1000):
+            # 卡在慢速目录上时不阻塞界面，等线程退出后再释放
+            self._stopped_searches.add(worker)
+            worker.finished.connect(lambda: self._release_search(worker))
+
+    def _release_search(self, worker):
+        """已停止的搜索线程退出后释放引用"""
+        worker.wait()
+        self._stopped_searches.discard(worker)
+
     def apply_search_filter(self):
         """应用搜索过滤，用于刷新后恢复搜索状态"""
         if not self.search_query:
@@ -1703,22 +2233,46 @@ class FileReplacerApp(QMainWindow):
     # ------------------ 选择相关功能 ------------------
     def get_selected_files(self):
         """获取所有选中的文件（替换原来的勾选功能）"""
-        files = []
-        selected_items = self.target_tree.selectedItems()
-        for item in selected_items:
-            path = item.data(0, Qt.UserRole)
+        return list(self.iter_selected_files())
+
+    def iter_selected_files(self, prune=()):
+        """逐个产出选中的文件（目录递归展开，不整体保存）；prune 中的目录遍历时直接跳过
+
+        选中项与已移除项在调用时取快照，返回的迭代器可交给后台线程消费。
+        """
+        selected = PathSet(item.data(0, Qt.UserRole) for item in self.target_tree.selectedItems())
+        return self._iter_target_files(selected, self.removed_items.copy(), prune)
+
+    def _iter_target_files(self, selected, removed, prune):
+        for path in selected:
+            # 上级目录也被选中时会随其一起展开，避免重复
+            parent = os.path.dirname(path)
+            if parent != path and selected.covers(parent):
+                continue
             if os.path.isfile(path):
-                files.append(path)
+                yield path
             elif os.path.isdir(path):
-                # 如果是目录，递归添加所有文件
-                for root, _, dir_files in os.walk(path):
-                    for f in dir_files:
-                        file_path = os.path.join(root, f)
-                        # 跳过已手动移除的项
-                        if file_path not in self.removed_items:
-                            files.append(file_path)
-        # 去重处理，解决匹配文件数量异常问题
-        return list(set(files))
+                # 如果是目录，递归添加所有文件（优先查索引）
+                for file_path in self._iter_dir_files(path, prune):
+                    # 跳过已手动移除的项（包括已移除目录下的文件）
+                    if not removed.covers(file_path):
+                        yield file_path
+
+    def _iter_dir_files(self, path, prune=()):
+        """逐个产出目录下的全部文件：有索引时只重新列举变化过的目录，否则直接遍历"""
+        done_dirs = set()
+        if self.target_index is not None:
+            try:
+                for file_path in self.target_index.list_files(path, prune):
+                    done_dirs.add(os.path.dirname(file_path))
+                    yield file_path
+                return
+            except sqlite3.Error as e:
+                print(f"目标目录索引读取失败，改为完整扫描: {e}")
+        # 索引中途出错时，已完整产出过的目录不再重复
+        for file_path in iter_files([path], prune=prune):
+            if os.path.dirname(file_path) not in done_dirs:
+                yield file_path
 
     def select_all_tree(self):
         """全选（选中所有项）"""
@@ -1828,33 +2382,20 @@ class FileReplacerApp(QMainWindow):
                     'query': self.search_query,
                     'type': self.search_type
                 },
-                'expanded_paths': self.target_tree.expanded_paths.copy(),
-                'original_items': self.original_tree_items.copy(),
-                'removed_items': self.removed_items.copy()
+                'expanded_paths': self.target_tree.expanded_paths.copy()
             }
             self.operation_history.append(current_state)
             
-            # 递归检查父项是否在选中列表中
-            def has_selected_parent(path):
-                parent_path = os.path.dirname(path)
-                if parent_path == path:  # 到达根目录
-                    return False
-                return parent_path in selected_paths or has_selected_parent(parent_path)
-            
             # 过滤掉那些有父项已被选中的项（避免重复删除）
-            filtered_paths = []
-            for path in selected_paths:
-                if not has_selected_parent(path):
-                    filtered_paths.append(path)
+            selected_set = PathSet(selected_paths)
+            filtered_paths = [path for path in selected_paths
+                              if not selected_set.covers(os.path.dirname(path)) or os.path.dirname(path) == path]
             
-            # 从原始项列表中移除顶级项
-            for path in filtered_paths[:]:
-                if path in self.original_tree_items:
-                    self.original_tree_items.remove(path)
-                    filtered_paths.remove(path)
+            # 从原始项列表中移除顶级项（撤销历史只记录差异）
+            current_state['original_popped'] = self.original_tree_items.pop_indexed(filtered_paths)
             
             # 添加到已移除列表
-            self.removed_items.extend(selected_paths)
+            current_state['removed_added'] = self.removed_items.update(selected_paths)
 
             # 搜索模式下：屏蔽这些选中项的父目录，防止改名后重新回到结果
             if self.search_query:
@@ -1872,9 +2413,9 @@ class FileReplacerApp(QMainWindow):
                     self.target_tree.save_expanded_state()
                     
                     # 递归移除选中项
-                    def remove_item_recursive(item):
-                        path = item.data(0, Qt.UserRole)
-                        if path in selected_paths:
+                    # 按路径索引直接找到选中项对应的节点并移除（子孙节点随之移除）
+                    for path in selected_paths:
+                        for item in self.target_tree.items_for_path(path):
                             parent = item.parent()
                             if parent:
                                 parent.removeChild(item)
@@ -1882,13 +2423,6 @@ class FileReplacerApp(QMainWindow):
                                 index = self.target_tree.indexOfTopLevelItem(item)
                                 if index >= 0:
                                     self.target_tree.takeTopLevelItem(index)
-                        else:
-                            for i in range(item.childCount() - 1, -1, -1):
-                                remove_item_recursive(item.child(i))
-                    
-                    # 从顶层项开始移除
-                    for i in range(self.target_tree.topLevelItemCount() - 1, -1, -1):
-                        remove_item_recursive(self.target_tree.topLevelItem(i))
                     
                     # 恢复展开状态
                     self.target_tree.restore_expanded_state()
@@ -1916,8 +2450,7 @@ class FileReplacerApp(QMainWindow):
         
         if last_op['type'] == 'clear_tree':
             # 恢复清空的树
-            self.original_tree_items = last_op['original_items']
-            self.removed_items = last_op['removed_items']
+            self.restore_path_sets(last_op)
             # 恢复搜索状态
             self.search_query = last_op['search_state']['query']
             self.search_type = last_op['search_state']['type']
@@ -1926,8 +2459,7 @@ class FileReplacerApp(QMainWindow):
             self.log("已撤销清空目录操作")
         elif last_op['type'] == 'clear_selected':
             # 恢复列表与搜索状态
-            self.original_tree_items = last_op['original_items']
-            self.removed_items = last_op['removed_items']
+            self.restore_path_sets(last_op)
             self.search_query = last_op['search_state']['query']
             self.search_type = last_op['search_state']['type']
             
@@ -1944,13 +2476,11 @@ class FileReplacerApp(QMainWindow):
             try:
                 if os.path.exists(new_path) and not os.path.exists(old_path):
                     os.rename(new_path, old_path)
+                    self.name_index.refresh_dir(os.path.dirname(old_path))
             except Exception as e:
                 self.log(f"撤销重命名失败（文件系统）：{str(e)}", QColor(Qt.red))
-            # 恢复列表与状态
-            self.original_tree_items = last_op.get('original_tree_items', self.original_tree_items)
-            self.removed_items = last_op.get('removed_items', self.removed_items)
-            self.target_tree.expanded_paths = last_op.get('expanded_paths', self.target_tree.expanded_paths)
-            self.target_tree.loaded_dirs = last_op.get('loaded_dirs', self.target_tree.loaded_dirs)
+            # 恢复列表与状态（把重命名后的路径改写回原路径）
+            self.remap_tree_paths(new_path, old_path)
             self.search_query = last_op.get('search_state', {}).get('query', self.search_query)
             self.search_type = last_op.get('search_state', {}).get('type', self.search_type)
             # 刷新并恢复展开状态
@@ -1958,6 +2488,28 @@ class FileReplacerApp(QMainWindow):
             self.target_tree.restore_expanded_state()
             self.log(f"已撤销重命名: {new_path} -> {old_path}")
 
+    def restore_path_sets(self, op):
+        """按撤销历史中记录的差异恢复原始项/已移除项"""
+        self.removed_items.difference_update(op.get('removed_added', []))
+        self.original_tree_items.insert_indexed(op.get('original_popped', []))
+
+    def remap_tree_paths(self, old_path, new_path):
+        """重命名后把原始项、已移除项、展开/已加载集合中 old_path 及其下的路径改写到 new_path 之下"""
+        self.original_tree_items.remap_prefix(old_path, new_path)
+        self.removed_items.remap_prefix(old_path, new_path)
+
+        def remap_set(s):
+            updated = set()
+            for p in s:
+                if p and isinstance(p, str) and (p == old_path or p.startswith(old_path.rstrip("\\/") + os.sep)):
+                    updated.add(new_path + p[len(old_path):])
+                else:
+                    updated.add(p)
+            return updated
+
+        self.target_tree.expanded_paths = remap_set(self.target_tree.expanded_paths)
+        self.target_tree.loaded_dirs = remap_set(self.target_tree.loaded_dirs)
+
     # ------------------ 新增功能实现 ------------------
     def copy_selected_path(self):
         """复制选中项的绝对路径到剪贴板"""
@@ -2047,17 +2599,14 @@ class FileReplacerApp(QMainWindow):
             return
 
         try:
-            # 记录重命名前的状态用于撤销
-            expanded_paths_snapshot = self.target_tree.expanded_paths.copy()
-            loaded_dirs_snapshot = self.target_tree.loaded_dirs.copy()
-            original_tree_items_snapshot = self.original_tree_items.copy()
-            removed_items_snapshot = self.removed_items.copy()
+            # 记录重命名前的搜索状态用于撤销（路径集合撤销时按新旧路径反向改写）
             search_state_snapshot = {
                 'query': self.search_query,
                 'type': self.search_type
             }
 
             os.rename(old_path, new_path)
+            self.name_index.refresh_dir(os.path.dirname(new_path))
 
             # 更新当前节点显示与路径
             item.setText(0, new_name)
@@ -2076,34 +2625,8 @@ class FileReplacerApp(QMainWindow):
                         remap_children(child)
                 remap_children(item)
 
-                # 同步展开和已加载集合
-                def remap_set(s):
-                    updated = set()
-                    for p in s:
-                        if p and isinstance(p, str) and p.startswith(old_path):
-                            updated.add(new_path + p[len(old_path):])
-                        else:
-                            updated.add(p)
-                    return updated
-
-                self.target_tree.expanded_paths = remap_set(self.target_tree.expanded_paths)
-                self.target_tree.loaded_dirs = remap_set(self.target_tree.loaded_dirs)
-
-                # 同步原始与移除列表
-                self.original_tree_items = [
-                    (new_path + p[len(old_path):]) if p and p.startswith(old_path) else p
-                    for p in self.original_tree_items
-                ]
-                self.removed_items = [
-                    (new_path + p[len(old_path):]) if p and p.startswith(old_path) else p
-                    for p in self.removed_items
-                ]
-            else:
-                # 文件重命名时更新列表
-                if old_path in self.original_tree_items:
-                    idx = self.original_tree_items.index(old_path)
-                    self.original_tree_items[idx] = new_path
-                self.removed_items = [new_path if p == old_path else p for p in self.removed_items]
+            # 同步原始与移除列表、展开和已加载集合
+            self.remap_tree_paths(old_path, new_path)
 
             # 更新监控并记录日志
             self.update_watcher()
@@ -2114,10 +2637,6 @@ class FileReplacerApp(QMainWindow):
                 'type': 'rename',
                 'old_path': old_path,
                 'new_path': new_path,
-                'expanded_paths': expanded_paths_snapshot,
-                'loaded_dirs': loaded_dirs_snapshot,
-                'original_tree_items': original_tree_items_snapshot,
-                'removed_items': removed_items_snapshot,
                 'search_state': search_state_snapshot
             })
         except Exception as e:
@@ -2158,12 +2677,10 @@ class FileReplacerApp(QMainWindow):
                         self.log(f"已删除文件夹: {path}")
                     
                     # 从原始项列表中移除
-                    if path in self.original_tree_items:
-                        self.original_tree_items.remove(path)
+                    self.original_tree_items.discard(path)
                     
                     # 从已移除项列表中移除
-                    if path in self.removed_items:
-                        self.removed_items.remove(path)
+                    self.removed_items.discard(path)
                 except Exception as e:
                     failed_count += 1
                     failed_paths.append(f"{path} ({str(e)})")
@@ -2370,6 +2887,7 @@ class FileReplacerApp(QMainWindow):
         self.backup_edit.setEnabled(is_enabled)
         self.btn_backup_select.setEnabled(is_enabled)
         self.btn_backup_clear.setEnabled(is_enabled)
+        self.archive_backup_cb.setEnabled(is_enabled)
         # 下拉框总是可用，用于从已有备份选择
         self.backup_existing_combo.setEnabled(True)
         # 允许：输入框是有效文件 或 有效备份路径（目录/文件），不再强制要求左侧选中
@@ -2394,6 +2912,13 @@ class FileReplacerApp(QMainWindow):
         except Exception:
             pass
 
+    def forget_backup(self, path):
+        """备份被删除后从全局备份索引中移除"""
+        try:
+            self.backup_catalog.forget(path)
+        except sqlite3.Error as e:
+            self.log(f"更新备份索引失败：{str(e)}", QColor(Qt.red))
+
     def on_existing_backup_selected(self, index):
         """选择已有备份后，将路径填入备份输入框用于还原"""
         try:
@@ -2427,64 +2952,27 @@ class FileReplacerApp(QMainWindow):
         except Exception as e:
             self.log(f"点击已有备份时出错: {str(e)}")
 
-    def scan_matches(self):
+    def scan_matches(self, on_skip=None, is_running=None):
+        """逐个产出匹配的目标文件（备份目录在遍历时直接跳过）；is_running 返回 False 时停止遍历"""
         src = self.source_edit.text()
         if not src or not os.path.exists(src):
             raise ValueError("源文件不存在或未选择")
         
-        mode = self.match_combo.currentText()
-        pattern = self.match_edit.text().strip()
-        skip_keywords = [k.strip() for k in re.split(r'[，,]', self.skip_edit.text()) if k.strip()]
-        targets = self.get_selected_files()  # 使用选择的文件而非勾选的文件
-        
-        if not targets:
+        if not self.target_tree.selectedItems():  # 使用选择的文件而非勾选的文件
             raise ValueError("未选择任何目标文件")
         
-        matches = []
-        for full in targets:
-            # 跳过备份目录及其子项（避免将备份文件作为目标）
-            try:
-                if self.backup_dir:
-                    bdir = os.path.abspath(self.backup_dir)
-                    fpath = os.path.abspath(full)
-                    if fpath == bdir or fpath.startswith(bdir + os.sep):
-                        continue
-                
-            except Exception:
-                pass
-            if os.path.samefile(src, full):
-                continue
-            if any(kw in os.path.basename(full) for kw in skip_keywords):
-                self.log(f"已跳过: {full} (匹配到跳过关键词)")
-                continue
-            filename = os.path.basename(full)
-            matched = False
-            
-            if mode == "后缀匹配":
-                if not pattern:
-                    raise ValueError("后缀匹配模式请输入后缀（如 .10 或 10）")
-                _, ext = os.path.splitext(filename)
-                if ext.lower().lstrip(".") == pattern.lower().lstrip("."):
-                    matched = True
-            elif mode == "关键词匹配":
-                if not pattern:
-                    raise ValueError("关键词匹配模式请输入关键词")
-                keys = [k.strip() for k in re.split(r'[，,]', pattern) if k.strip()]
-                if keys and any(k in filename for k in keys):
-                    matched = True
-            elif mode == "正则表达式":
-                if not pattern:
-                    raise ValueError("正则表达式模式请输入正则")
-                try:
-                    if re.search(pattern, filename):
-                        matched = True
-                except re.error:
-                    raise ValueError(f"无效正则表达式: {pattern}")
-            
-            if matched:
-                matches.append(full)
-        
-        return matches
+        prune = [self.backup_dir] if self.backup_dir else []
+        targets = self.iter_selected_files(prune)
+        if is_running is not None:
+            targets = itertools.takewhile(lambda _: is_running(), targets)
+        return iter_matches(
+            src, targets,
+            mode=self.match_combo.currentText(),
+            pattern=self.match_edit.text(),
+            skip_keywords=split_keywords(self.skip_edit.text()),
+            backup_dir=self.backup_dir,
+            on_skip=on_skip or (lambda full: self.log(f"已跳过: {full} (匹配到跳过关键词)")),
+        )
 
     def on_clear_backup(self):
         backup_dir = self.backup_edit.text().strip()
@@ -2501,7 +2989,11 @@ class FileReplacerApp(QMainWindow):
             return
         
         try:
-            shutil.rmtree(backup_dir)
+            if os.path.isfile(backup_dir):
+                os.remove(backup_dir)  # 压缩包备份
+            else:
+                shutil.rmtree(backup_dir)
+            self.forget_backup(backup_dir)
             self.log(f"成功删除备份目录：{backup_dir}")
             self.backup_edit.clear()
             self.backup_dir = None
@@ -2524,97 +3016,133 @@ class FileReplacerApp(QMainWindow):
             self.log(f"错误：{msg}")
 
     def on_preview(self):
+        """在后台线程中预览匹配文件；预览进行中再次点击则取消"""
+        if self.preview_worker is not None:
+            self.stop_preview()
+            self.log("已取消预览")
+            return
         try:
             if not self.validate_inputs():
                 return
-            matches = self.scan_matches()
-            self.result_list.clear()
-            # 使用HTML将数字显示为红色
-            self.preview_header.setText(f"已找到 <span style='color: red'>{len(matches)}</span> 个匹配文件 (预览模式)")
-            for full in matches:
-                self.result_list.append_text(f"{os.path.basename(full)} {{{full}}}")
-            self.log(f"预览完成，找到 {len(matches)} 个匹配文件")
+            worker = MatchScanWorker(self.scan_matches)
         except ValueError as ve:
             self.log(f"错误：{str(ve)}", QColor(Qt.red))
             QMessageBox.warning(self, "预览失败", str(ve))
+            return
+        self.result_list.clear()
+        self.preview_header.setText("正在查找匹配文件...")
+        worker.batch_signal.connect(self._on_preview_batch)
+        worker.log_signal.connect(self.log)
+        worker.finished_signal.connect(self._on_preview_finished)
+        self.preview_worker = worker
+        self.btn_preview.setText("取消预览")
+        self.btn_replace.setEnabled(False)
+        worker.start()
+
+    def _on_preview_batch(self, batch):
+        """整批追加匹配文件并刷新计数"""
+        worker = self.sender()
+        if worker is not self.preview_worker or worker is None:
+            return  # 已取消的预览
+        self.result_list.append_text("\n".join(f"{os.path.basename(full)} {{{full}}}" for full in batch))
+        # 使用HTML将数字显示为红色
+        self.preview_header.setText(f"正在查找... 已找到 <span style='color: red'>{worker.found_count}</span> 个匹配文件")
+
+    def _on_preview_finished(self, count, cancelled):
+        worker = self.sender()
+        if worker is not self.preview_worker or worker is None:
+            return
+        worker.wait()
+        self.preview_worker = None
+        self._reset_preview_button()
+        # 使用HTML将数字显示为红色
+        self.preview_header.setText(f"已找到 <span style='color: red'>{count}</span> 个匹配文件 (预览模式)")
+        self.log(f"预览完成，找到 {count} 个匹配文件")
+
+    def stop_preview(self):
+        """取消正在进行的预览（再次点击预览、开始替换、关闭窗口时调用）"""
+        worker = self.preview_worker
+        if worker is None:
+            return
+        self.preview_worker = None  # 之后到达的批次和结束信号都会被忽略
+        worker.stop()
+        if not worker.wait(1000):
+            # 卡在慢速目录上时不阻塞界面，等线程退出后再释放
+            self._stopped_previews.add(worker)
+            worker.finished.connect(lambda: self._release_preview(worker))
+        self._reset_preview_button()
+        self.preview_header.setText("预览已取消")
+
+    def _release_preview(self, worker):
+        """已停止的预览线程退出后释放引用"""
+        worker.wait()
+        self._stopped_previews.discard(worker)
+
+    def _reset_preview_button(self):
+        self.btn_preview.setText("预览匹配文件")
+        self.btn_replace.setEnabled(True)
 
     def on_replace(self):
+        self.stop_preview()
         try:
             if not self.validate_inputs():
                 return
-            matches = self.scan_matches()
-            if not matches:
-                QMessageBox.warning(self, "替换失败", "未找到匹配的目标文件")
-                return
 
             src_path = self.source_edit.text().strip()
             src_dir = os.path.dirname(src_path)
             backup_dir_user = self.backup_edit.text().strip()
-            self.backup_dir = None
-
+            backup_dir = None
+            archive_path = None
+            manifest_timestamp = None
             if self.backup_enable.isChecked():
-                # 未选择备份路径：在源文件同目录下创建带秒级时间戳的备份文件夹
-                local_time = time.localtime()
-                timestamp = f"{local_time.tm_year}-{local_time.tm_mon}-{local_time.tm_mday}-{local_time.tm_hour}-{local_time.tm_min}-{local_time.tm_sec}"
-                if not backup_dir_user:
-                    backup_dir_name = f"backup-{timestamp}"
-                    backup_dir_user = os.path.join(src_dir, backup_dir_name)
-                    os.makedirs(backup_dir_user, exist_ok=True)
-                    # 不自动填充输入框，遵循需求 2
-                    self.backup_dir = backup_dir_user
-                    self.log(f"自动创建备份目录：{backup_dir_user}", color=QColor(Qt.blue))
+                # 未选择备份路径：在源文件同目录下使用带秒级时间戳的备份文件夹
+                timestamp = backup_timestamp()
+                if self.archive_backup_cb.isChecked():
+                    # 压缩包备份：每次替换写一个新的 backup-时间戳.zip，放在指定目录（或已选压缩包旁）或源文件同目录下
+                    parent = backup_dir_user or src_dir
+                    if parent.lower().endswith(ARCHIVE_SUFFIX):
+                        parent = os.path.dirname(parent)
+                    archive_path = os.path.join(parent, f"backup-{timestamp}{ARCHIVE_SUFFIX}")
+                    backup_dir = archive_path
+                elif not backup_dir_user:
+                    # 不自动填充输入框，遵循需求 2；目录由替换线程在确有文件需要备份时创建
+                    backup_dir = os.path.join(src_dir, f"backup-{timestamp}")
                 else:
                     # 使用用户选择的备份路径（不创建子文件夹）
                     os.makedirs(backup_dir_user, exist_ok=True)
-                    self.backup_dir = backup_dir_user
-                    self.log(f"使用指定备份目录：{self.backup_dir}")
+                    backup_dir = backup_dir_user
+                # 备份记录（原始路径与备份相对路径）由替换线程在每个目标备份完成后逐条追加
+                manifest_timestamp = timestamp
 
-                # 生成或追加 manifest.json（记录多个原始路径与备份相对路径，去重）
-                manifest_path = os.path.join(self.backup_dir, "manifest.json")
-                manifest = None
-                try:
-                    if os.path.exists(manifest_path):
-                        with open(manifest_path, 'r', encoding='utf-8') as f:
-                            manifest = json.load(f)
-                    else:
-                        manifest = {"version": 2, "created_at": timestamp, "entries": []}
-                except Exception:
-                    # 如果旧文件损坏，则从头重建
-                    manifest = {"version": 2, "created_at": timestamp, "entries": []}
-
-                # 建立已有 original_path 集合以去重
-                existing = set()
-                try:
-                    for e in manifest.get("entries", []):
-                        op = e.get("original_path")
-                        if op:
-                            existing.add(op)
-                except Exception:
-                    pass
-
-                for full in matches:
-                    if full in existing:
-                        continue
-                    # 不创建父级子目录，统一使用文件名作为备份相对路径
-                    backup_rel_path = os.path.basename(full).replace('\\', '/')
-                    manifest.setdefault("entries", []).append({
-                        "backup_rel_path": backup_rel_path,
-                        "original_path": full
-                    })
-
-                try:
-                    with open(manifest_path, 'w', encoding='utf-8') as f:
-                        json.dump(manifest, f, ensure_ascii=False, indent=2)
-                    self.log(f"已记录/更新备份映射到: {manifest_path}")
-                except Exception as e:
-                    self.log(f"记录备份映射失败: {str(e)}", QColor(Qt.red))
+            # 匹配文件在替换线程中遍历（界面不等待扫描）；参数无效时在这里抛出 ValueError
+            thread = FileReplacerThread(
+                source_file=src_path,
+                targets=[],
+                scan=self.scan_matches,
+                backup_dir=None if archive_path else backup_dir,
+                archive_path=archive_path,
+                preview_only=False,
+                jobs=self.jobs_spin.value(),
+                skip_identical=self.skip_identical_cb.isChecked(),
+                hash_cache=self.target_index,
+                manifest_timestamp=manifest_timestamp,
+                catalog=self.backup_catalog,
+                backup_peers=[self.backup_existing_combo.itemText(i) for i in range(self.backup_existing_combo.count())]
+            )
 
-                # 将本次备份加入“已有的备份”下拉框
-                self.add_existing_backup(self.backup_dir)
-                
-                self.update_backup_controls()
+            self.backup_dir = backup_dir
+            if archive_path:
+                self.log(f"备份将写入压缩包：{archive_path}", color=QColor(Qt.blue))
+            elif backup_dir and not backup_dir_user:
+                self.log(f"自动备份目录：{backup_dir}", color=QColor(Qt.blue))
+            elif backup_dir:
+                self.log(f"使用指定备份目录：{backup_dir}")
             else:
                 self.log("未启用备份，跳过备份步骤")
+            if backup_dir:
+                # 将本次备份加入“已有的备份”下拉框
+                self.add_existing_backup(backup_dir)
+                self.update_backup_controls()
 
             self.progress_label_left.setText("替换进度：")
             self.result_list.clear()
@@ -2624,17 +3152,13 @@ class FileReplacerApp(QMainWindow):
             self.btn_preview.setEnabled(False)
             self.btn_replace.setEnabled(False)
 
-            self.thread = FileReplacerThread(
-                source_file=src_path,
-                targets=matches,
-                backup_dir=self.backup_dir,
-                preview_only=False
-            )
+            self.thread = thread
             self.thread.progress_signal.connect(self.on_progress)
             self.thread.finished_signal.connect(self.on_finished)
             self.thread.log_signal.connect(self.log)  # 连接带颜色的日志信号
+            self.thread.log_batch_signal.connect(self.log_rows)
             self.thread.start()
-            self.log(f"开始替换 {len(matches)} 个文件...", color=QColor(Qt.blue))
+            self.log("开始查找并替换匹配文件...", color=QColor(Qt.blue))
         except ValueError as ve:
             self.log(f"错误：{str(ve)}", QColor(Qt.red))
             QMessageBox.warning(self, "替换失败", str(ve))
@@ -2655,26 +3179,18 @@ class FileReplacerApp(QMainWindow):
             
             restore_map = {}
             files_to_restore = []
-            manifest_json = os.path.join(self.backup_dir, "manifest.json")
             manifest_txt = os.path.join(self.backup_dir, "manifest.txt")
             target_root = None
-            if os.path.exists(manifest_json):
+            if has_manifest(self.backup_dir):
                 try:
-                    with open(manifest_json, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    entries = data.get("entries", [])
-                    for entry in entries:
-                        rel = entry.get("backup_rel_path")
-                        orig = entry.get("original_path")
-                        if not rel or not orig:
-                            continue
-                        backup_file_path = os.path.join(self.backup_dir, rel.replace('/', os.sep))
-                        files_to_restore.append(backup_file_path)
-                        restore_map[backup_file_path] = orig
-                    self.log(f"已读取 manifest.json，共 {len(restore_map)} 条还原映射")
+                    self.backup_catalog.sync(self.backup_dir)
                 except Exception as e:
-                    QMessageBox.warning(self, "还原失败", f"解析 manifest.json 失败：{str(e)}")
+                    QMessageBox.warning(self, "还原失败", f"解析 manifest 失败：{str(e)}")
                     return
+                for orig, ref in self.backup_catalog.items(self.backup_dir):
+                    files_to_restore.append(orig)
+                    restore_map[orig] = ref
+                self.log(f"已读取 manifest，共 {len(restore_map)} 条还原映射")
             elif os.path.exists(manifest_txt):
                 # 兼容旧版本：使用目标根路径拼接相对路径
                 with open(manifest_txt, 'r', encoding='utf-8') as f:
@@ -2712,11 +3228,13 @@ class FileReplacerApp(QMainWindow):
                 preview_only=False,
                 restore=True,
                 target_root=target_root,
-                restore_map=restore_map if restore_map else None
+                restore_map=restore_map if restore_map else None,
+                jobs=self.jobs_spin.value()
             )
             self.thread.progress_signal.connect(self.on_progress)
             self.thread.finished_signal.connect(self.on_finished)
             self.thread.log_signal.connect(self.log)  # 连接带颜色的日志信号
+            self.thread.log_batch_signal.connect(self.log_rows)
             self.thread.start()
             self.log(f"开始还原 {len(files_to_restore)} 个备份文件...", color=QColor(Qt.blue))
         except Exception as e:
@@ -2740,15 +3258,12 @@ class FileReplacerApp(QMainWindow):
             files_to_restore = []
             base_dir = None
 
-            if os.path.isfile(selected_path):
+            if os.path.isfile(selected_path) and not is_backup_archive(selected_path):
                 # 文件模式：按文件相对路径查询映射
                 start_dir = os.path.dirname(selected_path)
-                manifest_json = None
                 for _ in range(4):
-                    candidate = os.path.join(start_dir, "manifest.json")
-                    if os.path.exists(candidate):
+                    if has_manifest(start_dir):
                         base_dir = start_dir
-                        manifest_json = candidate
                         break
                     parent = os.path.dirname(start_dir)
                     if parent == start_dir:
@@ -2756,23 +3271,19 @@ class FileReplacerApp(QMainWindow):
                     start_dir = parent
 
                 files_to_restore = [selected_path]
-                if manifest_json and os.path.exists(manifest_json):
+                if base_dir:
                     try:
-                        with open(manifest_json, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        rel = os.path.relpath(selected_path, base_dir).replace('\\', '/')
-                        found = None
-                        for e in data.get("entries", []):
-                            if e.get("backup_rel_path") == rel:
-                                found = e.get("original_path")
-                                break
-                        if not found:
-                            QMessageBox.warning(self, "还原失败", "manifest.json 中未找到对应映射")
-                            return
-                        restore_map[selected_path] = found
+                        self.backup_catalog.sync(base_dir)
                     except Exception as e:
-                        QMessageBox.warning(self, "还原失败", f"解析 manifest.json 失败：{str(e)}")
+                        QMessageBox.warning(self, "还原失败", f"解析 manifest 失败：{str(e)}")
+                        return
+                    # 内容相同的多个目标共用一份备份，全部还原
+                    rel = os.path.relpath(selected_path, base_dir).replace('\\', '/')
+                    files_to_restore = self.backup_catalog.originals_for(base_dir, rel)
+                    if not files_to_restore:
+                        QMessageBox.warning(self, "还原失败", "manifest 中未找到对应映射")
                         return
+                    restore_map = {orig: selected_path for orig in files_to_restore}
                 else:
                     # 兼容旧版：尝试使用 manifest.txt
                     manifest_txt = os.path.join(base_dir if base_dir else os.path.dirname(selected_path), "manifest.txt")
@@ -2781,7 +3292,9 @@ class FileReplacerApp(QMainWindow):
                             with open(manifest_txt, 'r', encoding='utf-8') as f:
                                 target_root = f.read().strip()
                             rel = os.path.relpath(selected_path, base_dir if base_dir else os.path.dirname(selected_path))
-                            restore_map[selected_path] = os.path.join(target_root, rel)
+                            orig = os.path.join(target_root, rel)
+                            files_to_restore = [orig]
+                            restore_map[orig] = selected_path
                         except Exception as e:
                             QMessageBox.warning(self, "还原失败", f"解析 manifest.txt 失败：{str(e)}")
                             return
@@ -2789,29 +3302,27 @@ class FileReplacerApp(QMainWindow):
                         QMessageBox.warning(self, "还原失败", "未找到 manifest 文件")
                         return
             else:
-                # 目录模式：优先还原左侧选中；若未选中则按备份目录全部还原
+                # 目录（或压缩包）模式：优先还原左侧选中；若未选中则按备份全部还原
                 base_dir = selected_path
-                manifest_json = os.path.join(base_dir, "manifest.json")
                 manifest_txt = os.path.join(base_dir, "manifest.txt")
-                selected_originals = set(self.get_selected_files())
+                selected_files = self.get_selected_files()
+                selected_originals = set(selected_files)
                 restore_all = len(selected_originals) == 0
-                if os.path.exists(manifest_json):
+                if has_manifest(base_dir):
                     try:
-                        with open(manifest_json, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        for e in data.get("entries", []):
-                            orig = e.get("original_path")
-                            rel = e.get("backup_rel_path")
-                            if not orig or not rel:
-                                continue
-                            if restore_all or orig in selected_originals:
-                                bf = os.path.join(base_dir, rel.replace('/', os.sep))
-                                if os.path.exists(bf):
-                                    files_to_restore.append(bf)
-                                    restore_map[bf] = orig
+                        self.backup_catalog.sync(base_dir)
                     except Exception as e:
-                        QMessageBox.warning(self, "还原失败", f"解析 manifest.json 失败：{str(e)}")
+                        QMessageBox.warning(self, "还原失败", f"解析 manifest 失败：{str(e)}")
                         return
+                    # 按选中的原始路径在备份索引中直接查找，不逐条比对
+                    if restore_all:
+                        pairs = self.backup_catalog.items(base_dir)
+                    else:
+                        pairs = self.backup_catalog.lookup(base_dir, selected_files).items()
+                    for orig, ref in pairs:
+                        if orig not in restore_map and backup_ref_exists(ref):
+                            files_to_restore.append(orig)
+                            restore_map[orig] = ref
                 elif os.path.exists(manifest_txt):
                     try:
                         with open(manifest_txt, 'r', encoding='utf-8') as f:
@@ -2854,11 +3365,13 @@ class FileReplacerApp(QMainWindow):
                 preview_only=False,
                 restore=True,
                 target_root=target_root,
-                restore_map=restore_map if restore_map else None
+                restore_map=restore_map if restore_map else None,
+                jobs=self.jobs_spin.value()
             )
             self.thread.progress_signal.connect(self.on_progress)
             self.thread.finished_signal.connect(self.on_finished)
             self.thread.log_signal.connect(self.log)
+            self.thread.log_batch_signal.connect(self.log_rows)
             self.thread.start()
             self.log(f"开始还原选中文件 {len(files_to_restore)} 个...", color=QColor(Qt.blue))
         except Exception as e:
@@ -2874,29 +3387,20 @@ class FileReplacerApp(QMainWindow):
 
             files_to_restore = []
             restore_map = {}
+            cataloged = []
             # 汇总所有已有备份目录中的文件
             for i in range(total):
                 bdir = self.backup_existing_combo.itemText(i)
-                if not bdir or not os.path.exists(bdir) or not os.path.isdir(bdir):
+                if not bdir or not (os.path.isdir(bdir) or is_backup_archive(bdir)):
                     continue
-                manifest_json = os.path.join(bdir, "manifest.json")
                 manifest_txt = os.path.join(bdir, "manifest.txt")
-                if os.path.exists(manifest_json):
+                if has_manifest(bdir):
+                    # 只检查 manifest 是否变化，未变化的备份不再读取
                     try:
-                        with open(manifest_json, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        for e in data.get("entries", []):
-                            rel = e.get("backup_rel_path")
-                            orig = e.get("original_path")
-                            if not rel or not orig:
-                                continue
-                            bf = os.path.join(bdir, rel.replace('/', os.sep))
-                            if os.path.exists(bf):
-                                files_to_restore.append(bf)
-                                restore_map[bf] = orig
+                        self.backup_catalog.sync(bdir)
+                        cataloged.append(bdir)
                     except Exception as e:
-                        self.log(f"解析 {manifest_json} 失败：{str(e)}", QColor(Qt.red))
-                        continue
+                        self.log(f"解析 {bdir} 的 manifest 失败：{str(e)}", QColor(Qt.red))
                 elif os.path.exists(manifest_txt):
                     try:
                         with open(manifest_txt, 'r', encoding='utf-8') as f:
@@ -2906,12 +3410,19 @@ class FileReplacerApp(QMainWindow):
                                 if f in ("manifest.txt", "manifest.json"):
                                     continue
                                 bf = os.path.join(root, f)
-                                rel = os.path.relpath(bf, bdir)
-                                files_to_restore.append(bf)
-                                restore_map[bf] = os.path.join(target_root, rel)
+                                orig = os.path.join(target_root, os.path.relpath(bf, bdir))
+                                if orig in restore_map:
+                                    continue
+                                files_to_restore.append(orig)
+                                restore_map[orig] = bf
                     except Exception as e:
                         self.log(f"解析 {manifest_txt} 失败：{str(e)}", QColor(Qt.red))
                         continue
+            # 同一文件出现在多个备份中时使用最早的备份（最接近最初的状态），一次查询得出
+            for orig, ref in self.backup_catalog.earliest(cataloged).items():
+                if orig not in restore_map and backup_ref_exists(ref):
+                    files_to_restore.append(orig)
+                    restore_map[orig] = ref
 
             if not files_to_restore:
                 QMessageBox.information(self, "还原", "无文件可还原")
@@ -2932,17 +3443,83 @@ class FileReplacerApp(QMainWindow):
                 preview_only=False,
                 restore=True,
                 target_root=None,
-                restore_map=restore_map
+                restore_map=restore_map,
+                jobs=self.jobs_spin.value()
             )
             self.thread.progress_signal.connect(self.on_progress)
             self.thread.finished_signal.connect(self.on_finished)
             self.thread.log_signal.connect(self.log)
+            self.thread.log_batch_signal.connect(self.log_rows)
             self.thread.start()
             self.log(f"开始还原所有文件，共 {len(files_to_restore)} 个...", color=QColor(Qt.blue))
         except Exception as e:
             self.log(f"错误：还原所有文件失败：{str(e)}", QColor(Qt.red))
             QMessageBox.warning(self, "还原失败", str(e))
 
+    def restore_selected_version(self):
+        """把选中的文件还原到备份列表中记录的某一个版本"""
+        try:
+            selected_items = self.target_tree.selectedItems()
+            if len(selected_items) != 1:
+                QMessageBox.warning(self, "还原", "请选择一个文件")
+                return
+            path = selected_items[0].data(0, Qt.UserRole)
+            if not path or os.path.isdir(path):
+                QMessageBox.warning(self, "还原", "请选择一个文件")
+                return
+            path = os.path.normpath(path)
+
+            # 只列出备份列表中的备份（与「还原所有」的范围一致）
+            listed = []
+            for i in range(self.backup_existing_combo.count()):
+                bdir = self.backup_existing_combo.itemText(i)
+                if not bdir or not has_manifest(bdir):
+                    continue
+                try:
+                    self.backup_catalog.sync(bdir)
+                    listed.append(bdir)
+                except Exception as e:
+                    self.log(f"解析 {bdir} 的 manifest 失败：{str(e)}", QColor(Qt.red))
+            versions = [v for v in self.backup_catalog.versions(path, listed) if backup_ref_exists(v.ref)]
+            if not versions:
+                QMessageBox.information(self, "还原", "备份列表中没有该文件的历史版本")
+                return
+
+            labels = [f"{v.backed_up_at or '未知时间'}    {v.backup}" for v in versions]
+            label, ok = QInputDialog.getItem(self, "还原到历史版本", f"{path}\n选择要还原的版本：",
+                                             labels, len(labels) - 1, False)
+            if not ok:
+                return
+            version = versions[labels.index(label)]
+
+            self.progress_label_left.setText("还原进度：")
+            self.progress_label_right.setText("处理中...")
+            self.result_list.clear()
+            self.preview_header.setText("")
+            self.progress_bar.setValue(0)
+            self.btn_preview.setEnabled(False)
+            self.btn_replace.setEnabled(False)
+
+            self.thread = FileReplacerThread(
+                source_file=None,
+                targets=[path],
+                backup_dir=None,
+                preview_only=False,
+                restore=True,
+                target_root=None,
+                restore_map={path: version.ref},
+                jobs=1
+            )
+            self.thread.progress_signal.connect(self.on_progress)
+            self.thread.finished_signal.connect(self.on_finished)
+            self.thread.log_signal.connect(self.log)
+            self.thread.log_batch_signal.connect(self.log_rows)
+            self.thread.start()
+            self.log(f"开始还原 {path} 到 {version.backed_up_at or '未知时间'} 的版本...", color=QColor(Qt.blue))
+        except Exception as e:
+            self.log(f"错误：还原历史版本失败：{str(e)}", QColor(Qt.red))
+            QMessageBox.warning(self, "还原失败", str(e))
+
     def on_clear_selected_backup(self):
         try:
             path = self.backup_edit.text().strip()
@@ -2962,6 +3539,7 @@ class FileReplacerApp(QMainWindow):
             if os.path.isfile(path):
                 try:
                     os.remove(path)
+                    self.forget_backup(path)
                     self.log(f"已删除备份文件：{path}")
                 except Exception as e:
                     QMessageBox.critical(self, "清除失败", f"删除文件失败：{str(e)}")
@@ -2969,6 +3547,7 @@ class FileReplacerApp(QMainWindow):
             else:
                 try:
                     shutil.rmtree(path)
+                    self.forget_backup(path)
                     self.log(f"已删除备份目录：{path}")
                     # 从下拉框移除该目录
                     try:
@@ -3013,6 +3592,7 @@ class FileReplacerApp(QMainWindow):
                 if os.path.isdir(p):
                     try:
                         shutil.rmtree(p)
+                        self.forget_backup(p)
                         removed += 1
                     except Exception as e:
                         errors += 1
@@ -3020,6 +3600,7 @@ class FileReplacerApp(QMainWindow):
                 else:
                     try:
                         os.remove(p)
+                        self.forget_backup(p)
                         removed += 1
                     except Exception as e:
                         errors += 1
@@ -3045,30 +3626,42 @@ class FileReplacerApp(QMainWindow):
         self.btn_replace.setEnabled(True)
         self.progress_bar.setValue(100)
         self.progress_label_right.setText("完成")
+        if not results and getattr(self.thread, 'matches', None) is not None:
+            self.preview_header.setText("未找到匹配的文件")
+            QMessageBox.warning(self, "替换失败", "未找到匹配的目标文件")
+            return
         
         success_count = 0
         error_count = 0
+        skipped_count = 0
         locked_files = []
+        # 结果行和日志行先收集起来，最后各整批追加一次
+        result_rows = []
+        log_rows = []
 
         for result in results:
             if isinstance(result, tuple):
                 result_type, content = result
                 if result_type in ["success", "restore"]:
-                    self.result_list.append_text(content)
+                    result_rows.append((content, None))
                     success_count += 1
+                elif result_type == "skip":
+                    skipped_count += 1
                 elif result_type == "error":
-                    self.log(f"错误：{content}", QColor(Qt.red))
+                    log_rows.append((f"错误：{content}", QColor(Qt.red)))
                     error_count += 1
                     if "被占用" in content:
                         locked_files.append(content.split("{")[1].rstrip("}"))
             else:
-                self.result_list.append_text(result)
+                result_rows.append((result, None))
                 if "错误" in result:
-                    self.log(result, QColor(Qt.red))
+                    log_rows.append((result, QColor(Qt.red)))
                     error_count += 1
                 else:
-                    self.log(result)
+                    log_rows.append((result, self.log_color(result)))
                     success_count += 1
+        self.result_list.append_rows(result_rows)
+        self.log_rows(log_rows)
         
         if locked_files:
             msg = f"以下文件被占用，未处理：\n" + "\n".join(locked_files)
@@ -3076,8 +3669,10 @@ class FileReplacerApp(QMainWindow):
         
         mode = "还原" if hasattr(self.thread, 'restore') and self.thread.restore else "替换"
         # 使用HTML将数字显示为红色
-        self.preview_header.setText(f"{mode} 完成：成功 <span style='color: red'>{success_count}</span> 个，失败 <span style='color: red'>{error_count}</span> 个")
-        self.log(f"{mode} 完成：成功 {success_count} 个，失败 {error_count} 个", QColor(Qt.blue))
+        skipped_html = f"，跳过 <span style='color: red'>{skipped_count}</span> 个（内容相同）" if skipped_count else ""
+        skipped_text = f"，跳过 {skipped_count} 个（内容相同）" if skipped_count else ""
+        self.preview_header.setText(f"{mode} 完成：成功 <span style='color: red'>{success_count}</span> 个{skipped_html}，失败 <span style='color: red'>{error_count}</span> 个")
+        self.log(f"{mode} 完成：成功 {success_count} 个{skipped_text}，失败 {error_count} 个", QColor(Qt.blue))
 
     def validate_inputs(self):
         src = self.source_edit.text().strip()
@@ -3112,7 +3707,8 @@ class FileReplacerApp(QMainWindow):
             QMessageBox.warning(self, "输入错误", "正则表达式模式请输入正则")
             return False
         
-        if not self.get_selected_files():  # 使用选择的文件而非勾选的文件
+        # 只检查是否有选中项，不遍历目录（选中的文件夹为空时预览/替换会报告未找到匹配文件）
+        if not self.target_tree.selectedItems():  # 使用选择的文件而非勾选的文件
             QMessageBox.warning(self, "输入错误", "请在目标目录树中选择文件/文件夹")
             return False
         
@@ -3165,6 +3761,9 @@ class FileReplacerApp(QMainWindow):
     def refresh_tree(self):
         """刷新树状图（保留展开状态，重置搜索）"""
         # 重置搜索状态
+        self.stop_search()
+        # 手动刷新：文件名索引下次搜索时重新建立（捕捉未被监控的目录中的变化）
+        self.name_index.clear()
         self.search_query = ""
         self.search_type = ""
         self.tree_search.clear()
@@ -3192,6 +3791,7 @@ class FileReplacerApp(QMainWindow):
     def reset_search(self):
         """清空搜索并刷新（与刷新分离，避免逻辑冲突）"""
         # 清空搜索状态与搜索屏蔽集合
+        self.stop_search()
         self.search_query = ""
         self.search_type = ""
         self.tree_search.clear()
@@ -3221,13 +3821,20 @@ class FileReplacerApp(QMainWindow):
         # 修复日志颜色问题：只有错误操作使用红色，其他操作使用默认颜色
         # 替换、还原、删除备份操作使用指定颜色，其他操作使用默认颜色
         if color is None:
-            # 检查是否为错误日志
-            if "错误" in s or "失败" in s or "被占用" in s:
-                color = QColor(Qt.red)
-            else:
-                # 非错误操作使用默认颜色（黑色）
-                color = QColor(Qt.black)
+            color = self.log_color(s)
         self.log_list.append_text(s, color)
+
+    @staticmethod
+    def log_color(s):
+        # 检查是否为错误日志
+        if "错误" in s or "失败" in s or "被占用" in s:
+            return QColor(Qt.red)
+        # 非错误操作使用默认颜色（黑色）
+        return QColor(Qt.black)
+
+    def log_rows(self, rows):
+        """整批追加后台线程汇总的日志 [(文本, 颜色), ...]"""
+        self.log_list.append_rows(rows)
     
     def test_log_colors(self):
         """测试日志颜色功能"""
@@ -3241,6 +3848,8 @@ class FileReplacerApp(QMainWindow):
         self.log("=== 日志颜色测试结束 ===")
 
     def closeEvent(self, event):
+        self.stop_search()
+        self.stop_preview()
         if self.thread and self.thread.isRunning():
             self.thread.stop()
             self.thread.wait(1000)
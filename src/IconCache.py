@@ -0,0 +1,82 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 文件图标缓存：重命名与替换两个界面共用，避免每行都向系统查询一次图标
+
+import os
+from collections import OrderedDict
+
+from PyQt5.QtCore import QFileInfo
+from PyQt5.QtWidgets import QFileIconProvider
+
+
+class IconCache:
+    """按扩展名缓存系统图标（容量有限，最久未用的先淘汰），文件夹共用一个图标"""
+    # 这些类型在 Windows 上每个文件都有自己的图标，按完整路径缓存
+    PER_FILE_EXTENSIONS = {".exe", ".lnk", ".ico", ".url"}
+
+    def __init__(self, max_size=512):
+        self.provider = QFileIconProvider()
+        self.max_size = max_size
+        self.fast_mode = False  # 开启后不再按文件查询，只用通用的文件/文件夹图标
+        self._icons = OrderedDict()
+        self._generic_file = None
+        self._generic_folder = None
+
+    def icon(self, path, is_dir=None, fast=False):
+        """获取路径对应的图标；已知是否为文件夹时传入 is_dir 可省去一次 stat"""
+        if is_dir is None:
+            is_dir = os.path.isdir(path)
+        if is_dir:
+            return self.folder_icon()
+        if fast or self.fast_mode:
+            return self.file_icon()
+        ext = os.path.splitext(path)[1].lower()
+        key = path if ext in self.PER_FILE_EXTENSIONS else ext
+
+        icon = self._icons.get(key)
+        if icon is not None:
+            self._icons.move_to_end(key)
+            return icon
+        icon = self.provider.icon(QFileInfo(path))
+        self._icons[key] = icon
+        if len(self._icons) > self.max_size:
+            self._icons.popitem(last=False)
+        return icon
+
+    def file_icon(self):
+        """通用文件图标"""
+        if self._generic_file is None:
+            self._generic_file = self.provider.icon(QFileIconProvider.File)
+        return self._generic_file
+
+    def folder_icon(self):
+        """通用文件夹图标"""
+        if self._generic_folder is None:
+            self._generic_folder = self.provider.icon(QFileIconProvider.Folder)
+        return self._generic_folder
+
+    def clear(self):
+        self._icons.clear()
+
+
+_shared_cache = None
+
+
+def shared_icon_cache():
+    """全局共用的图标缓存（需在 QApplication 创建之后调用）"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = IconCache()
+    return _shared_cache
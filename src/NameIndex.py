@@ -0,0 +1,196 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 文件名内存索引（不依赖 PyQt5）：每个目录只列举一次，之后按子串搜索文件/文件夹名；
+# 搜索时每个目录只取一次修改时间，变化过的目录才重新列举该目录本身。
+
+import os
+import time
+import threading
+from collections import namedtuple
+from typing import Iterable, Iterator, Tuple, Optional, Callable
+
+from TargetIndex import RACY_SECONDS
+
+# files/dirs 为原始名称，*_blob 为小写名称用换行拼接，先整体判断子串是否出现再逐个比对；
+# mtime_ns 为列举前目录的修改时间（为 0 时下次搜索一定重新列举）
+_DirNames = namedtuple("_DirNames", "files file_blob dirs dir_blob subdirs mtime_ns")
+
+
+def _blob(names):
+    return "\n".join(names).lower()
+
+
+class NameIndex:
+    """目标目录树的文件名索引，键为规范化后的目录路径"""
+
+    def __init__(self):
+        self._dirs = {}
+        self._pending = set()  # 变化后新出现、尚未建立索引的子目录
+        self._lock = threading.Lock()
+
+    def has_root(self, root: str) -> bool:
+        """root 是否已完整建立索引"""
+        return os.path.normpath(root) in self._dirs
+
+    # ------------------ 建立与更新 ------------------
+    def build(self, root: str, is_running: Optional[Callable[[], bool]] = None) -> bool:
+        """遍历 root 建立索引（不进入符号链接目录）；中途取消时丢弃已建立的部分并返回 False"""
+        root = os.path.normpath(root)
+        stack = [root]
+        while stack:
+            if is_running is not None and not is_running():
+                self.forget(root)
+                return False
+            current = stack.pop()
+            entry = self._scan(current)
+            if entry is None:
+                continue
+            with self._lock:
+                self._dirs[current] = entry
+                self._pending.discard(current)
+            stack.extend(os.path.join(current, name) for name in reversed(entry.subdirs))
+        return True
+
+    def build_pending(self, is_running: Optional[Callable[[], bool]] = None) -> bool:
+        """为 refresh_dir 发现的新子目录补建索引"""
+        while self._pending:
+            with self._lock:
+                if not self._pending:
+                    break
+                directory = self._pending.pop()
+            if not self.build(directory, is_running):
+                with self._lock:
+                    self._pending.add(directory)
+                return False
+        return True
+
+    def refresh_dir(self, directory: str):
+        """目录内容变化：只重新列举这一层，删除消失的子目录，新子目录留待下次搜索前补建"""
+        directory = os.path.normpath(directory)
+        old = self._dirs.get(directory)
+        if old is None:
+            return  # 未建立索引的目录无需处理
+        if not os.path.isdir(directory):
+            self.forget(directory)
+            return
+        entry = self._rescan(directory, old)
+        if entry is old:
+            return
+        with self._lock:
+            for name in set(entry.subdirs) - set(old.subdirs):
+                path = os.path.join(directory, name)
+                if path not in self._dirs:
+                    self._pending.add(path)
+
+    def _rescan(self, directory, old):
+        """重新列举一层并删除消失的子目录的索引，返回新的 _DirNames；无法访问时返回 old"""
+        entry = self._scan(directory)
+        if entry is None:
+            return old
+        with self._lock:
+            self._dirs[directory] = entry
+            self._pending.discard(directory)
+        if old is not None:
+            for name in set(old.subdirs) - set(entry.subdirs):
+                self.forget(os.path.join(directory, name))
+        return entry
+
+    def _fresh(self, directory):
+        """搜索时取目录的索引：修改时间变化过（或尚未建立索引）时重新列举这一层，目录已不存在时返回 None"""
+        entry = self._dirs.get(directory)
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            if entry is not None:
+                self.forget(directory)
+            return None
+        if entry is not None and entry.mtime_ns != 0 and entry.mtime_ns == mtime_ns:
+            return entry
+        return self._rescan(directory, entry)
+
+    def forget(self, directory: str):
+        """删除目录及其下所有子目录的索引"""
+        directory = os.path.normpath(directory)
+        prefix = directory.rstrip("\\/") + os.sep
+        with self._lock:
+            for path in [p for p in self._dirs if p == directory or p.startswith(prefix)]:
+                del self._dirs[path]
+            self._pending = {p for p in self._pending if p != directory and not p.startswith(prefix)}
+
+    def clear(self):
+        with self._lock:
+            self._dirs.clear()
+            self._pending.clear()
+
+    @staticmethod
+    def _scan(directory):
+        """列举单个目录，返回 _DirNames；无法访问时返回 None"""
+        files, dirs, subdirs = [], [], []
+        try:
+            # 先取修改时间再列举：列举期间发生的变化在下次搜索时能被发现
+            mtime_ns = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            dirs.append(entry.name)
+                            if not entry.is_symlink():
+                                subdirs.append(entry.name)
+                        else:
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"访问目录失败: {directory}, 错误: {e}")
+            return None
+        if time.time_ns() - mtime_ns < RACY_SECONDS * 1e9:
+            mtime_ns = 0  # 修改时间离列举时刻太近，不可信
+        return _DirNames(files, _blob(files), dirs, _blob(dirs), subdirs, mtime_ns)
+
+    # ------------------ 搜索 ------------------
+    def search(self, roots: Iterable[str], text: str, search_dirs: bool, excluded=(),
+               blocked_parents=(), is_running: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[str, bool]]:
+        """在已索引的 roots 下按名称子串（不区分大小写）搜索，依次产出 (路径, 是否为文件夹)
+
+        目录自顶向下遍历，修改时间变化过的目录先重新列举（每个目录一次 stat）；
+        excluded 中的路径连同其子级一并跳过，blocked_parents 中目录的直接子项不出现在结果里。
+        """
+        text = text.lower()
+        for root in roots:
+            root = os.path.normpath(root)
+            if root in excluded or root not in self._dirs:
+                continue
+            if search_dirs and text in os.path.basename(root).lower() \
+                    and os.path.dirname(root) not in blocked_parents:
+                yield root, True
+            stack = [root]
+            while stack:
+                if is_running is not None and not is_running():
+                    return
+                current = stack.pop()
+                entry = self._fresh(current)
+                if entry is None:
+                    continue
+                names, blob = (entry.dirs, entry.dir_blob) if search_dirs else (entry.files, entry.file_blob)
+                if text in blob and current not in blocked_parents:
+                    for name in names:
+                        if text in name.lower():
+                            path = os.path.join(current, name)
+                            if path not in excluded:
+                                yield path, search_dirs
+                for name in reversed(entry.subdirs):
+                    path = os.path.join(current, name)
+                    if path not in excluded:
+                        stack.append(path)
@@ -0,0 +1,124 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 路径集合（不依赖 PyQt5）：替换界面的原始项/已移除项列表，
+# 成员判断 O(1)，判断路径是否位于某个成员目录之下 O(深度)，修改操作返回差异用于撤销。
+
+import os
+from typing import Iterable, List, Tuple
+
+
+def _key(path):
+    return os.path.normpath(path)
+
+
+class PathSet:
+    """按规范化路径去重、保持添加顺序的路径集合，迭代时返回添加时的原始写法"""
+
+    def __init__(self, paths: Iterable[str] = ()):
+        self._paths = {}  # 规范化路径 -> 原始路径（dict 保持插入顺序）
+        self.update(paths)
+
+    def __contains__(self, path):
+        return bool(path) and isinstance(path, str) and _key(path) in self._paths
+
+    def __iter__(self):
+        return iter(list(self._paths.values()))
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __bool__(self):
+        return bool(self._paths)
+
+    def __repr__(self):
+        return f"PathSet({list(self._paths.values())!r})"
+
+    def copy(self) -> "PathSet":
+        new = PathSet()
+        new._paths = dict(self._paths)
+        return new
+
+    def covers(self, path: str) -> bool:
+        """path 本身或它的任一上级目录在集合中"""
+        if not self._paths or not path:
+            return False
+        current = _key(path)
+        while True:
+            if current in self._paths:
+                return True
+            parent = os.path.dirname(current)
+            if parent == current:
+                return False
+            current = parent
+
+    # ------------------ 修改（返回差异） ------------------
+    def add(self, path: str) -> bool:
+        """添加路径，返回是否为新路径"""
+        key = _key(path)
+        if key in self._paths:
+            return False
+        self._paths[key] = path
+        return True
+
+    def update(self, paths: Iterable[str]) -> List[str]:
+        """批量添加，返回实际新增的路径（撤销时传给 difference_update）"""
+        return [p for p in paths if p and self.add(p)]
+
+    def discard(self, path: str) -> bool:
+        return bool(path) and self._paths.pop(_key(path), None) is not None
+
+    def difference_update(self, paths: Iterable[str]):
+        for p in paths:
+            self.discard(p)
+
+    def clear(self):
+        self._paths.clear()
+
+    def index(self, path: str) -> int:
+        key = _key(path)
+        for i, k in enumerate(self._paths):
+            if k == key:
+                return i
+        raise ValueError(f"{path} 不在集合中")
+
+    def pop_indexed(self, paths: Iterable[str]) -> List[Tuple[int, str]]:
+        """移除多个路径，返回 [(原位置, 原始路径), ...]（按位置升序，撤销时传给 insert_indexed）"""
+        targets = {_key(p) for p in paths if p}
+        removed = [(i, self._paths[k]) for i, k in enumerate(self._paths) if k in targets]
+        for _, p in removed:
+            del self._paths[_key(p)]
+        return removed
+
+    def insert_indexed(self, entries: Iterable[Tuple[int, str]]):
+        """按 pop_indexed 的记录把路径放回原位置"""
+        items = list(self._paths.items())
+        for i, p in sorted(entries, key=lambda e: e[0]):
+            key = _key(p)
+            if key not in self._paths:
+                items.insert(i, (key, p))
+                self._paths[key] = p
+        self._paths = dict(items)
+
+    def remap_prefix(self, old: str, new: str):
+        """重命名后把 old 及其下所有路径改写到 new 之下，保持顺序"""
+        old_key = _key(old)
+        prefix = old_key.rstrip("\\/") + os.sep
+        remapped = {}
+        for key, path in self._paths.items():
+            if key == old_key or key.startswith(prefix):
+                path = new + path[len(old):] if path.startswith(old) else new + key[len(old_key):]
+                key = _key(path)
+            remapped[key] = path
+        self._paths = remapped
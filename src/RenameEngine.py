@@ -0,0 +1,637 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 批量重命名核心逻辑（不依赖 PyQt5），界面与命令行共用
+
+import os
+import re
+from pathlib import Path
+from typing import List, Tuple, Dict, Iterable, Set
+
+
+# ------------------ 选项取值（与界面下拉框文本一致） ------------------
+MATCH_PLAIN = "普通匹配"
+MATCH_REGEX = "正则匹配"
+MATCH_MODES = [MATCH_PLAIN, MATCH_REGEX]
+
+INSERT_START = "开头"
+INSERT_END = "末尾"
+INSERT_BEFORE_KEYWORD = "关键词前"
+INSERT_AFTER_KEYWORD = "关键词后"
+INSERT_MODES = [INSERT_START, INSERT_END, INSERT_BEFORE_KEYWORD, INSERT_AFTER_KEYWORD]
+
+CASE_KEEP = "不变"
+CASE_UPPER = "大写"
+CASE_LOWER = "小写"
+CASE_TITLE = "标题格式"
+CASE_MODES = [CASE_KEEP, CASE_UPPER, CASE_LOWER, CASE_TITLE]
+
+FILTER_PREFIX = "前缀"
+FILTER_SUFFIX = "后缀"
+FILTER_KEYWORD = "包含关键词"
+FILTER_REGEX = "正则匹配"
+FILTER_MODES = [FILTER_PREFIX, FILTER_SUFFIX, FILTER_KEYWORD, FILTER_REGEX]
+
+# Windows 文件名限制
+ILLEGAL_NAME_CHARS = ['<', '>', ':', '"', '|', '?', '*']
+RESERVED_NAMES = ['CON', 'PRN', 'AUX', 'NUL', 'COM1', 'COM2', 'COM3', 'COM4',
+                  'COM5', 'COM6', 'COM7', 'COM8', 'COM9', 'LPT1', 'LPT2',
+                  'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9']
+SYSTEM_DIRS = ['C:\\Windows', 'C:\\Program Files', 'C:\\Program Files (x86)',
+               'C:\\System32', 'C:\\Users', 'C:\\ProgramData']
+
+
+# ------------------ 重命名规则 ------------------
+class RenameRuleSet:
+    """重命名规则快照：构造时预编译正则，逐行计算为纯函数，不依赖任何界面控件"""
+    def __init__(self, find_text="", replace_text="", match_mode=MATCH_PLAIN, highlight=True,
+                 prefix_suffix_enabled=False, prefix="", suffix="",
+                 number_enabled=False, number_prefix="", number_suffix="",
+                 start=1, step=1, pad=0, insert_mode=INSERT_END, insert_text="",
+                 delete_enabled=False, delete_from=0, delete_to=0, case=CASE_KEEP):
+        self.find_text = find_text
+        self.replace_text = replace_text
+        self.is_regex = (match_mode != MATCH_PLAIN)
+        self.highlight = highlight
+        self.prefix_suffix_enabled = prefix_suffix_enabled
+        self.prefix = prefix
+        self.suffix = suffix
+        self.number_enabled = number_enabled
+        self.number_prefix = number_prefix
+        self.number_suffix = number_suffix
+        self.start = start
+        self.step = step if step != 0 else 1
+        self.pad = pad
+        self.insert_mode = insert_mode
+        self.insert_text = insert_text
+        self.delete_enabled = delete_enabled
+        self.delete_from = delete_from
+        self.delete_to = delete_to
+        self.case = case
+
+        # 正则只编译一次；替换模板（如 \g<name>）也在这里提前校验
+        self.find_regex = None
+        self.regex_error = None
+        if find_text and self.is_regex:
+            try:
+                self.find_regex = re.compile(find_text)
+                if replace_text:
+                    self.find_regex.sub(replace_text, "")
+            except (re.error, IndexError) as e:
+                self.regex_error = str(e)
+
+    def is_matching(self, original_name):
+        """检查名称是否匹配查找条件"""
+        if not self.find_text:
+            return True  # 如果没有查找内容，认为所有文件都匹配
+        if not self.is_regex:
+            return self.find_text in original_name
+        if self.find_regex is None:
+            return False
+        return bool(self.find_regex.search(original_name))
+
+    def find_parts(self, text):
+        """只标记查找命中的分段（不做替换），没有查找内容或正则无效时返回空列表"""
+        if not self.find_text or not text:
+            return []
+        if not self.is_regex:
+            return self._split_plain(text, self.find_text, self.find_text, "find")
+        if self.find_regex is None:
+            return []
+        parts = []
+        last_end = 0
+        for match in self.find_regex.finditer(text):
+            start, end = match.span()
+            if start > last_end:
+                parts.append((text[last_end:start], None))
+            parts.append((text[start:end], "find"))
+            last_end = end
+        if last_end < len(text):
+            parts.append((text[last_end:], None))
+        return parts
+
+    @staticmethod
+    def _split_plain(text, find_text, mark_text, role):
+        """按普通查找切分文本，命中部分替换为 mark_text 并标记角色"""
+        parts = []
+        start = 0
+        while True:
+            pos = text.find(find_text, start)
+            if pos == -1:
+                if start < len(text):
+                    parts.append((text[start:], None))
+                break
+            if pos > start:
+                parts.append((text[start:pos], None))
+            parts.append((mark_text, role))
+            start = pos + len(find_text)
+        return parts
+
+    def _number_parts(self, index):
+        """生成编号的前缀、数字、后缀分段"""
+        num = self.start + index * self.step
+        num_str = str(num).zfill(self.pad) if self.pad > 0 else str(num)
+        parts = []
+        if self.number_prefix:
+            parts.append((self.number_prefix, "number_prefix"))
+        parts.append((num_str, "number"))
+        if self.number_suffix:
+            parts.append((self.number_suffix, "number_suffix"))
+        return parts
+
+    def _insert_number(self, new_name_parts, index):
+        """按插入位置把编号插入到分段中"""
+        number_parts = self._number_parts(index)
+        insert_mode = self.insert_mode
+        insert_text = self.insert_text
+
+        if insert_mode == INSERT_START:
+            return number_parts + new_name_parts
+        if insert_mode == INSERT_END:
+            return new_name_parts + number_parts
+        if insert_mode not in (INSERT_BEFORE_KEYWORD, INSERT_AFTER_KEYWORD) or not insert_text:
+            return new_name_parts
+
+        # 查找关键词位置并插入，找不到关键词时追加到末尾
+        new_parts = []
+        found = False
+        for text, role in new_name_parts:
+            if not found and insert_text in text:
+                pos = text.find(insert_text)
+                if insert_mode == INSERT_AFTER_KEYWORD:
+                    pos += len(insert_text)
+                    new_parts.append((text[:pos], role))
+                elif pos > 0:
+                    new_parts.append((text[:pos], role))
+                new_parts.extend(number_parts)
+                new_parts.append((text[pos:], role))
+                found = True
+            else:
+                new_parts.append((text, role))
+        if found:
+            return new_parts
+        return new_name_parts + number_parts
+
+    def _mark_delete(self, new_name_parts):
+        """标记删除范围（1-based），返回新的分段；范围无效时返回 None"""
+        frm = self.delete_from
+        to = self.delete_to
+        if frm <= 0 or to < frm:
+            return None
+        full_text = ''.join([text for text, _ in new_name_parts])
+        # 起始位置超出范围，跳过删除处理
+        if frm > len(full_text):
+            return None
+
+        frm_0 = frm - 1
+        actual_to_0 = min(to - 1, len(full_text) - 1)
+
+        # 使用颜色背景标记删除范围，而不是实际删除字符
+        marked_parts = []
+        current_pos = 0
+        for text, role in new_name_parts:
+            text_start = current_pos
+            text_end = current_pos + len(text)
+
+            if text_end <= frm_0 or text_start > actual_to_0:
+                # 文本完全在删除范围之外，保持原样
+                marked_parts.append((text, role))
+            elif text_start >= frm_0 and text_end <= actual_to_0 + 1:
+                # 文本完全在删除范围之内，标记为delete
+                marked_parts.append((text, "delete"))
+            else:
+                # 文本部分与删除范围重叠，需要分割
+                if text_start < frm_0:
+                    marked_parts.append((text[:frm_0 - text_start], role))
+                delete_start = max(0, frm_0 - text_start)
+                delete_end = min(len(text), actual_to_0 + 1 - text_start)
+                if delete_start < delete_end:
+                    marked_parts.append((text[delete_start:delete_end], "delete"))
+                if text_end > actual_to_0 + 1:
+                    marked_parts.append((text[delete_end:], role))
+
+            current_pos = text_end
+        return marked_parts
+
+    def _apply_case(self, new_name_parts):
+        """大小写转换（保留高光分段）"""
+        if self.case == CASE_UPPER:
+            return [(text.upper(), role) for text, role in new_name_parts]
+        if self.case == CASE_LOWER:
+            return [(text.lower(), role) for text, role in new_name_parts]
+        if self.case == CASE_TITLE:
+            # 仅对文件名部分做标题化，保留扩展名，并保留分段及其角色
+            full_text = ''.join([text for text, _ in new_name_parts])
+            name_len = len(os.path.splitext(full_text)[0])
+            cursor = 0
+            titled_parts = []
+            for text, role in new_name_parts:
+                start = cursor
+                end = cursor + len(text)
+                if end <= name_len:
+                    titled_parts.append((text.title(), role))
+                elif start >= name_len:
+                    titled_parts.append((text, role))
+                else:
+                    # 横跨边界，分割后分别处理
+                    split_pos = name_len - start
+                    name_sub = text[:split_pos].title()
+                    ext_sub = text[split_pos:]
+                    if name_sub:
+                        titled_parts.append((name_sub, role))
+                    if ext_sub:
+                        titled_parts.append((ext_sub, role))
+                cursor = end
+            return titled_parts
+        return new_name_parts
+
+    def apply(self, original_name, index):
+        """构建新名称，返回 (new_name_parts, processed_info)"""
+        processed_info = {}
+        new_name_parts = [(original_name, None)]  # 默认部分
+
+        # 检查是否匹配查找条件
+        is_matching = self.is_matching(original_name)
+        find_text = self.find_text
+        replace_text = self.replace_text
+
+        if find_text:
+            # 处理高亮显示（只有在启用高光时）
+            if self.highlight:
+                if not self.is_regex:
+                    if find_text in original_name:
+                        new_name_parts = self._split_plain(original_name, find_text, find_text, "find")
+                elif self.find_regex is not None:
+                    matches = list(self.find_regex.finditer(original_name))
+                    if matches:
+                        parts = []
+                        last_end = 0
+                        for match in matches:
+                            start, end = match.span()
+                            if start > last_end:
+                                parts.append((original_name[last_end:start], None))
+                            parts.append((original_name[start:end], "find"))  # 高亮匹配内容
+                            last_end = end
+                        if last_end < len(original_name):
+                            parts.append((original_name[last_end:], None))
+                        new_name_parts = parts
+
+            # 只有同时有查找和替换文本时才处理替换
+            if replace_text:
+                if not self.is_regex:
+                    if find_text in original_name:
+                        if self.highlight:
+                            new_name_parts = self._split_plain(original_name, find_text, replace_text, "replace")
+                        else:
+                            new_name_parts = [(original_name.replace(find_text, replace_text), None)]
+                        processed_info["find"] = True
+                else:
+                    if self.regex_error is not None:
+                        return new_name_parts, processed_info
+                    # 正则替换暂不支持部分高亮
+                    new_name = self.find_regex.sub(replace_text, original_name)
+                    new_name_parts = [(new_name, "replace" if self.highlight else None)]
+                    processed_info["find"] = True
+
+        # 前后缀（仅对匹配查找条件的文件生效，且启用时）
+        if is_matching and self.prefix_suffix_enabled:
+            if self.prefix:
+                new_name_parts.insert(0, (self.prefix, "prefix"))
+                processed_info["prefix"] = True
+            if self.suffix:
+                new_name_parts.append((self.suffix, "suffix"))
+                processed_info["suffix"] = True
+
+        # 编号（仅在启用编号时且文件匹配查找条件）
+        if self.number_enabled and is_matching:
+            new_name_parts = self._insert_number(new_name_parts, index)
+            processed_info["number"] = True
+
+        # 删除范围（基于1-based输入） - 仅对匹配查找条件的文件生效
+        if self.delete_enabled and is_matching:
+            marked_parts = self._mark_delete(new_name_parts)
+            if marked_parts is not None:
+                new_name_parts = marked_parts
+                processed_info["delete"] = True
+
+        # 大小写转换（保留高光分段）
+        if self.case != CASE_KEEP:
+            new_name_parts = self._apply_case(new_name_parts)
+            processed_info["case"] = True
+
+        return new_name_parts, processed_info
+
+    def new_name(self, original_name, index):
+        """计算实际使用的新名称（排除被标记为删除的片段）"""
+        parts, _ = self.apply(original_name, index)
+        return ''.join([text for text, role in parts if role != "delete"])
+
+
+# ------------------ 收集路径 ------------------
+def path_key(path: str) -> str:
+    """路径去重用的键：规范化分隔符和大小写（Windows 下不区分大小写）"""
+    return os.path.normcase(os.path.normpath(str(path)))
+
+
+def iter_dir_files(path: str, recursive: bool = False) -> Iterable[str]:
+    """用 os.scandir 逐个产出文件夹内的文件（递归顺序与 os.walk 自顶向下一致，不进入符号链接目录）
+
+    直接使用 DirEntry 自带的类型信息判断文件/目录，不再对每一项额外 stat。
+    """
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if recursive and not entry.is_symlink():
+                            subdirs.append(entry.path)
+                    elif recursive or entry.is_file():
+                        yield entry.path
+        except OSError as e:
+            print(f"扫描目录失败 {current}: {e}")
+        stack.extend(reversed(subdirs))
+
+
+def iter_subfolders(path: str) -> Iterable[str]:
+    """用 os.scandir 逐个产出全部子文件夹（跳过符号链接和无读取权限的目录）"""
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if not entry.is_dir() or entry.is_symlink():
+                            continue
+                    except OSError:
+                        continue
+                    if os.access(entry.path, os.R_OK):
+                        subdirs.append(entry.path)
+        except OSError as e:
+            print(f"扫描目录失败 {current}: {e}")
+        for dir_path in subdirs:
+            yield dir_path
+        stack.extend(reversed(subdirs))
+
+
+def sort_deepest_first(folders: List[str]) -> List[str]:
+    """按路径深度降序排序（最深层在前，避免先改父文件夹导致子路径失效）"""
+    return sorted(folders, key=lambda p: p.count(os.sep), reverse=True)
+
+
+def collect_files(paths: Iterable[str], recursive: bool = False) -> List[str]:
+    """展开文件/文件夹路径为文件列表（文件夹按 recursive 决定是否递归），去重并保持顺序"""
+    files = []
+    seen = set()
+
+    def add(file_path):
+        if file_path not in seen:
+            seen.add(file_path)
+            files.append(file_path)
+
+    for path in paths:
+        path = str(path)
+        if os.path.isfile(path):
+            add(path)
+        elif os.path.isdir(path):
+            for file_path in iter_dir_files(path, recursive):
+                add(file_path)
+        else:
+            print(f"路径不存在，跳过: {path}")
+    return files
+
+
+def collect_folders(paths: Iterable[str], recursive: bool = False) -> List[str]:
+    """收集要重命名的文件夹：递归模式下为全部子文件夹（最深层在前），否则为文件夹本身"""
+    folders = []
+    seen = set()
+    for path in paths:
+        path = str(path)
+        if not os.path.isdir(path):
+            print(f"文件夹不存在: {path}")
+            continue
+        candidates = sort_deepest_first(list(iter_subfolders(path))) if recursive else [path]
+        for folder in candidates:
+            if folder not in seen:
+                seen.add(folder)
+                folders.append(folder)
+    return folders
+
+
+def make_entries(paths: Iterable[str]) -> List[Tuple[str, str, Dict]]:
+    """把路径列表转换为 (路径, 原始名称, 处理信息) 条目"""
+    return [(path, os.path.basename(path), {}) for path in paths]
+
+
+# ------------------ 筛选 ------------------
+def matches_pattern(file_name: str, pattern: str, mode: str) -> bool:
+    """检查文件名是否匹配指定模式"""
+    if not pattern.strip():
+        return True
+
+    try:
+        if mode == FILTER_PREFIX:
+            return file_name.startswith(pattern)
+        elif mode == FILTER_SUFFIX:
+            return file_name.endswith(pattern)
+        elif mode == FILTER_KEYWORD:
+            return pattern in file_name
+        elif mode == FILTER_REGEX:
+            return bool(re.search(pattern, file_name))
+        else:
+            return True
+    except Exception:
+        return False
+
+
+def filter_entries(entries: Iterable[Tuple[str, str, Dict]], filter_mode: str, filter_pattern: str,
+                   skip_mode: str, skip_pattern: str) -> List[Tuple[str, str, Dict]]:
+    """先按筛选模式保留，再按跳过模式排除，返回新的条目列表"""
+    filtered = []
+    for item in entries:
+        file_name = item[1]
+        if filter_pattern and not matches_pattern(file_name, filter_pattern, filter_mode):
+            continue
+        if skip_pattern and matches_pattern(file_name, skip_pattern, skip_mode):
+            continue
+        filtered.append(item)
+    return filtered
+
+
+# ------------------ 重命名执行 ------------------
+def validate_rename_operation(src: Path, dst: Path, new_name: str) -> bool:
+    """验证重命名操作的安全性
+
+    Args:
+        src: 源文件/文件夹路径
+        dst: 目标文件/文件夹路径
+        new_name: 新名称
+
+    Returns:
+        bool: 是否通过安全检查
+    """
+    try:
+        # 1. 检查源路径是否存在且可访问
+        if not src.exists():
+            return False
+
+        # 2. 检查新名称是否为空
+        if not new_name.strip():
+            return False
+
+        # 3. 检查新名称长度限制（Windows最大路径260字符，但实际限制更复杂）
+        if len(new_name) > 255:
+            return False
+
+        # 4. 检查非法字符（Windows文件系统限制）
+        if any(char in new_name for char in ILLEGAL_NAME_CHARS):
+            return False
+
+        # 5. 检查保留名称（Windows保留名称）
+        if Path(new_name).stem.upper() in RESERVED_NAMES:
+            return False
+
+        # 6. 检查路径分隔符
+        if '/' in new_name or '\\' in new_name:
+            return False
+
+        # 7. 检查Unicode字符兼容性
+        try:
+            new_name.encode('utf-8')
+        except UnicodeEncodeError:
+            return False
+
+        # 8. 检查目标路径是否在系统关键目录
+        dst_str = str(dst).lower()
+        if any(system_dir.lower() in dst_str for system_dir in SYSTEM_DIRS):
+            return False
+
+        # 9. 检查是否尝试重命名到根目录
+        if dst.parent == dst:
+            return False
+
+        # 10. 检查源和目标是否在同一文件系统（避免跨设备移动）
+        if src.parent != dst.parent:
+            try:
+                dst.parent.resolve()
+            except (OSError, ValueError):
+                return False
+
+        return True
+
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def plan_renames(entries: List[Tuple[str, str, Dict]], rules: RenameRuleSet,
+                 folder_mode: bool = False) -> List[Tuple[Path, Path]]:
+    """计算全部重命名操作并做冲突检测，返回 [(src, dst)]
+
+    同一批中出现重复的新名称时抛出 ValueError，整批都不执行；
+    目标已存在或未通过安全检查的条目会被跳过。
+    """
+    # 文件夹模式按路径深度降序处理（深层优先），避免先改父目录导致子路径失效
+    if folder_mode:
+        entries = sorted(entries, key=lambda item: item[0].count(os.sep), reverse=True)
+
+    rename_ops = []
+    new_names: Set[str] = set()  # 用于检测内部冲突
+    for idx, (src_path, original_name, _) in enumerate(entries):
+        src = Path(src_path)
+        if not src.exists():
+            continue
+
+        # 应用时排除被标记为删除的片段
+        new_name = rules.new_name(original_name, idx)
+        dst = src.with_name(new_name)
+        if src == dst:
+            continue
+
+        # 检测内部冲突（同一批重命名中的重复）
+        if new_name in new_names:
+            raise ValueError(f"重命名冲突: {new_name}")
+
+        # 检测外部冲突（目标文件已存在）
+        if dst.exists():
+            continue
+
+        if not validate_rename_operation(src, dst, new_name):
+            continue
+
+        new_names.add(new_name)
+        rename_ops.append((src, dst))
+    return rename_ops
+
+
+def execute_renames(rename_ops: List[Tuple[Path, Path]]) -> Tuple[List[Tuple[Path, Path]], List[str]]:
+    """执行重命名，返回 (已完成的 [(src, dst)], 失败信息列表)"""
+    performed = []
+    failed = []
+
+    for src, dst in rename_ops:
+        try:
+            # 再次验证操作
+            if not validate_rename_operation(src, dst, dst.name):
+                failed.append(f"{src.name}: 安全检查失败")
+                continue
+
+            src.rename(dst)
+            performed.append((src, dst))
+        except PermissionError as e:
+            failed.append(f"{src.name}: 权限不足 - {str(e)}")
+            print(f"重命名权限错误: {e}")
+        except FileExistsError as e:
+            failed.append(f"{src.name}: 目标文件已存在 - {str(e)}")
+            print(f"重命名文件存在错误: {e}")
+        except OSError as e:
+            # 细化操作系统错误
+            if "文件名、目录名或卷标语法不正确" in str(e):
+                failed.append(f"{src.name}: 非法文件名 - {str(e)}")
+            elif "系统找不到指定的路径" in str(e):
+                failed.append(f"{src.name}: 路径不存在 - {str(e)}")
+            elif "另一个程序正在使用此文件" in str(e):
+                failed.append(f"{src.name}: 文件被占用 - {str(e)}")
+            else:
+                failed.append(f"{src.name}: 系统错误 - {str(e)}")
+            print(f"重命名系统错误: {e}")
+        except Exception as e:
+            failed.append(f"{src.name}: 未知错误 - {str(e)}")
+            print(f"重命名未知错误: {e}")
+
+    return performed, failed
+
+
+def undo_renames(inverse_ops: List[Tuple[Path, Path]]) -> List[Tuple[Path, Path]]:
+    """撤销重命名（dst -> src），目标已存在时跳过不覆盖，返回已撤销的 [(dst, src)]"""
+    performed = []
+    for dst_path, src_path in inverse_ops:
+        try:
+            if not dst_path.exists():
+                continue
+            if src_path.exists():
+                continue
+            dst_path.rename(src_path)
+            performed.append((dst_path, src_path))
+        except Exception:
+            # 静默处理错误，不记录也不弹窗
+            pass
+    return performed
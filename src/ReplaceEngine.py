@@ -0,0 +1,603 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 批量替换核心逻辑（不依赖 PyQt5），界面与命令行共用
+
+import os
+import re
+import sys
+import stat
+import time
+import mmap
+import errno
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Tuple, Callable, Iterable, Iterator, Optional
+
+
+# ------------------ 选项取值（与界面下拉框文本一致） ------------------
+MATCH_SUFFIX = "后缀匹配"
+MATCH_KEYWORD = "关键词匹配"
+MATCH_REGEX = "正则表达式"
+MATCH_MODES = [MATCH_SUFFIX, MATCH_KEYWORD, MATCH_REGEX]
+
+# 日志级别（界面据此着色：备份绿色、成功蓝色、错误红色）
+LOG_BACKUP = "backup"
+LOG_SUCCESS = "success"
+LOG_ERROR = "error"
+
+# 并发替换：文件复制主要耗在 I/O 等待上，线程数可以比 CPU 核数多
+MAX_JOBS = 32
+
+
+def default_jobs() -> int:
+    """默认并发数"""
+    return min(8, (os.cpu_count() or 1) * 2)
+
+
+# ------------------ 匹配 ------------------
+def split_keywords(text: str) -> List[str]:
+    """按中英文逗号拆分关键词，去掉空白项"""
+    return [k.strip() for k in re.split(r'[，,]', text or "") if k.strip()]
+
+
+def build_matcher(mode: str, pattern: str) -> Callable[[str], bool]:
+    """根据匹配模式生成文件名判断函数（正则只编译一次），参数无效时抛出 ValueError"""
+    pattern = (pattern or "").strip()
+    if mode == MATCH_SUFFIX:
+        if not pattern:
+            raise ValueError("后缀匹配模式请输入后缀（如 .10 或 10）")
+        suffix = pattern.lower().lstrip(".")
+        return lambda filename: os.path.splitext(filename)[1].lower().lstrip(".") == suffix
+    if mode == MATCH_KEYWORD:
+        if not pattern:
+            raise ValueError("关键词匹配模式请输入关键词")
+        keys = split_keywords(pattern)
+        return lambda filename: bool(keys) and any(k in filename for k in keys)
+    if mode == MATCH_REGEX:
+        if not pattern:
+            raise ValueError("正则表达式模式请输入正则")
+        try:
+            regex = re.compile(pattern)
+        except re.error:
+            raise ValueError(f"无效正则表达式: {pattern}")
+        return lambda filename: bool(regex.search(filename))
+    return lambda filename: False
+
+
+def _dir_key(path: str) -> str:
+    """目录比较用的规范形式（绝对路径、统一分隔符与大小写）"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def iter_matches(source_file: str, targets: Iterable[str], mode: str, pattern: str,
+                 skip_keywords: Iterable[str] = (), backup_dir: Optional[str] = None,
+                 on_skip: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+    """从候选文件中逐个筛选出需要替换的文件（流式，候选与结果都不整体保存）
+
+    跳过备份目录及其子项、源文件本身、包含跳过关键词的文件（通过 on_skip 回调通知）。
+    参数在调用时立即检查，无效时抛出 ValueError。
+    """
+    if not source_file or not os.path.exists(source_file):
+        raise ValueError("源文件不存在或未选择")
+
+    matcher = build_matcher(mode, pattern)
+    skip_keywords = [kw for kw in skip_keywords if kw]
+    bdir = _dir_key(backup_dir) if backup_dir else None
+    bdir_prefix = bdir.rstrip(os.sep) + os.sep if bdir else None
+    # 源文件按设备号 + inode 识别，只对名称命中的文件各 stat 一次
+    src_stat = os.stat(source_file)
+    src_id = (src_stat.st_dev, src_stat.st_ino) if src_stat.st_ino else None
+
+    def is_source(full):
+        """是否为源文件本身；文件已不存在时返回 None"""
+        try:
+            st = os.stat(full)
+        except OSError:
+            return None
+        if src_id is not None:
+            return (st.st_dev, st.st_ino) == src_id
+        return os.path.samestat(src_stat, st)
+
+    def generate():
+        # 候选文件通常按目录成组出现：同一目录只判断一次是否位于备份目录内
+        last_dir, last_in_backup = None, False
+        for full in targets:
+            if bdir:
+                parent = os.path.dirname(full)
+                if parent != last_dir:
+                    key = _dir_key(parent)
+                    last_dir, last_in_backup = parent, key == bdir or key.startswith(bdir_prefix)
+                if last_in_backup:
+                    continue
+            filename = os.path.basename(full)
+            skipped = any(kw in filename for kw in skip_keywords)
+            if not skipped and not matcher(filename):
+                continue
+            same = is_source(full)
+            if same is None or same:
+                continue
+            if skipped:
+                if on_skip:
+                    on_skip(full)
+                continue
+            yield full
+
+    return generate()
+
+
+def scan_matches(source_file: str, targets: Iterable[str], mode: str, pattern: str,
+                 skip_keywords: Iterable[str] = (), backup_dir: Optional[str] = None,
+                 on_skip: Optional[Callable[[str], None]] = None) -> List[str]:
+    """从候选文件中筛选出需要替换的文件（iter_matches 的列表形式）"""
+    return list(iter_matches(source_file, targets, mode, pattern, skip_keywords, backup_dir, on_skip))
+
+
+def iter_files(paths: Iterable[str], excluded=(), prune: Iterable[str] = ()) -> Iterator[str]:
+    """展开文件/文件夹路径为文件（文件夹递归，顺序同 os.walk），excluded 中的文件被跳过，
+    prune 中的目录（如备份目录）连同其子项在遍历时直接跳过"""
+    pruned = {_dir_key(p) for p in prune if p}
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+        elif os.path.isdir(path):
+            stack = [path]
+            while stack:
+                current = stack.pop()
+                if pruned and _dir_key(current) in pruned:
+                    continue
+                subdirs = []
+                try:
+                    with os.scandir(current) as it:
+                        for entry in it:
+                            try:
+                                is_dir = entry.is_dir()
+                            except OSError:
+                                continue
+                            if is_dir:
+                                if not entry.is_symlink():
+                                    subdirs.append(entry.path)
+                            elif entry.path not in excluded:
+                                yield entry.path
+                except OSError:
+                    continue
+                stack.extend(reversed(subdirs))
+
+
+# ------------------ 复制 ------------------
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+def _path_lock(path: str) -> threading.Lock:
+    """同一目标路径共用一把锁（并发时不同目标可能备份到同名文件）"""
+    key = os.path.normcase(os.path.abspath(path))
+    with _path_locks_guard:
+        lock = _path_locks.get(key)
+        if lock is None:
+            lock = _path_locks[key] = threading.Lock()
+        return lock
+
+
+class _ShortCopy(OSError):
+    """快速复制方式提前结束（写入的字节数不足）：方式本身可用，只对当前目标改用普通写入"""
+
+
+class CopySource:
+    """被复制的源文件：只打开、stat 一次，之后可以写给任意多个目标
+
+    复制时依次尝试（平台不支持或跨设备时自动降级，并对该源记住结果）：
+    reflink 克隆 → copy_file_range → sendfile → 直接写出内存中的源数据
+    （小文件整体读入一次，大文件用 mmap 映射）。每个目标都先写临时文件再替换。
+    """
+    MEMORY_LIMIT = 64 * 1024 * 1024  # 不超过该大小的源文件整体读入内存
+    FICLONE = 0x40049409  # Linux 下的 reflink ioctl
+    # 这些错误说明当前方式不可用（而不是目标本身出错），换下一种方式
+    UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTTY,
+                          errno.EBADF, getattr(errno, "EOPNOTSUPP", errno.ENOTSUP),
+                          errno.ENOTSUP, errno.EPERM}
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            self.stat = os.fstat(self.fd)
+        except OSError:
+            os.close(self.fd)
+            raise
+        self.size = self.stat.st_size
+        self._lock = threading.Lock()
+        self._buffer = None
+        self._mmap = None
+        self._digest = None
+        self._methods = []
+        if sys.platform.startswith("linux"):
+            # 其他平台的 sendfile 只能写入 socket，也没有 reflink ioctl
+            self._methods.append(self._reflink)
+            if hasattr(os, "copy_file_range"):
+                self._methods.append(self._copy_file_range)
+            if hasattr(os, "sendfile"):
+                self._methods.append(self._sendfile)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self._buffer, memoryview):
+            self._buffer.release()  # 先释放视图，映射才能关闭
+        self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    # ------------------ 复制方式 ------------------
+    def _reflink(self, dst_fd):
+        import fcntl
+        fcntl.ioctl(dst_fd, self.FICLONE, self.fd)
+
+    def _copy_file_range(self, dst_fd):
+        offset = 0
+        while offset < self.size:
+            sent = os.copy_file_range(self.fd, dst_fd, self.size - offset, offset, offset)
+            if sent == 0:
+                break
+            offset += sent
+        if offset < self.size:
+            raise _ShortCopy(errno.EIO, "copy_file_range 提前结束")
+
+    def _sendfile(self, dst_fd):
+        offset = 0
+        while offset < self.size:
+            sent = os.sendfile(dst_fd, self.fd, offset, self.size - offset)
+            if sent == 0:
+                break
+            offset += sent
+        if offset < self.size:
+            raise _ShortCopy(errno.EIO, "sendfile 提前结束")
+
+    def _data(self):
+        """源文件内容：小文件读入内存，大文件映射，均只做一次"""
+        with self._lock:
+            if self._buffer is None:
+                if self.size == 0:
+                    self._buffer = b""
+                elif self.size <= self.MEMORY_LIMIT:
+                    self._buffer = os.pread(self.fd, self.size, 0) if hasattr(os, "pread") else self._read_all()
+                else:
+                    self._mmap = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+                    self._buffer = memoryview(self._mmap)
+            return self._buffer
+
+    def _read_all(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def _write_to(self, dst_fd):
+        """把源内容写入已打开的目标文件"""
+        for method in list(self._methods):
+            try:
+                method(dst_fd)
+                return
+            except _ShortCopy:
+                # 只写了一部分：清空后这个目标直接普通写入，之后的目标仍使用该方式
+                self._rewind(dst_fd)
+                break
+            except OSError as e:
+                if e.errno not in self.UNSUPPORTED_ERRNOS:
+                    raise
+                # 当前方式不可用：之后的目标不再尝试，清空已写内容后降级
+                with self._lock:
+                    if method in self._methods:
+                        self._methods.remove(method)
+                self._rewind(dst_fd)
+        data = self._data()
+        written = 0
+        while written < len(data):
+            written += os.write(dst_fd, data[written:])
+
+    @staticmethod
+    def _rewind(dst_fd):
+        """清空目标并回到开头（sendfile 等已移动了文件位置，不回到开头会在前面留下空洞）"""
+        os.ftruncate(dst_fd, 0)
+        os.lseek(dst_fd, 0, os.SEEK_SET)
+
+    # ------------------ 内容比对 ------------------
+    def digest(self):
+        """源文件内容的 BLAKE2b 摘要（只计算一次）"""
+        if self._digest is None:
+            digest = hashlib.blake2b(self._data()).digest()
+            with self._lock:
+                self._digest = digest
+        return self._digest
+
+    def same_as(self, target, hash_cache=None):
+        """目标是否已与源文件内容相同
+
+        大小不同则一定不同，不再计算摘要；大小相同时（即使修改时间也相同）一律比对 BLAKE2b 摘要，
+        以免内容不同但大小和时间恰好一致的目标被跳过、没有备份。
+        hash_cache（如 TargetIndex）提供 get_hash/put_hash 时，未变化的目标不必重新计算摘要。
+        """
+        try:
+            st = os.stat(target)
+        except OSError:
+            return False
+        if st.st_size != self.size:
+            return False
+        digest = target_digest(target, hash_cache)
+        return digest is not None and digest == self.digest()
+
+    # ------------------ 对外接口 ------------------
+    def copy_to(self, dst_path):
+        """安全复制到 dst_path：先写入临时文件，再替换目标，返回 (是否成功, 信息)"""
+        temp_dst = f"{dst_path}.tmp"
+        try:
+            dst_dir = os.path.dirname(dst_path)
+            if dst_dir:
+                os.makedirs(dst_dir, exist_ok=True)
+            dst_fd = os.open(temp_dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+            try:
+                self._write_to(dst_fd)
+            finally:
+                os.close(dst_fd)
+            # 时间和权限取自打开源文件时的 stat，不再逐个目标重新读取
+            os.utime(temp_dst, ns=(self.stat.st_atime_ns, self.stat.st_mtime_ns))
+            os.chmod(temp_dst, stat.S_IMODE(self.stat.st_mode))
+            os.replace(temp_dst, dst_path)
+            return True, "复制成功"
+        except PermissionError:
+            self._discard(temp_dst)
+            return False, "权限不足（文件可能被其他程序占用）"
+        except Exception as e:
+            self._discard(temp_dst)
+            return False, f"复制失败：{str(e)}"
+
+    @staticmethod
+    def _discard(temp_dst):
+        try:
+            if os.path.exists(temp_dst):
+                os.remove(temp_dst)
+        except OSError:
+            pass
+
+
+def file_digest(path, buffer_size=1024*1024):
+    """计算文件的 BLAKE2b 摘要（分块读取，复用同一块缓冲区）"""
+    h = hashlib.blake2b()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.digest()
+
+
+def safe_copy(src_path, dst_path, source: Optional[CopySource] = None):
+    """安全复制：先写入临时文件，再替换目标，返回 (是否成功, 信息)
+
+    多次复制同一个源文件时传入已打开的 source，避免重复打开和读取。
+    """
+    if source is not None:
+        return source.copy_to(dst_path)
+    if not os.path.exists(src_path):
+        return False, f"源文件不存在：{src_path}"
+    try:
+        with CopySource(src_path) as one_shot:
+            return one_shot.copy_to(dst_path)
+    except PermissionError:
+        return False, "权限不足（文件可能被其他程序占用）"
+    except OSError as e:
+        return False, f"复制失败：{str(e)}"
+
+
+# ------------------ 备份 ------------------
+# 备份方式：同一文件系统上硬链接或移动目标几乎不产生 I/O，只有跨设备时才复制内容
+BACKUP_LINK = "link"
+BACKUP_MOVE = "move"
+BACKUP_COPY = "copy"
+
+# 内容寻址存储（BackupStore）的对象目录，manifest 中的 backup_rel_path 指向这里
+OBJECTS_DIR = "objects"
+
+
+def object_rel_path(digest: bytes) -> str:
+    """摘要对应的备份相对路径（按前两位分子目录，避免单个目录文件过多；
+    文件名只取摘要前 32 字节，避免 Windows 上路径过长）"""
+    name = digest[:32].hex()
+    return f"{OBJECTS_DIR}/{name[:2]}/{name}"
+
+
+def backup_target(target: str, backup_path: str):
+    """把即将被替换的目标备份到 backup_path，返回 (方式, 信息)，失败时方式为 None
+
+    目标随后会被整体替换成新文件（先写临时文件再改名），原来的数据只剩备份引用，
+    因此同一文件系统上依次尝试：硬链接 → 直接移动 → 复制。
+    目标是符号链接或已有其他硬链接时只复制，避免备份与其他文件共用内容。
+    """
+    try:
+        st = os.lstat(target)
+    except OSError as e:
+        return None, f"无法访问目标：{e}"
+    if stat.S_ISREG(st.st_mode) and st.st_nlink == 1:
+        try:
+            os.makedirs(os.path.dirname(backup_path) or ".", exist_ok=True)
+        except OSError as e:
+            return None, f"创建备份目录失败：{e}"
+        temp = f"{backup_path}.tmp"
+        try:
+            CopySource._discard(temp)
+            os.link(target, temp)
+            os.replace(temp, backup_path)  # 覆盖同名的旧备份
+            return BACKUP_LINK, "硬链接成功"
+        except OSError as e:
+            CopySource._discard(temp)
+            cross_device = e.errno == errno.EXDEV
+        if not cross_device:
+            try:
+                os.replace(target, backup_path)
+                return BACKUP_MOVE, "移动成功"
+            except OSError:
+                pass
+    success, msg = safe_copy(target, backup_path)
+    return (BACKUP_COPY if success else None), msg
+
+
+def _undo_backup(target: str, backup_path: str, method: str) -> str:
+    """替换失败后撤销快速备份的副作用，返回需要附加到错误信息里的说明"""
+    try:
+        if method == BACKUP_MOVE:
+            # 目标已被移走：复制回原处（备份保留，manifest 中的记录仍然有效），复制失败时直接移回
+            success, _ = safe_copy(backup_path, target)
+            if not success:
+                os.replace(backup_path, target)
+        elif method == BACKUP_LINK:
+            # 备份仍与目标共用内容，改为独立副本，之后原地修改目标不会影响备份
+            success, msg = safe_copy(target, backup_path)
+            if not success:
+                return f"；备份仍与目标共用同一文件：{msg}"
+    except OSError as e:
+        return f"；目标仍在备份位置 {backup_path}，放回失败：{e}"
+    return ""
+
+
+def replace_file(source_file: str, target: str, backup_dir: Optional[str] = None,
+                 source: Optional[CopySource] = None, store=None, digest: Optional[bytes] = None):
+    """备份（可选）并替换单个目标文件
+
+    返回 (result, logs)：result 为 ("success"/"error", 显示文本)，
+    logs 为 [(日志文本, 日志级别)]。批量替换时传入共用的 source（CopySource）。
+    传入 store（BackupStore）时存入内容寻址存储（digest 为已算好的目标摘要，可省略），此时不使用 backup_dir。
+    """
+    logs = []
+    disp = f"{os.path.basename(target)} {{{target}}}"
+    method = None
+    if store is not None:
+        method, msg, backup_path = store.put(target, digest)
+        if method is None:
+            logs.append((f"错误：{disp} - 备份失败：{msg}", LOG_ERROR))
+            return ("error", f"{disp} - 备份失败：{msg}"), logs
+        logs.append((f"已备份：{target} → {backup_path}", LOG_BACKUP))
+    elif backup_dir:
+        # 将备份文件直接放入同一备份文件夹（不再创建父级子目录）
+        backup_path = os.path.join(backup_dir, os.path.basename(target))
+        with _path_lock(backup_path):
+            method, msg = backup_target(target, backup_path)
+        if method is None:
+            logs.append((f"错误：{disp} - 备份失败：{msg}", LOG_ERROR))
+            return ("error", f"{disp} - 备份失败：{msg}"), logs
+        logs.append((f"已备份：{target} → {backup_path}", LOG_BACKUP))
+
+    success, msg = safe_copy(source_file, target, source)
+    if success:
+        logs.append((f"[替换成功] {disp}", LOG_SUCCESS))
+        return ("success", disp), logs
+    if method in (BACKUP_LINK, BACKUP_MOVE):
+        with _path_lock(backup_path):
+            msg += _undo_backup(target, backup_path, method)
+    logs.append((f"错误：{disp} - 替换失败：{msg}", LOG_ERROR))
+    return ("error", f"{disp} - 替换失败：{msg}"), logs
+
+
+def skip_identical_result(target: str):
+    """目标已与源文件相同时的结果，格式同 replace_file（不逐个写日志，只在汇总中计数）"""
+    return ("skip", f"{os.path.basename(target)} {{{target}}}"), []
+
+
+def target_digest(target: str, hash_cache=None) -> Optional[bytes]:
+    """目标内容摘要（hash_cache 中有未变化的记录时直接使用），无法读取时返回 None"""
+    try:
+        st = os.stat(target)
+        digest = hash_cache.get_hash(target, st) if hash_cache is not None else None
+        if digest is None:
+            digest = file_digest(target)
+            if hash_cache is not None:
+                hash_cache.put_hash(target, st, digest)
+        return digest
+    except OSError:
+        return None
+
+
+def hash_targets(targets: List[str], jobs: int = 1,
+                 is_running: Callable[[], bool] = lambda: True, hash_cache=None) -> dict:
+    """并发计算目标内容摘要，返回 {目标: 摘要}，无法读取的目标为 None"""
+    digests = run_parallel(lambda target: target_digest(target, hash_cache), targets, jobs,
+                           is_running=is_running)
+    return dict(zip(targets, digests))
+
+
+def find_identical(source: CopySource, targets: List[str], jobs: int = 1,
+                   is_running: Callable[[], bool] = lambda: True, hash_cache=None) -> set:
+    """并发比对，返回已与源文件内容相同的目标集合"""
+    same = run_parallel(lambda target: source.same_as(target, hash_cache), targets, jobs,
+                        is_running=is_running)
+    return {target for target, is_same in zip(targets, same) if is_same}
+
+
+def run_parallel(func: Callable, items: List, jobs: int = 1,
+                 is_running: Callable[[], bool] = lambda: True,
+                 on_done: Optional[Callable[[int, object], None]] = None) -> List:
+    """用线程池并发执行 func(item)，结果按输入顺序返回
+
+    同时在途的任务不超过 jobs 的两倍，is_running() 返回假后不再提交新任务，
+    未执行的项结果为 None。on_done(索引, 结果) 在调用线程中按完成顺序回调。
+    """
+    results = [None] * len(items)
+    jobs = max(1, min(int(jobs or 1), MAX_JOBS))
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = {}
+        next_index = 0
+        while pending or (next_index < len(items) and is_running()):
+            while next_index < len(items) and len(pending) < jobs * 2 and is_running():
+                pending[pool.submit(func, items[next_index])] = next_index
+                next_index += 1
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                results[index] = future.result()
+                if on_done:
+                    on_done(index, results[index])
+    return results
+
+
+def restore_file(backup_file: str, original_path: str):
+    """把备份文件还原到原始位置，返回值格式同 replace_file"""
+    disp = f"{os.path.basename(original_path)} {{{original_path}}}"
+    if not os.path.exists(backup_file):
+        text = f"{os.path.basename(backup_file)} {{{backup_file}}} - 备份文件不存在：{backup_file}"
+        return ("error", text), [(f"错误：{text}", LOG_ERROR)]
+    with _path_lock(original_path):
+        success, msg = safe_copy(backup_file, original_path)
+    if success:
+        return ("restore", disp), [(f"[还原成功] {original_path}", LOG_SUCCESS)]
+    text = f"{disp} - 还原失败：{msg}"
+    return ("error", text), [(f"错误：{text}", LOG_ERROR)]
+
+
+# ------------------ 备份记录 ------------------
+def backup_timestamp() -> str:
+    """生成备份目录使用的秒级时间戳"""
+    local_time = time.localtime()
+    return (f"{local_time.tm_year}-{local_time.tm_mon}-{local_time.tm_mday}-"
+            f"{local_time.tm_hour}-{local_time.tm_min}-{local_time.tm_sec}")
@@ -0,0 +1,194 @@
+# Copyright (C) 2025 AshToAsh815
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>.
+
+# 目标目录索引（不依赖 PyQt5）：把目录树的文件列表和元数据存进 SQLite，
+# 再次扫描时只对修改时间变化过的目录重新列举，其余目录直接查表。
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Iterable, Iterator, Optional
+
+INDEX_DIR = os.path.join(os.path.expanduser("~"), ".ash_mod_tools")
+INDEX_FILE = "target_index.sqlite3"
+
+# 目录修改时间离扫描时刻太近时不可信（同一时间刻度内可能还有后续变化），下次重新列举
+RACY_SECONDS = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    inode INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest BLOB NOT NULL
+);
+"""
+
+
+def default_index_path() -> str:
+    """默认索引文件位置：用户目录下的 .ash_mod_tools"""
+    return os.path.join(INDEX_DIR, INDEX_FILE)
+
+
+def _prefix_range(path: str):
+    """path 之下所有子路径的字符串范围 [lo, hi)，用于按前缀批量查询/删除"""
+    base = path.rstrip("\\/") + os.sep
+    return base, base[:-1] + chr(ord(os.sep) + 1)
+
+
+class TargetIndex:
+    """目标目录树的持久化索引，每个线程使用自己的 SQLite 连接"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_index_path()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------ 文件列表 ------------------
+    def list_files(self, root: str, prune: Iterable[str] = ()) -> Iterator[str]:
+        """逐个产出 root 下的全部文件（递归，不进入符号链接目录；目录自顶向下，目录内按名称排序）
+
+        prune 中的目录（如备份目录）连同其子项直接跳过。
+
+        每次只从索引中读取一个目录的记录，不整体载入：每个目录只 stat 一次，
+        修改时间未变则直接使用索引中的列表，变化过（或被 invalidate 标记过）的目录重新列举并更新索引。
+        """
+        root = os.path.normpath(root)
+        conn = self._conn()
+        pruned = {os.path.normcase(os.path.abspath(p)) for p in prune if p}
+        now_ns = time.time_ns()
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            if pruned and os.path.normcase(os.path.abspath(current)) in pruned:
+                continue
+            try:
+                mtime_ns = os.stat(current).st_mtime_ns
+            except OSError:
+                with conn:
+                    self._forget(conn, current)
+                continue
+            row = conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (current,)).fetchone()
+            subdirs = [r[0] for r in conn.execute(
+                "SELECT path FROM dirs WHERE parent = ? ORDER BY path", (current,))]
+            if row is not None and row[0] != 0 and row[0] == mtime_ns:
+                names = [r[0] for r in conn.execute(
+                    "SELECT path FROM files WHERE dir = ? ORDER BY path", (current,))]
+            else:
+                # 每个重新列举的目录单独提交，产出结果时不持有写事务
+                with conn:
+                    names, subdirs = self._rescan(conn, current, mtime_ns, now_ns, old_subdirs=subdirs)
+            stack.extend(reversed(subdirs))
+            yield from names
+
+    def _rescan(self, conn, directory, mtime_ns, now_ns, old_subdirs):
+        """重新列举单个目录并写回索引，返回 (文件列表, 子目录列表)"""
+        names = []
+        subdirs = []
+        rows = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    names.append(entry.path)
+                    rows.append((entry.path, directory, st.st_size, st.st_mtime_ns, st.st_ino))
+        except OSError as e:
+            print(f"扫描目录失败 {directory}: {e}")
+            return [], []
+
+        conn.execute("DELETE FROM files WHERE dir = ?", (directory,))
+        conn.executemany("INSERT OR REPLACE INTO files (path, dir, size, mtime_ns, inode) VALUES (?, ?, ?, ?, ?)", rows)
+        # 已不存在的子目录连同其下的全部记录一起删除
+        for gone in set(old_subdirs) - set(subdirs):
+            self._forget(conn, gone)
+        for sub in subdirs:
+            conn.execute("INSERT OR IGNORE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, 0)", (sub, directory))
+        # 刚修改过的目录记为 0，下次仍重新列举
+        racy = now_ns - mtime_ns < RACY_SECONDS * 1e9
+        conn.execute("INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                     (directory, os.path.dirname(directory), 0 if racy else mtime_ns))
+        names.sort()
+        subdirs.sort()
+        return names, subdirs
+
+    def _forget(self, conn, directory):
+        """删除目录及其下所有索引记录"""
+        lo, hi = _prefix_range(directory)
+        conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (directory, lo, hi))
+        conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (lo, hi))
+
+    def invalidate(self, directory: str):
+        """文件系统通知某目录有变化：下次扫描时重新列举它"""
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE dirs SET mtime_ns = 0 WHERE path = ?", (os.path.normpath(directory),))
+
+    # ------------------ 内容摘要缓存 ------------------
+    def get_hash(self, path: str, st) -> Optional[bytes]:
+        """大小、修改时间、inode 都与记录一致时返回已缓存的摘要"""
+        row = self._conn().execute(
+            "SELECT digest FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+            (path, st.st_size, st.st_mtime_ns, st.st_ino)).fetchone()
+        return row[0] if row else None
+
+    def put_hash(self, path: str, st, digest: bytes):
+        """记录文件摘要（刚修改过的文件不缓存，避免同一时间刻度内的后续修改被漏掉）"""
+        if time.time_ns() - st.st_mtime_ns < RACY_SECONDS * 1e9:
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO hashes (path, size, mtime_ns, inode, digest) VALUES (?, ?, ?, ?, ?)",
+                         (path, st.st_size, st.st_mtime_ns, st.st_ino, digest))